@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Measure the rows per second parsed when reading a bank export with and
+without categorization rules.
+
+Run the benchmark from the repository root with::
+
+   python benchmarks/csv_import.py [number of rows] [number of rules]
+
+"""
+
+import datetime
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+import mone.book
+from mone.rules import Rule, Rules
+
+
+def merchants(n: int) -> list:
+    """Return *n* random merchant names."""
+    rng = random.Random(0)
+    return [''.join(rng.choices(string.ascii_uppercase, k=rng.randint(4, 9)))
+            for _ in range(n)]
+
+
+def export(file: str, n: int, names: list) -> None:
+    """Write a bank export of *n* rows to *file* with German number and
+    date formats. Most descriptions name one of the merchant *names*."""
+    rng = random.Random(0)
+    start = datetime.date(2020, 1, 1)
+    with open(file, 'w') as f:
+        f.write('Datum;Beschreibung;Betrag\n')
+        for i in range(n):
+            date = start + datetime.timedelta(days=rng.randint(0, 365))
+            value = f'{rng.uniform(-5000, 5000):,.2f}'
+            value = value.replace(',', ' ').replace('.', ',').replace(' ', '.')
+            name = rng.choice(names) if rng.random() < 0.8 else 'Unknown'
+            f.write(f'{date:%d.%m.%Y};SEPA {name} {i} Danke;{value}\n')
+
+
+def main(n: int = 200000, n_rules: int = 300) -> None:
+    names = merchants(n_rules)
+    rules = Rules(Rule(keyword=name, budgets=['budget'], tags=['tag'])
+                  for name in names)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file = os.path.join(tmp, 'export.csv')
+        export(file, n, names)
+
+        for label, kwargs in [('without rules', {}),
+                              (f'with {len(rules)} rules', {'rules': rules})]:
+            start = time.perf_counter()
+            transactions = mone.book.Transactions.from_csv(
+                file, 2, 0, 1, skiprows=1, delimiter=';', thousands='.',
+                decimal=',', datefmt='%d.%m.%Y', account='bank',
+                counterpart='extern', **kwargs)
+            seconds = time.perf_counter() - start
+
+            print(f'{len(transactions)} rows {label} in {seconds:.2f} s: '
+                  f'{len(transactions) / seconds:.0f} rows per second')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
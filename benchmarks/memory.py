@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Measure the memory used per transaction of a book.
+
+Run the benchmark from the repository root with::
+
+   python benchmarks/memory.py [number of transactions]
+
+"""
+
+import datetime
+import json
+import random
+import sys
+import tracemalloc
+
+from uuid import uuid1
+
+import mone.book
+
+
+def transactions(n: int) -> list:
+    """Return *n* transactions as dictionaries, e.g. loaded from the vault."""
+    rng = random.Random(0)
+    accounts = [str(uuid1()) for _ in range(20)]
+    tags = ['food', 'rent', 'fun', 'travel', 'salary']
+    start = datetime.date(2015, 1, 1)
+    data = []
+    for i in range(n):
+        date = start + datetime.timedelta(days=rng.randint(0, 3650))
+        data.append(json.dumps({
+            'uuid': str(uuid1()),
+            'date': date.isoformat(),
+            'description': f'Transaction {i}',
+            'sources': rng.sample(accounts, 1),
+            'receiver': rng.sample(accounts, 1),
+            'tags': rng.sample(tags, rng.randint(0, 2)),
+            'value': round(rng.uniform(0, 1000), 2),
+        }))
+    return data
+
+
+class DictTransaction:
+    """A transaction as stored before slots, with an instance dictionary and
+    its own sets."""
+
+    def __init__(self, data: dict):
+        self.value = data['value']
+        self.description = data['description']
+        self.sources = set(data['sources'])
+        self.receiver = set(data['receiver'])
+        self.date = datetime.date.fromisoformat(data['date'])
+        self.tags = set(data['tags'])
+        self.uuid = data['uuid']
+        self.budget_rebalance = False
+
+
+def measure(load, data: list) -> float:
+    """Return the bytes per transaction allocated by loading the *data*."""
+    tracemalloc.start()
+    book = [load(json.loads(d)) for d in data]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(book)
+
+
+def main(n: int = 100000) -> None:
+    data = transactions(n)
+    before = measure(DictTransaction, data)
+    after = measure(mone.book.Transaction.from_dict, data)
+
+    print(f'{n} transactions: {before:.0f} bytes per transaction before and '
+          f'{after:.0f} bytes after')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
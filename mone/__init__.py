@@ -30,6 +30,14 @@ Mone is your private bookkeeper who stores all records of the
    :toctree: generated/
 
    book
+   exchange
+   importer
+   ledger
+   money
+   recurring
+   rules
+   search
+   snapshot
    vault
 
 """
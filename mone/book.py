@@ -36,11 +36,88 @@ budgets to track spendings on e.g. living costs.
 
 from __future__ import annotations
 
-from typing import Any, List, Set, Union
+from collections.abc import Collection
+from typing import (Any, Callable, FrozenSet, Iterable, Iterator, List,
+                    NamedTuple, Set, Tuple, Union)
 from uuid import uuid1
+import bisect
+import calendar
+import contextlib
 import csv
 import datetime
+import functools
+import heapq
 import io
+import itertools
+import json
+import operator
+import sys
+import threading
+import weakref
+
+from mone.money import exponent, to_major, to_minor
+import mone.recurring
+from mone.search import TrigramIndex
+from mone.snapshot import AccountState, BudgetState, Chunks, Snapshot
+
+
+class _SharedSet(frozenset):
+    # a frozen set which is a distinct object from the key it's interned by
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return repr(frozenset(self))
+
+
+_frozensets = weakref.WeakValueDictionary()
+
+
+def _frozen(items: Iterable[str]) -> FrozenSet[str]:
+    """Return the interned *items* as frozen set.
+
+    Equal sets are shared, so that all transactions between the same accounts
+    or with the same tags refer to the same set object. A set is only weakly
+    referenced by the interned sets and dropped once no transaction uses it.
+    """
+    items = frozenset(map(sys.intern, items))
+    shared = _frozensets.get(items)
+    if shared is None:
+        shared = _frozensets.setdefault(items, _SharedSet(items))
+    return shared
+
+
+@functools.lru_cache(maxsize=4096)
+def _fromisoformat(date_str: str) -> datetime.date:
+    """Return a shared date object of the *date_str* in ISO format."""
+    return datetime.date.fromisoformat(date_str)
+
+
+STEPS = ('day', 'week', 'month')
+"""The steps of the date grid of :meth:`BookKeeper.forecast()`."""
+
+
+def _step(start: datetime.date, step: str, k: int) -> datetime.date:
+    """Return the date *k* steps after *start*.
+
+    Months are added with the day of *start* clamped to the month's end.
+    """
+    if step == 'day':
+        return start + datetime.timedelta(days=k)
+    if step == 'week':
+        return start + datetime.timedelta(weeks=k)
+    year, month = divmod(12 * start.year + start.month - 1 + k, 12)
+    days = calendar.monthrange(year, month + 1)[1]
+    return datetime.date(year, month + 1, min(start.day, days))
+
+
+class Reconciliation(NamedTuple):
+    """The result of :meth:`BookKeeper.reconcile()`."""
+    matched: List[Tuple[Transaction, Transaction]]
+    """The pairs of statement rows and their booked transactions."""
+    missing: List[Transaction]
+    """The statement rows which are not booked."""
+    extra: List[Transaction]
+    """The booked transactions which are not in the statement."""
 
 
 class Accounts(dict):
@@ -74,6 +151,21 @@ class Accounts(dict):
             if acct is not None:
                 acct.add(transaction)
 
+    def add_many(self, transactions: Iterable[Transaction]) -> None:
+        """Add all *transactions* to the accounts at once.
+
+        Each account gets all transactions of which it is a source or
+        receiver by :meth:`Account.add_many()`.
+        """
+        booked = {}
+        for transaction in transactions:
+            for uuid in transaction.sources | transaction.receiver:
+                if uuid in self:
+                    booked.setdefault(uuid, []).append(transaction)
+
+        for uuid, booked_with in booked.items():
+            self[uuid].add_many(booked_with)
+
     @property
     def balance(self) -> float:
         """The balance of all accounts excluding the external accounts."""
@@ -81,51 +173,117 @@ class Accounts(dict):
         accts = filter(lambda a: not a.extern, self.values())
         return sum(map(lambda a: a.balance, accts))
 
-    def remove(self, transaction: Transaction) -> None:
-        """Remove the *transaction* from all accounts."""
-        for acct in self.values():
-            acct.transactions.remove(transaction)
+    def remove(self, transaction: Union[Transaction, str]) -> None:
+        """Remove the *transaction* from all accounts.
+
+        Only the accounts which are a source or receiver of the transaction
+        are touched. If the *transaction* is given by its uuid, all accounts
+        are searched for it.
+        """
+        if isinstance(transaction, str):
+            accts = self.values()
+        else:
+            get = self.get
+            uuids = transaction.sources | transaction.receiver
+            accts = filter(None, map(get, uuids))
+
+        for acct in accts:
+            acct.remove(transaction)
 
     def reset(self) -> None:
         """Clear all transactions of all accounts to reset them."""
         for acct in self.values():
-            acct.transactions.clear()
+            acct.reset()
 
-    def to_dict(self) -> List[dict]:
+    def to_dict(self, minor_units: bool = False) -> List[dict]:
         """Return a list of accounts as dictionaries.
 
         .. seealso:: :meth:`Account.to_dict()`
         """
-        return [t.to_dict() for t in self.values()]
+        return [t.to_dict(minor_units) for t in self.values()]
+
+
+class Transactions(Collection):
+    """An ordered collection of :class:`Transaction`.
+
+    The transactions are kept in the order in which they were appended and are
+    indexed by their uuid. Only objects of type :class:`Transaction` can be
+    appended. A transaction can be looked up by its uuid with :meth:`get()` or
+    ``transactions[uuid]`` and membership can be tested for a transaction or
+    its uuid. However, a list of transactions can also be generated from a CSV
+    file, e.g. a bank export of an account's transactions, by
+    :meth:`from_csv()`. Transactions can also be generated from a list of
+    transactions represented by a dictionary with :meth:`from_dict()`. With
+    :meth:`to_dict()`, the list can be returned as such a list of transactions
+    as dictionaries. A transaction can be removed from the list with
+    :meth:`remove()`.
+    """
 
+    def __init__(self, transactions: Iterable[Transaction] = ()) -> None:
+        """Create the collection from the iterable *transactions*."""
+        self._transactions = {}
+        for transaction in transactions:
+            self._check(transaction)
+            self._transactions[transaction.uuid] = transaction
 
-class Transactions(list):
-    """A list of :class:`Transaction`.
+    def __contains__(self, transaction: Union[Transaction, str]) -> bool:
+        if isinstance(transaction, Transaction):
+            transaction = transaction.uuid
+        return transaction in self._transactions
 
-    Extend :class:`list` to manage transactions. Only objects of type
-    :class:`Transaction` can be appended. However, a list of transactions can
-    also be generated from a CSV file, e.g. a bank export of an account's
-    transactions, by :meth:`from_csv()`. Transactions can also be generated
-    from a list of transactions represented by a dictionary with
-    :meth:`from_dict()`. With :meth:`to_dict()`, the list can be returned as
-    such a list of transactions as dictionaries. A transaction can be removed
-    from the list with :meth:`remove()`.
-    """
+    def __getitem__(self, uuid: str) -> Transaction:
+        return self._transactions[uuid]
 
-    def append(self, other) -> None:
-        """Extend to check the type of *other*.
+    def __iter__(self) -> Iterator[Transaction]:
+        return iter(self._transactions.values())
 
-        Raise a :class:`TypeError` if *other* is not a :class:`Transaction`.
-        """
+    def __len__(self) -> int:
+        return len(self._transactions)
+
+    def __repr__(self) -> str:
+        return f'Transactions({list(self)!r})'
+
+    def __reversed__(self) -> Iterator[Transaction]:
+        return reversed(self._transactions.values())
+
+    @staticmethod
+    def _check(other) -> None:
         if not isinstance(other, Transaction):
             raise TypeError('can only add Transaction')
 
-        super().append(other)
+    def append(self, other) -> None:
+        """Append the transaction *other*.
+
+        Raise a :class:`TypeError` if *other* is not a :class:`Transaction`. A
+        transaction with the same uuid as *other* is replaced.
+        """
+        self._check(other)
+        self._transactions[other.uuid] = other
+
+    def clear(self) -> None:
+        """Remove all transactions."""
+        self._transactions.clear()
+
+    def extend(self, transactions: Iterable[Transaction]) -> None:
+        """Append all *transactions*.
+
+        Raise a :class:`TypeError` if any of the *transactions* is not a
+        :class:`Transaction`. In that case, none of the *transactions* is
+        appended.
+        """
+        transactions = list(transactions)
+        for transaction in transactions:
+            self._check(transaction)
+        for transaction in transactions:
+            self._transactions[transaction.uuid] = transaction
 
     @classmethod
     def from_csv(cls, file: str, value: int, date: int, description: int,
                  skiprows: int = 0, delimiter: str = ',', thousands: str = '',
-                 decimal: str = '.', datefmt: str = '%Y-%M-%d') -> 'Transactions':
+                 decimal: str = '.', datefmt: str = '%Y-%m-%d',
+                 minor_units: bool = False, account: str = None,
+                 counterpart: str = None, rules: 'mone.rules.Rules' = None,
+                 currency: str = None) -> 'Transactions':
         """Return a transactions list from a csv *file*.
 
         Most banks provide the option to download transactions as csv files from
@@ -134,71 +292,115 @@ class Transactions(list):
         information you can *skiprows* to the start of the actual data with the
         column indices as defined previous. The columns are delimited by the
         *delimiter*. The value can have a *thousands* and *decimal*
-        separator. The format of the date column is defined by *datefmt*.
-
-        .. seealso:: :meth:`datetime.date.strftime()` for more on *datefmt*.
+        separator. The format of the date column is defined by *datefmt*. If
+        *minor_units* is true, the values are parsed exactly as integer minor
+        units of the *currency* of the file, which is also the
+        :attr:`~Transaction.currency` of the transactions.
+
+        The *file* is the export of one *account*. Negative values are
+        transferred from the *account* to the *counterpart*, e.g. an external
+        account, and positive values the other way around. Both must be
+        given, otherwise a :class:`ValueError` is raised. If *rules* are
+        given, they categorize each transaction by its description and value.
+
+        Each transaction gets a :attr:`~Transaction.fingerprint` of its row,
+        so that rows imported before from an overlapping export can be
+        skipped using :meth:`BookKeeper.imported()`.
+
+        .. seealso:: :meth:`iter_csv()` to read the transactions one by one and
+                     :meth:`datetime.date.strftime()` for more on *datefmt*.
         """
+        return cls(cls.iter_csv(file, value, date, description, skiprows,
+                                delimiter, thousands, decimal, datefmt,
+                                minor_units, account, counterpart, rules,
+                                currency))
 
-        def strpdate(date_str: str) -> datetime.datetime:
-            """Return a datetime object from the parsed *date_str*."""
-            return datetime.datetime.strptime(date_str, datefmt).date()
+    @staticmethod
+    def iter_csv(file: str, value: int, date: int, description: int,
+                 skiprows: int = 0, delimiter: str = ',', thousands: str = '',
+                 decimal: str = '.', datefmt: str = '%Y-%m-%d',
+                 minor_units: bool = False, account: str = None,
+                 counterpart: str = None, rules: 'mone.rules.Rules' = None,
+                 currency: str = None) -> Iterator[Transaction]:
+        """Yield the transactions of a csv *file* one by one.
+
+        Same as :meth:`from_csv()`, but the rows of the *file* are read and
+        parsed when the next transaction is requested. That way, the memory
+        used doesn't depend on the size of the *file*. The transactions can be
+        passed on to e.g. :meth:`BookKeeper.add_many()`. Empty rows are
+        skipped. Raise a :class:`ValueError` right away if the *account* or
+        *counterpart* is not given.
+        """
+        if account is None or counterpart is None:
+            raise ValueError('the account and counterpart of the file must '
+                             'be given')
 
-        def strpfloat(float_str: str) -> float:
-            """Return a float from the parsed *float_str*."""
-            return float(float_str.replace(thousands, '')
-                         .replace(decimal, '.'))
+        from mone.importer import csv_parser, fingerprinter, transfer
 
-        def ptransaction(transaction: list) -> Transaction:
-            """Return a Transaction from the parsed *transaction* list."""
-            return Transaction(strpfloat(transaction[value]),
-                               '',
-                               transaction[description],
-                               [],
-                               [],
-                               strpdate(transaction[date]))
+        parse = csv_parser(value, date, description, thousands, decimal,
+                           datefmt, minor_units, currency)
+        fingerprint = fingerprinter(account, currency)
 
-        if isinstance(file, str):
-            stream = open(file, 'r')
-        else:
-            stream = io.TextIOWrapper(file.stream._file, 'UTF8', newline=None)
+        def transactions() -> Iterator[Transaction]:
+            if isinstance(file, str):
+                stream = open(file, 'r', newline='')
+            else:
+                stream = io.TextIOWrapper(file.stream._file, 'UTF8',
+                                          newline=None)
 
-        reader = csv.reader(stream, delimiter=delimiter)
-        entries = list(reader)[skiprows:]
-        transactions = map(ptransaction, entries)
-        stream.close()
+            with stream:
+                reader = csv.reader(stream, delimiter=delimiter)
+                entries = filter(None, itertools.islice(reader, skiprows,
+                                                        None))
+                for entry in entries:
+                    row = parse(entry)
+                    yield transfer(*row, account, counterpart,
+                                   fingerprint(*row), rules, currency)
 
-        return cls(transactions)
+        return transactions()
 
     @classmethod
-    def from_dict(cls, dictionary) -> 'Transactions':
+    def from_dict(cls, dictionary,
+                  minor_units: bool = False) -> 'Transactions':
         """Return a transactions from a *dictionary*.
 
         The keys of the each transaction dictionary are the same as for
         :meth:`Transaction.from_dict()`.
         """
-        return cls(map(Transaction.from_dict, dictionary))
+        return cls(Transaction.from_dict(d, minor_units) for d in dictionary)
 
-    def remove(self, transaction: Union[Transaction, str]) -> None:
+    def get(self, uuid: str, default: Any = None) -> Transaction:
+        """Return the transaction with the *uuid* or *default*."""
+        return self._transactions.get(uuid, default)
+
+    def remove(self, transaction: Union[Transaction, str]) -> Transaction:
         """Remove the *transaction* from the list.
 
-        Extend remove to either remove the actual :class:`Transaction` object
-        or the transaction identified by it's uuid.
+        Either remove the actual :class:`Transaction` object or the
+        transaction identified by it's uuid. The removed transaction is
+        returned or *None* if it is not in the list.
         """
-        # get transaction by uuid
-        if isinstance(transaction, str):
-            transaction = next(filter(lambda t: t.uuid == transaction,
-                                      self),
-                               None)
+        if isinstance(transaction, Transaction):
+            transaction = transaction.uuid
+        return self._transactions.pop(transaction, None)
 
-        if transaction is not None and transaction in self:
-            super().remove(transaction)
+    def update(self, transactions: Iterable[Transaction]) -> None:
+        """Update the *transactions* which have changed.
 
-    def to_dict(self) -> List[dict]:
+        Each transaction replaces the one with the same uuid, keeping its
+        position in the list. Transactions which are not in the list are
+        ignored.
+        """
+        for transaction in transactions:
+            if transaction.uuid in self._transactions:
+                self._transactions[transaction.uuid] = transaction
+
+    def to_dict(self, minor_units: bool = False) -> List[dict]:
         """Return a list with transactions as dictionaries.
 
         .. seealso:: :meth:`Transaction.to_dict()`
         """
-        return [t.to_dict() for t in self]
+        return [t.to_dict(minor_units) for t in self]
 
 
 class Account():
@@ -210,7 +412,13 @@ class Account():
 
     A :class:`Transaction` can be :meth:`add()` to the account which returns
     the new balance, or the addition of two accounts can also be returned by
-    :meth:`add()`. An account can be represented as a dictionary by
+    :meth:`add()`. A booked transaction can be taken back with :meth:`remove()`
+    and all transactions are cleared by :meth:`reset()`. The balance is kept up
+    to date on each of those calls, so reading it doesn't require to sum up all
+    transactions again. The account also keeps its transactions ordered by
+    value date together with their running balance, which is returned for a
+    periode of time by :meth:`history()` or for a single date by
+    :meth:`balance_at()`. An account can be represented as a dictionary by
     :meth:`to_dict()` or can be created from such a dict by :meth:`from_dict`.
 
     Often you have transactions which are going out of your pocket into the
@@ -234,7 +442,7 @@ class Account():
        10000
        >>>
        >>> # Now lets buy a coffee and pay it with our bank account.
-       >>> t = Transaction(5, 'USD', 'Coffee', {bank.uuid}, {extern.uuid})
+       >>> t = Transaction(5, 'Coffee', {bank.uuid}, {extern.uuid})
        >>> accounts.add(t)
        >>>
        >>> # The 5$ went now from our pocket into the coffee shop's pocket and
@@ -242,14 +450,21 @@ class Account():
        >>> accounts.balance
        9995
 
+    An account can hold its money in a :attr:`currency` other than the one of
+    the book. Its balance is then consolidated into the book's currency by
+    the :attr:`BookKeeper.rates`.
     """
 
+    __slots__ = ('extern', 'name', 'uuid', 'currency', 'transactions',
+                 '_init_balance', '_delta', '_dates', '_ordered', '_values',
+                 '_cumsum', '_valid', '_booked')
+
     def __init__(self, name: str, balance: float = 0.0, extern: bool = False,
-                 uuid: str = None) -> None:
+                 uuid: str = None, currency: str = None) -> None:
         """The account requires a *name* and an initial *balance*.
 
-        Optionally, the *extern* attribute can be set and a *uuid* can be
-        provided.
+        Optionally, the *extern* attribute can be set and a *uuid* and the
+        *currency* can be provided.
         """
 
         self.extern = extern
@@ -262,13 +477,31 @@ class Account():
         self.name = name
         """The account name."""
 
-        self.uuid = uuid or str(uuid1())
+        self.uuid = sys.intern(uuid or str(uuid1()))
         """A unique identifier of the account."""
 
+        self.currency = currency
+        """The currency code of the account, e.g. ``'USD'``, or ``None`` for
+        the currency of the book."""
+
         self.transactions = Transactions()
         """The :class:`Transactions` booked with the account."""
 
         self._init_balance = balance
+        self._delta = 0
+
+        # the transactions ordered by value date with their signed values and
+        # the sum of all values up to and including each transaction; only the
+        # first _valid sums are up to date
+        self._dates = []
+        self._ordered = []
+        self._values = []
+        self._cumsum = []
+        self._valid = 0
+
+        # the value date each transaction was booked at by its uuid, so that
+        # it's found even if its date was changed since
+        self._booked = {}
 
     def __add__(self, other) -> float:
         return self.add(other)
@@ -289,11 +522,49 @@ class Account():
             return self.balance + other.balance
 
         if isinstance(other, Transaction):
+            self.remove(other)
             self.transactions.append(other)
+            self._insert(other, self.sign(other) * other.value)
             return self.balance
 
         return self.balance + other
 
+    def add_many(self, transactions: Iterable[Transaction]) -> float:
+        """Add all *transactions* to the account and return the new balance.
+
+        Same as :meth:`add()` for each transaction, but the order by value
+        date is restored by sorting the transactions after the earliest new
+        date once instead of inserting each transaction.
+        """
+        # a transaction given twice is booked once, as by add()
+        transactions = {t.uuid: t for t in transactions}.values()
+        entries = []
+        booked = self._booked
+        for transaction in transactions:
+            self.remove(transaction)
+            self.transactions.append(transaction)
+            date = booked[transaction.uuid] = transaction.date.toordinal()
+            entries.append((date, transaction,
+                            self.sign(transaction) * transaction.value))
+        if not entries:
+            return self.balance
+
+        # the new transactions come after all transactions of the same date
+        lower = bisect.bisect_right(self._dates, min(e[0] for e in entries))
+        tail = list(zip(self._dates[lower:], self._ordered[lower:],
+                        self._values[lower:]))
+        tail.extend(entries)
+        tail.sort(key=operator.itemgetter(0))
+
+        dates, ordered, values = zip(*tail)
+        self._dates[lower:] = dates
+        self._ordered[lower:] = ordered
+        self._values[lower:] = values
+        self._cumsum[lower:] = [0] * len(tail)
+        self._valid = min(self._valid, lower)
+        self._delta += sum(e[2] for e in entries)
+        return self.balance
+
     @property
     def balance(self) -> float:
         """The balance of the account.
@@ -302,40 +573,173 @@ class Account():
         from the balance. The balance is the sum of all remaining transactions
         where each value get a negative sign if the account is in that
         transaction's sources.
+
+        The balance is updated whenever a transaction is added or removed.
+        Use :meth:`check_balance()` to verify it against all transactions.
         """
-        def sign(t: Transaction) -> int:
-            if ((self.uuid in t.sources and self.uuid in t.receiver)
-                    or t.budget_rebalance):
-                return 0
-            return -1 if self.uuid in t.sources else 1
+        return self._opening + self._delta
 
-        return sum(map(lambda t: sign(t) * t.value, self.transactions),
-                   start=self._init_balance)
+    def check_balance(self) -> None:
+        """Check the :attr:`balance` against all booked transactions.
+
+        The balance is recomputed from scratch by summing up all
+        :attr:`transactions`. Raise a :class:`RuntimeError` if the result
+        differs from the balance kept by the account. This is meant for
+        debugging.
+        """
+        delta = sum(map(lambda t: self.sign(t) * t.value, self.transactions))
+        self._settle(len(self._cumsum))
+        cumsum = self._cumsum[-1] if self._cumsum else 0
+        for kept in (self._delta, cumsum):
+            if abs(delta - kept) > 1e-6 * max(1.0, abs(delta)):
+                raise RuntimeError(f'balance of {self!r} is off by '
+                                   f'{kept - delta}')
+
+    def _insert(self, transaction: Transaction, value: float) -> None:
+        # insert after all transactions of the same date and invalidate the
+        # running balance from there on
+        date = self._booked[transaction.uuid] = transaction.date.toordinal()
+        i = bisect.bisect_right(self._dates, date)
+        self._dates.insert(i, date)
+        self._ordered.insert(i, transaction)
+        self._values.insert(i, value)
+        self._cumsum.insert(i, 0)
+        self._valid = min(self._valid, i)
+        self._delta += value
+
+    def _pop(self, transaction: Transaction) -> None:
+        date = self._booked.pop(transaction.uuid)
+        lower = bisect.bisect_left(self._dates, date)
+        upper = bisect.bisect_right(self._dates, date)
+        i = next(j for j in range(lower, upper)
+                 if self._ordered[j] is transaction)
+
+        value = self._values[i]
+        del self._dates[i], self._ordered[i], self._values[i], self._cumsum[i]
+        self._valid = min(self._valid, i)
+        self._delta -= value
+
+    def _settle(self, stop: int) -> None:
+        # bring the running balance up to date for the first stop transactions
+        # starting at the last valid one
+        cumsum, values = self._cumsum, self._values
+        total = cumsum[self._valid - 1] if self._valid else 0
+        for j in range(self._valid, stop):
+            total += values[j]
+            cumsum[j] = total
+        self._valid = max(self._valid, stop)
+
+    def balance_at(self, date: datetime.date) -> float:
+        """Return the balance at the end of the *date*.
+
+        The balance includes all transactions with a value date up to and
+        including the *date*.
+
+        The running balance of the transactions is computed when it is needed
+        and kept as checkpoints for later queries. Adding or removing a
+        transaction invalidates only the checkpoints after its value date.
+        """
+        i = bisect.bisect_right(self._dates, date.toordinal())
+        self._settle(i)
+        return self._opening + (self._cumsum[i - 1] if i else 0)
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'Account':
+    def from_dict(cls, data: dict, minor_units: bool = False) -> 'Account':
         """Return an account generated from the *data*.
 
         The *data* dictionary must have the key ``'name'``. The ``'balance'``,
-        ``'uuid'`` and ``'extern'`` keys are optional.
+        ``'uuid'``, ``'extern'`` and ``'currency'`` keys are optional. If
+        *minor_units* is true, the balance is converted to integer minor
+        units of the account's currency.
+
+        .. seealso:: :mod:`mone.money`
         """
+        balance = data.get('balance')
+        if minor_units and balance is not None:
+            balance = to_minor(balance, data.get('currency'))
+
         return cls(
             uuid=data.get('uuid'),
             name=data['name'],
-            balance=data.get('balance'),
-            extern=data.get('extern')
+            balance=balance,
+            extern=data.get('extern'),
+            currency=data.get('currency')
         )
 
+    def remove(self, transaction: Union[Transaction, str]) -> None:
+        """Remove the *transaction* from the account.
+
+        The *transaction* can either be the :class:`Transaction` itself or
+        its uuid. Nothing happens if the transaction is not booked with the
+        account.
+        """
+        transaction = self.transactions.remove(transaction)
+        if transaction is not None:
+            self._pop(transaction)
+
+    def reset(self) -> None:
+        """Remove all transactions from the account."""
+        self.transactions.clear()
+        self._delta = 0
+        self._dates.clear()
+        self._ordered.clear()
+        self._values.clear()
+        self._cumsum.clear()
+        self._valid = 0
+        self._booked.clear()
+
+    def sign(self, transaction: Transaction) -> int:
+        """Return the sign of the *transaction* value for this account.
+
+        The sign is zero if the account is both a source and receiver of the
+        transaction or if the transaction is used to rebalance a budget.
+        Otherwise, it is negative if the account is one of the transaction's
+        sources.
+        """
+        if ((self.uuid in transaction.sources
+             and self.uuid in transaction.receiver)
+                or transaction.budget_rebalance):
+            return 0
+        return -1 if self.uuid in transaction.sources else 1
+
     def history(self, periode: List[datetime.date] =
                 [datetime.date.min, datetime.date.max]) -> dict:
-        transactions = list(filter(
-            lambda t: min(periode) <= t.date <= max(periode),
-            self.transactions
-        ))
-        return {'balance': [t.balance for t in transactions],
-                'date': [t.date.isoformat() for t in transactions]}
-
-    def to_dict(self) -> dict:
+        """Return the balance history in the *periode*.
+
+        The returned dictionary has the key ``'balance'`` with the running
+        balance of the account after each transaction in the *periode* and
+        ``'date'`` with the transaction's date in ISO format. The transactions
+        are ordered by date. Transactions of the same date are in the order
+        they were added.
+        """
+        lower = bisect.bisect_left(self._dates, min(periode).toordinal())
+        upper = bisect.bisect_right(self._dates, max(periode).toordinal())
+        self._settle(upper)
+        start = self._opening
+        return {'balance': [start + c for c in self._cumsum[lower:upper]],
+                'date': [t.date.isoformat()
+                         for t in self._ordered[lower:upper]]}
+
+    def window(self, start: datetime.date, end: datetime.date
+               ) -> List[Tuple[Transaction, float]]:
+        """Return the transactions booked from *start* to *end*.
+
+        The returned list has a tuple of each transaction with a value date
+        from *start* up to and including *end* and its signed value for this
+        account. The transactions are ordered by date like in
+        :meth:`history()`. The window is found by bisecting the transactions,
+        so only the transactions in it are read.
+        """
+        lower = bisect.bisect_left(self._dates, start.toordinal())
+        upper = bisect.bisect_right(self._dates, end.toordinal())
+        return list(zip(self._ordered[lower:upper],
+                        self._values[lower:upper]))
+
+    @property
+    def _opening(self) -> float:
+        return self._init_balance
+
+    def to_dict(self, minor_units: bool = False) -> dict:
         """Return the account as dictionary.
 
         The returned dictionary has the following keys:
@@ -344,12 +748,18 @@ class Account():
         - ``'extern'`` the :attr:`extern` flag of the account
         - ``'name'`` the account :attr:`name`
         - ``'balance'`` the :attr:`balance` of the account
+        - ``'currency'`` the :attr:`currency` of the account
 
+        If *minor_units* is true, the balance is held in integer minor units
+        of the :attr:`currency` and returned as float in the major unit.
         """
+        balance = self.balance
         return {'uuid': self.uuid,
                 'extern': self.extern,
                 'name': self.name,
-                'balance': float(self.balance)}
+                'balance': (to_major(balance, self.currency) if minor_units
+                            else float(balance)),
+                'currency': self.currency}
 
 
 class BookKeeper():
@@ -357,14 +767,44 @@ class BookKeeper():
 
     The bookkeeper is the one, who records all :attr:`transactions` between all
     :attr:`accounts` and :attr:`budgets`. An account, budget or transaction can
-    be :meth:`add()` to the book to keep a record of it. The bookkeeper can also
-    :meth:`replace()` an account by another account or :meth:`remove()` a
-    transaction from all accounts or budgets where it was booked.
+    be :meth:`add()` to the book to keep a record of it. Many transactions are
+    added at once by :meth:`add_many()` or within a :meth:`batch()`. The
+    bookkeeper can also :meth:`replace()` an account by another account or
+    :meth:`remove()` a transaction from all accounts or budgets where it was
+    booked.
+
+    For each account or budget uuid, the bookkeeper keeps an index of the
+    transactions booked with it. That way, removing or rebooking a transaction
+    only touches the accounts named in its sources and receiver.
+
+    Each change of the book publishes an immutable
+    :class:`~mone.snapshot.Snapshot` of it, which is returned by
+    :meth:`snapshot()`. Transactions are never changed once they are added,
+    but replaced by changed copies, so that a snapshot can be read while the
+    book changes. Changes of the book from several threads are serialized by
+    a lock.
+
+    A bank statement of an account is checked against the book by
+    :meth:`reconcile()`.
+
+    Transactions which repeat, e.g. the rent, are added once as
+    :class:`~mone.recurring.Recurring` template. Their occurrences are
+    :meth:`expand()` lazily for the dates a query needs, e.g. by
+    :meth:`balance_at()`, and are only booked by :meth:`materialize()`. The
+    balances are projected into the future by :meth:`forecast()`.
+
+    Accounts can be kept in different currencies. If the exchange
+    :attr:`rates` are set, the :attr:`balance` of the book and its
+    aggregations are consolidated into the base currency of the rates.
     """
 
     def __init__(self, accounts: Accounts, budgets: Accounts,
-                 transactions: Transactions) -> None:
-        """Open the book with the *accounts*, *budgets* and *transactions*."""
+                 transactions: Transactions,
+                 rates: 'mone.exchange.ExchangeRates' = None) -> None:
+        """Open the book with the *accounts*, *budgets* and *transactions*.
+
+        The exchange *rates* are optional.
+        """
 
         self.accounts = accounts
         """The :class:`Accounts` used for bookkeeping."""
@@ -375,59 +815,633 @@ class BookKeeper():
         self.transactions = transactions
         """The :class:`Transactions` which are recorded by the bookkeeper."""
 
+        self.version = 0
+        """The version of the book which is incremented by each change of its
+        accounts, budgets or transactions."""
+
+        self._rates = rates
+
+        self._booked = {}
+        """Map each account uuid to the :class:`Transactions` booked with
+        it."""
+
+        self._tagged = {}
+        """Map each tag to the :class:`Transactions` tagged with it."""
+
+        self._imported = {}
+        """Map the fingerprint of each imported transaction to its uuid."""
+
+        self.recurring = {}
+        """The :class:`~mone.recurring.Recurring` templates by uuid."""
+
+        self._search = None
+        """The :class:`~mone.search.TrigramIndex` of the transaction
+        descriptions, built by the first :meth:`search()`."""
+
+        self._ledger = None
+        """The :class:`~mone.ledger.Ledger` of the book's version."""
+
+        self._forecast = None
+        """The arguments and result of the last :meth:`forecast()`."""
+
+        self._batch = None
+
+        self._chunks = Chunks(transactions)
+        """The transactions in chunks shared between snapshots."""
+
+        self._snapshot = None
+
+        self._lock = threading.RLock()
+        """The lock held by each change of the book."""
+
         self.__bookall__()
+        self.__publish__()
 
     def __book__(self, transaction: Transaction) -> None:
         self.accounts.add(transaction)
         self.budgets.add(transaction)
+        self.__track__(transaction)
+
+    def __track__(self, transaction: Transaction) -> None:
+        # keep the booked transaction in the indexes of the book
+        self.version += 1
+        booked = self._booked
+        for uuid in transaction.sources | transaction.receiver:
+            if uuid not in booked:
+                booked[uuid] = Transactions()
+            booked[uuid].append(transaction)
+
+        tagged = self._tagged
+        for tag in transaction.tags:
+            if tag not in tagged:
+                tagged[tag] = Transactions()
+            tagged[tag].append(transaction)
+
+        if transaction.fingerprint is not None:
+            self._imported[transaction.fingerprint] = transaction.uuid
+
+        if self._search is not None:
+            self._search.add(transaction.uuid, transaction.description)
+
+    def __classify__(self, transaction: Transaction) -> None:
+        transaction.budget_rebalance = ((len(transaction.sources)
+                                         == len(transaction.receiver)
+                                         == 1)
+                                        and transaction.receiver.issubset(
+                                            self.budgets))
+
+    def __unbook__(self, transaction: Transaction) -> None:
+        self.version += 1
+        self.accounts.remove(transaction)
+        self.budgets.remove(transaction)
 
-    def __bookall__(self) -> None:
-        for transaction in self.transactions:
-            self.__book__(transaction)
+        booked = self._booked
+        for uuid in transaction.sources | transaction.receiver:
+            transactions = booked.get(uuid)
+            if transactions is not None:
+                transactions.remove(transaction)
+                if not transactions:
+                    del booked[uuid]
+
+        tagged = self._tagged
+        for tag in transaction.tags:
+            transactions = tagged.get(tag)
+            if transactions is not None:
+                transactions.remove(transaction)
+                if not transactions:
+                    del tagged[tag]
+
+        if self._imported.get(transaction.fingerprint) == transaction.uuid:
+            del self._imported[transaction.fingerprint]
+
+        if self._search is not None:
+            self._search.remove(transaction.uuid)
+
+    def __bookall__(self, transactions: List[Transaction] = None) -> None:
+        # book the transactions at once, so that each account sorts them once;
+        # by default all transactions of the book, which are classified again
+        # since the rebalance flag isn't stored, e.g. in a snapshot
+        if transactions is None:
+            transactions = list(self.transactions)
+            for transaction in transactions:
+                self.__classify__(transaction)
+
+        self.accounts.add_many(transactions)
+        self.budgets.add_many(transactions)
+        for transaction in transactions:
+            self.__track__(transaction)
+
+    def __publish__(self) -> None:
+        accounts = [AccountState(a.uuid, a.name, a.balance, a.extern,
+                                 a.currency)
+                    for a in self.accounts.values()]
+        budgets = [BudgetState(b.uuid, b.name, b.balance, b.budget,
+                               b.currency)
+                   for b in self.budgets.values()]
+        # a single assignment, so that readers see either snapshot
+        self._snapshot = Snapshot(self.version, accounts, budgets,
+                                  self._chunks.freeze(), self.balance,
+                                  self._base)
+
+    def _check_currency(self, transaction: Union[
+            Transaction, mone.recurring.Recurring]) -> None:
+        # the accounts book the raw value, so it must be in their currency;
+        # external accounts are someone else's pocket in any currency
+        if transaction.currency is None:
+            return
+        base = self._base
+        for uuid in transaction.sources | transaction.receiver:
+            acct = self.accounts.get(uuid) or self.budgets.get(uuid)
+            if acct is None or acct.extern:
+                continue
+            if (acct.currency or base) != transaction.currency:
+                raise ValueError(f'transaction in {transaction.currency} '
+                                 f'can not be booked with {acct!r}')
+
+    def _consolidate(self, account: Account, balance: float,
+                     date: datetime.date = None) -> float:
+        """Return the *balance* of the *account* in the book's currency."""
+        rates = self._rates
+        if rates is None or account.currency in (None, rates.base):
+            return balance
+        value = rates.convert(balance, account.currency, date=date)
+        if isinstance(balance, int):
+            # from the minor unit of the account's into the base currency's
+            shift = exponent(rates.base) - exponent(account.currency)
+            return round(value * 10 ** shift)
+        return value
+
+    @property
+    def _base(self) -> str:
+        # the currency of the book's balance
+        return self._rates and self._rates.base
+
+    def _owned(self) -> Iterator[Account]:
+        # the accounts paying into the balance, i.e. neither external nor
+        # budgets kept with the accounts
+        return (a for a in self.accounts.values()
+                if isinstance(a, Account) and not isinstance(a, Budget)
+                and not a.extern)
 
     def __repr__(self) -> str:
         return f'BookKeeper({self.accounts, self.budgets, self.transactions})'
 
-    def add(self, other: Union[Account, Budget, Transaction]) -> None:
+    def add(self, other: Union[Account, Budget, Transaction,
+                               mone.recurring.Recurring]) -> None:
         """Add *other* to the book.
 
         If *other* is a transaction, the bookkeeper checks if the transaction
         is used to rebalance a budget and sets
         :attr:`~Transaction.budget_rebalance` accordingly before adding it to
-        the book.
+        the book. A :class:`~mone.recurring.Recurring` template is added to
+        the :attr:`recurring` templates without booking any of its
+        occurrences.
+
+        Raise a :class:`ValueError` if the :attr:`~Transaction.currency` of a
+        transaction or template differs from the currency of one of its non
+        external accounts or budgets, since balances are kept in the currency
+        of each account.
         """
-        if isinstance(other, Account):
-            if isinstance(other, Budget):
-                self.budgets[other.uuid] = other
-            else:
-                self.accounts[other.uuid] = other
-        elif isinstance(other, Transaction):
-            other.budget_rebalance = ((len(other.sources)
-                                       == len(other.receiver)
-                                       == 1)
-                                      and other.receiver.issubset(self.budgets))
-            self.transactions.append(other)
-            self.__book__(other)
+        with self._lock:
+            if isinstance(other, Account):
+                self.version += 1
+                if isinstance(other, Budget):
+                    self.budgets[other.uuid] = other
+                else:
+                    self.accounts[other.uuid] = other
+                self.__publish__()
+            elif isinstance(other, Transaction):
+                if self._batch is not None:
+                    self._batch.append(other)
+                    return
+
+                self._check_currency(other)
+                self.__classify__(other)
+                self.transactions.append(other)
+                self._chunks.append(other)
+                self.__book__(other)
+                self.__publish__()
+            elif isinstance(other, mone.recurring.Recurring):
+                self._check_currency(other)
+                self.version += 1
+                self.recurring[other.uuid] = other
+                self.__publish__()
+
+    def aggregate(self, by: Union[str, List[str]], measure: str = 'sum',
+                  where: Union[Callable[[Transaction], bool],
+                               Iterable[bool]] = None,
+                  minor_units: bool = False) -> dict:
+        """Return the booked values aggregated *by* the dimensions.
+
+        The values booked with the accounts or budgets are grouped by one or
+        more dimensions ``'account'``, ``'budget'``, ``'tag'``, ``'week'``,
+        ``'month'`` or ``'year'`` and aggregated by the *measure* ``'sum'``,
+        ``'count'`` or ``'mean'``. Only the transactions for which *where*
+        returns true are aggregated. Instead of a function called with each
+        transaction, *where* can be a boolean array with one element per
+        transaction in the order of the :attr:`transactions`, which selects
+        them without calling back into Python. The spendings and income per
+        budget and month are e.g. returned by::
+
+           >>> book.aggregate(['budget', 'month'])
+           {('3e334bce-6f0e-11eb-a197-1e00da345a48', '2021-03'): -450.0, ...}
+
+        The aggregation is computed on the :meth:`ledger()` of the book. If
+        the values of the book are held in integer *minor_units*, the
+        aggregated values are returned in the major unit. If the exchange
+        :attr:`rates` are set, the values are converted into their base
+        currency by the rates at the date of each transaction.
+
+        .. seealso:: :meth:`mone.ledger.Ledger.aggregate()`
+        """
+        ledger = self.ledger(minor_units)
+        if callable(where):
+            where = [bool(where(t)) for t in self.transactions]
+        return ledger.aggregate(by, measure, where, self.rates)
+
+    def add_many(self, transactions: Iterable[Transaction]) -> None:
+        """Add all *transactions* to the book at once.
+
+        Same as :meth:`add()` for each transaction, but the
+        :attr:`transactions` are extended by all *transactions* in one go
+        before they are booked. Raise a :class:`TypeError` if any of the
+        *transactions* is not a :class:`Transaction` and a
+        :class:`ValueError` if its currency can't be booked, in which case
+        none is added.
+        """
+        transactions = list(transactions)
+        for transaction in transactions:
+            Transactions._check(transaction)
+            self._check_currency(transaction)
+
+        with self._lock:
+            for transaction in transactions:
+                self.__classify__(transaction)
+
+            self.transactions.extend(transactions)
+            self._chunks.extend(transactions)
+            self.__bookall__(transactions)
+            self.__publish__()
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[BookKeeper]:
+        """Return a context in which transactions are added as batch.
+
+        All transactions which are :meth:`add()` to the book within the
+        context are collected and added by :meth:`add_many()` when the context
+        exits. If the context exits with an exception, the collected
+        transactions are discarded. Nested contexts join the outermost
+        batch::
+
+           >>> with book.batch():
+           ...     for transaction in transactions:
+           ...         book.add(transaction)
+
+        Other threads can't change the book within the context.
+        """
+        with self._lock:
+            if self._batch is not None:
+                yield self
+                return
+
+            self._batch = []
+            try:
+                yield self
+                batch = self._batch
+            finally:
+                self._batch = None
+
+            self.add_many(batch)
+
+    @property
+    def rates(self) -> 'mone.exchange.ExchangeRates':
+        """The :class:`~mone.exchange.ExchangeRates` to consolidate accounts
+        in other currencies or ``None`` if all accounts have the same
+        currency."""
+        return self._rates
+
+    @rates.setter
+    def rates(self, rates: 'mone.exchange.ExchangeRates') -> None:
+        with self._lock:
+            self._rates = rates
+            self.__publish__()
 
     @property
     def balance(self) -> float:
         """The sum of all :attr:`accounts` balances.
 
+        The balances of accounts in other currencies are converted by the
+        latest exchange :attr:`rates`. Since each account keeps its balance,
+        this converts one value per account and not per transaction.
+
         .. note:: External accounts are excluded from the balance.
         """
-        accts = filter(lambda a: type(a) == Account and not a.extern,
-                       self.accounts.values())
-        return sum(map(lambda a: a.balance, accts))
+        return sum(map(lambda a: self._consolidate(a, a.balance),
+                       self._owned()))
+
+    def balance_at(self, date: datetime.date,
+                   recurring: bool = False) -> float:
+        """Return the sum of all :attr:`accounts` balances at the *date*.
+
+        The balances of accounts in other currencies are converted by the
+        exchange :attr:`rates` at the *date*. If *recurring* is true, the
+        occurrences of the :attr:`recurring` templates up to the *date* which
+        are not booked yet are included. Only their dates are expanded, one
+        at a time, so that no transactions are created.
+
+        .. note:: External accounts are excluded from the balance.
+
+        .. seealso:: :meth:`Account.balance_at()`
+        """
+        balance = sum(map(lambda a: self._consolidate(a, a.balance_at(date),
+                                                      date), self._owned()))
+        if recurring:
+            balance += self._recurring_at(date)
+        return balance
+
+    def _recurring_at(self, date: datetime.date) -> float:
+        # the balance of all occurrences of the templates up to the date which
+        # are not booked
+        total, transactions = 0, self.transactions
+        for template in self.recurring.values():
+            # sign the value for each account as a booked occurrence
+            transaction = next(template.transactions(end=date), None)
+            if transaction is None:
+                continue
+            self.__classify__(transaction)
+            value = 0
+            for uuid in transaction.sources | transaction.receiver:
+                acct = self.accounts.get(uuid)
+                if (isinstance(acct, Account) and not isinstance(acct, Budget)
+                        and not acct.extern):
+                    value += self._consolidate(
+                        acct, acct.sign(transaction) * template.value, date)
+            if not value:
+                continue
+            total += value * sum(
+                1 for d in template.dates(end=date)
+                if template.occurrence(d) not in transactions)
+        return total
+
+    def booked(self, uuid: str) -> List[Transaction]:
+        """Return the transactions booked with the account *uuid*.
+
+        The account *uuid* can be any account or budget used as source or
+        receiver of a transaction, even if it is not part of the book.
+        """
+        return list(self._booked.get(uuid, ()))
+
+    def expand(self, start: datetime.date = None, end: datetime.date = None
+               ) -> Iterator[Transaction]:
+        """Yield the occurrences of the :attr:`recurring` templates.
+
+        The occurrences from *start* to *end* which are not booked yet are
+        yielded as transactions ordered by date. They are created one at a
+        time while iterating, so that e.g. a projection over many years
+        doesn't hold all of them at once.
+
+        .. seealso:: :meth:`mone.recurring.Recurring.transactions()`
+        """
+        transactions = self.transactions
+        occurrences = heapq.merge(
+            *(t.transactions(start, end) for t in self.recurring.values()),
+            key=lambda t: t.date)
+        for transaction in occurrences:
+            if transaction.uuid not in transactions:
+                yield transaction
+
+    def forecast(self, horizon: int = 12, step: str = 'month',
+                 trailing: int = 3, start: datetime.date = None,
+                 minor_units: bool = False) -> dict:
+        """Return the balances projected *horizon* steps ahead.
+
+        The balances of all non external accounts and of all budgets are
+        projected on a grid of dates from *start*, by default today, in steps
+        of a ``'day'``, ``'week'`` or ``'month'``. The projection adds to the
+        booked balances
+
+        - the occurrences of the :attr:`recurring` templates which are not
+          booked yet, and
+        - for each step the average of the transactions booked with a budget
+          in the *trailing* steps before *start*, except for occurrences of
+          the recurring templates.
+
+        The returned dictionary has the keys ``'date'`` with the dates of the
+        grid in ISO format, ``'accounts'`` and ``'budgets'`` with the
+        projected balances by uuid and ``'balance'`` with the projected
+        :attr:`balance` of the book::
+
+           >>> book.forecast(3)
+           {'date': ['2021-03-14', '2021-04-14', '2021-05-14', '2021-06-14'],
+            'accounts': {'9323dfb6-6fd3-11eb-8b50-1e00da345a48': [...], ...},
+            'budgets': {...},
+            'balance': [5180.0, 5742.5, 6305.0, 6867.5]}
+
+        The projection is computed by :meth:`mone.ledger.Ledger.forecast()`
+        for all accounts and dates at once. The projected balances are kept
+        until the :attr:`version` of the book or of its exchange
+        :attr:`rates` changes. Raise a :class:`ValueError` for an unknown
+        *step* and an :class:`ImportError` if NumPy is not installed.
+        """
+        if step not in STEPS:
+            raise ValueError(f'unknown step {step!r}')
+        start = start or datetime.date.today()
+        rates = self._rates
+        key = (self.version, horizon, step, trailing, start, minor_units,
+               rates, rates and rates.version)
+        if self._forecast is None or self._forecast[0] != key:
+            self._forecast = (key, *self._project(horizon, step, trailing,
+                                                  start, minor_units))
+
+        _, dates, index, balance, total = self._forecast
+        return {
+            'date': [d.isoformat() for d in dates],
+            'accounts': {u: balance[index[u]].tolist()
+                         for u, a in self.accounts.items() if not a.extern},
+            'budgets': {u: balance[index[u]].tolist() for u in self.budgets},
+            'balance': total.tolist(),
+        }
+
+    def _project(self, horizon: int, step: str, trailing: int,
+                 start: datetime.date, minor_units: bool) -> tuple:
+        # the dates of the grid, the ledger index of each account, the
+        # projected balances of all accounts and budgets and the one of the
+        # book
+        from mone.ledger import np
+
+        ledger = self.ledger(minor_units)
+        dates = [_step(start, step, k) for k in range(horizon + 1)]
+        since = _step(start, step, -trailing)
+
+        transactions = self.transactions
+        recurring, exclude = [], set()
+        for template in self.recurring.values():
+            exclude.update(template.occurrence(d)
+                           for d in template.dates(since, start))
+            occurrences = [d.toordinal()
+                           for d in template.dates(end=dates[-1])
+                           if template.occurrence(d) not in transactions]
+            if not occurrences:
+                continue
+
+            # sign the value for each account as a booked occurrence, in
+            # the units of the ledger
+            units = ledger.units(template.currency) if minor_units else \
+                ledger.scale
+            transaction = next(template.transactions())
+            self.__classify__(transaction)
+            values = np.zeros(len(ledger.start))
+            for uuid in transaction.sources | transaction.receiver:
+                acct = self.accounts.get(uuid) or self.budgets.get(uuid)
+                if acct is not None:
+                    values[ledger.index[uuid]] = (acct.sign(transaction)
+                                                  * template.value * units)
+            recurring.append((occurrences, values))
+
+        balance = ledger.forecast([d.toordinal() for d in dates],
+                                  since.toordinal(), trailing, recurring,
+                                  exclude)
+
+        total = sum((self._consolidate(a, balance[ledger.index[a.uuid]])
+                     for a in self._owned()),
+                    np.zeros(len(dates)))
+        return dates, ledger.index, balance, total
+
+    def imported(self, fingerprint: str) -> Transaction:
+        """Return the transaction imported with the *fingerprint*.
+
+        If no transaction in the book has the *fingerprint*, ``None`` is
+        returned. Use this to skip the rows of an export which were already
+        imported before::
+
+           >>> rows = Transactions.iter_csv('export.csv', 2, 0, 1,
+           ...                              account=bank.uuid,
+           ...                              counterpart=extern.uuid)
+           >>> new = [t for t in rows if not book.imported(t.fingerprint)]
+           >>> book.add_many(new)
+
+        """
+        uuid = self._imported.get(fingerprint)
+        return None if uuid is None else self.transactions.get(uuid)
+
+    def ledger(self, minor_units: bool = False) -> 'mone.ledger.Ledger':
+        """Return the :class:`~mone.ledger.Ledger` of the book.
+
+        The ledger is kept until the :attr:`version` of the book changes.
+        Raise an :class:`ImportError` if NumPy is not installed.
+        """
+        from mone.ledger import Ledger
 
-    def remove(self, transaction: Transaction) -> None:
+        ledger = self._ledger
+        if (ledger is None or ledger.version != self.version
+                or ledger.minor_units != minor_units):
+            ledger = self._ledger = Ledger(self, minor_units=minor_units)
+        return ledger
+
+    def materialize(self, until: datetime.date) -> int:
+        """Book the occurrences of the :attr:`recurring` templates.
+
+        All occurrences up to and including the date *until* which are not
+        booked yet are added to the book by :meth:`add_many()`. Since each
+        occurrence has a fixed uuid, materializing the same dates again books
+        nothing. Return the number of booked transactions.
+        """
+        transactions = list(self.expand(end=until))
+        self.add_many(transactions)
+        return len(transactions)
+
+    def reconcile(self, account: str, statement: Iterable[Transaction],
+                  tolerance: datetime.timedelta = datetime.timedelta(days=3)
+                  ) -> Reconciliation:
+        """Reconcile the *statement* with the transactions of the *account*.
+
+        The *statement* are the transactions of a bank statement of the
+        *account* uuid, e.g. read by :meth:`Transactions.from_csv()` for the
+        same account. Each of them is matched with a transaction
+        booked with the account of equal signed value and a value date
+        within the *tolerance*. The returned :class:`Reconciliation` holds
+        the matched pairs, the statement rows which are missing in the book
+        and the booked transactions in the statement's period which are
+        extra::
+
+           >>> statement = Transactions.from_csv('march.csv', 2, 0, 1,
+           ...                                   account=bank.uuid,
+           ...                                   counterpart=extern.uuid)
+           >>> result = book.reconcile(bank.uuid, statement)
+           >>> result.missing
+           [Transaction(4.5, 'Coffee', ...)]
+
+        Both sides are sorted by value and date and merged in one pass, so
+        reconciling *n* rows takes *O(n log n)* time. Only the transactions
+        booked within the statement's period and the *tolerance* are read,
+        by bisecting the account's transactions ordered by value date. Of
+        several rows of equal value, the earliest are matched first. Raise a
+        :class:`KeyError` if the *account* is neither an account nor a budget
+        of the book.
+        """
+        acct = self.accounts.get(account) or self.budgets[account]
+        statement = list(statement)
+        if not statement:
+            return Reconciliation([], [], [])
+
+        days = tolerance.days
+        dates = [t.date.toordinal() for t in statement]
+        start, end = min(dates), max(dates)
+        window = acct.window(datetime.date.fromordinal(start - days),
+                             datetime.date.fromordinal(end + days))
+        booked = [t for t, _ in window]
+
+        def cents(value: float) -> int:
+            return value if isinstance(value, int) else round(value * 100)
+
+        rows = sorted((cents(acct.sign(t) * t.value), d, i)
+                      for i, (t, d) in enumerate(zip(statement, dates)))
+        entries = sorted((cents(v), t.date.toordinal(), i)
+                         for i, (t, v) in enumerate(window))
+
+        matched, missing, extra = [], [], []
+        i = j = 0
+        while i < len(rows) and j < len(entries):
+            (value, date, row), (other, day, entry) = rows[i], entries[j]
+            if value < other or (value == other and date < day - days):
+                missing.append(row)
+                i += 1
+            elif value > other or date > day + days:
+                extra.append(entry)
+                j += 1
+            else:
+                matched.append((row, entry))
+                i += 1
+                j += 1
+        missing.extend(row for _, _, row in rows[i:])
+        extra.extend(entry for _, _, entry in entries[j:])
+
+        # booked transactions outside the period are only used for matching
+        extra = [e for e in extra
+                 if start <= booked[e].date.toordinal() <= end]
+        return Reconciliation(
+            [(statement[r], booked[e]) for r, e in sorted(matched)],
+            [statement[r] for r in sorted(missing)],
+            [booked[e] for e in sorted(extra)])
+
+    def remove(self, transaction: Union[Transaction, str]) -> None:
         """Remove the *transaction* from the book.
 
         The *transaction* is removed from the :attr:`transactions`,
-        :attr:`accounts` and :attr:`budgets`.
+        :attr:`accounts` and :attr:`budgets`. It can either be the
+        :class:`Transaction` itself or its uuid.
         """
-        self.transactions.remove(transaction)
-        self.accounts.remove(transaction)
-        self.budgets.remove(transaction)
+        with self._lock:
+            if isinstance(transaction, str):
+                transaction = self.transactions.get(transaction)
+
+            if transaction is None:
+                return
+
+            self.transactions.remove(transaction)
+            self._chunks.remove(transaction)
+            self.__unbook__(transaction)
+            self.__publish__()
 
     def replace(self, current: str, replacement: str) -> None:
         """Replace the *current* by *replacement*.
@@ -438,39 +1452,134 @@ class BookKeeper():
         because it was merged with another account, it can be replaced by the
         other account move all transactions booked with it to the other
         account.
+
+        Only the transactions booked with *current* are rebooked. They are
+        replaced by updated copies, so that snapshots of the book keep the
+        transactions as they were. The :attr:`recurring` templates are
+        updated as well.
         """
-        if current in self.accounts:
-            del self.accounts[current]
-        elif current in self.budgets:
-            del self.budgets[current]
+        with self._lock:
+            self.version += 1
+            if current in self.accounts:
+                del self.accounts[current]
+            elif current in self.budgets:
+                del self.budgets[current]
+
+            transactions = []
+            for transaction in self.booked(current):
+                self.__unbook__(transaction)
+                transaction = transaction.copy()
+                transaction.update(current, replacement)
+                self.__book__(transaction)
+                transactions.append(transaction)
+
+            self.transactions.update(transactions)
+            self._chunks.update(transactions)
+            for template in self.recurring.values():
+                template.update(current, replacement)
+            self.__publish__()
+
+    def search(self, query: str, limit: int = None, offset: int = 0,
+               fuzzy: bool = True) -> List[Transaction]:
+        """Return the transactions with a description matching the *query*.
+
+        Transactions with a description containing the *query* are returned
+        first, followed by those with a similar description if *fuzzy* is
+        true. The results are paginated by *offset* and *limit*. The search
+        ignores the case of the *query* and description.
+
+        The first search builds an index of all descriptions which is kept up
+        to date afterwards.
+
+        .. seealso:: :class:`mone.search.TrigramIndex`
+        """
+        with self._lock:
+            if self._search is None:
+                search = TrigramIndex()
+                for transaction in self.transactions:
+                    search.add(transaction.uuid, transaction.description)
+                self._search = search
+            uuids = self._search.search(query, limit, offset, fuzzy)
+        return list(map(self.transactions.get, uuids))
+
+    def snapshot(self) -> Snapshot:
+        """Return the :class:`~mone.snapshot.Snapshot` of the book.
+
+        The snapshot is immutable and of the current :attr:`version` of the
+        book. It is safe to read it from other threads while the book is
+        changed.
+        """
+        return self._snapshot
 
-        for transaction in self.transactions:
-            transaction.update(current, replacement)
+    def tagged(self, include: Iterable[str] = (), exclude: Iterable[str] = (),
+               any_tag: bool = False) -> Transactions:
+        """Return the transactions selected by their tags.
 
-        self.transactions.overwrite(self.transactions)
-        self.accounts.reset()
-        self.budgets.reset()
-        self.__bookall__()
+        The returned transactions are tagged with all tags in *include*, or
+        with at least one of them if *any_tag* is true, and with none of the
+        tags in *exclude*. If *include* is empty, all transactions are
+        selected before the excluded ones are removed. As an example, all
+        groceries which were not reimbursed are returned by::
+
+           >>> book.tagged(['groceries'], exclude=['reimbursed'])
+
+        The bookkeeper keeps an index of the transactions by tag, so that
+        only the transactions with the *include* tags are looked at.
+        """
+        tagged = self._tagged
+        postings = [tagged.get(tag, Transactions())
+                    for tag in dict.fromkeys(include)]
+        excluded = [tagged[tag] for tag in exclude if tag in tagged]
+
+        if not postings:
+            candidates = self.transactions
+        elif any_tag:
+            candidates = Transactions()
+            for transactions in postings:
+                candidates.extend(transactions)
+        else:
+            # start with the least used tag
+            postings.sort(key=len)
+            candidates = filter(
+                lambda t: all(t in p for p in postings[1:]), postings[0])
+
+        return Transactions(filter(
+            lambda t: not any(t in e for e in excluded), candidates))
+
+    def tag_totals(self, tags: Iterable[str] = None) -> dict:
+        """Return the sum of transaction values by tag.
+
+        The values are summed up for each tag in *tags* or all tags if *tags*
+        is not given.
+        """
+        tagged = self._tagged
+        tags = tagged.keys() if tags is None else tags
+        return {tag: sum(t.value for t in tagged.get(tag, ()))
+                for tag in tags}
 
-    def to_dict(self, full: bool = False) -> dict:
+    def to_dict(self, full: bool = False, minor_units: bool = False) -> dict:
         """Return the book as dictionary.
 
-        When *full* is true, all transactions are returned additionally. The
-        returned dictionary has the keys:
+        When *full* is true, all transactions are returned additionally. If
+        *minor_units* is true, all values of the book are held in integer minor
+        units and returned as floats in the major unit. The returned dictionary
+        has the keys:
 
         - ``'accounts'`` a list of all accounts
         - ``'balance'`` the book's balance
         - ``'budgets'`` a list of all budgets
 
         """
+        balance = self.balance
         data = {
-            'accounts': self.accounts.to_dict(),
-            'budgets': self.budgets.to_dict(),
-            'balance': float(self.balance)
+            'accounts': self.accounts.to_dict(minor_units),
+            'budgets': self.budgets.to_dict(minor_units),
+            'balance': (to_major(balance, self._base) if minor_units
+                        else float(balance))
         }
 
         if full:
-            data['transactions'] = self.transactions.to_dict()
+            data['transactions'] = self.transactions.to_dict(minor_units)
 
         return data
 
@@ -482,8 +1591,11 @@ class Budget(Account):
     shows how much money is left to spend.
     """
 
+    __slots__ = ('budget',)
+
     def __init__(self, name: str, budget: float = 0.0,
-                 balance: float = 0.0, uuid: str = None) -> None:
+                 balance: float = 0.0, uuid: str = None,
+                 currency: str = None) -> None:
         """
         Extend the :class:`Account` to provide a *budget*.
         """
@@ -491,7 +1603,7 @@ class Budget(Account):
         self.budget = budget
         """The budget."""
 
-        super().__init__(name, balance, uuid=uuid)
+        super().__init__(name, balance, uuid=uuid, currency=currency)
 
     def __repr__(self) -> str:
         return 'Budget(%r, %f, %f)' % (
@@ -505,41 +1617,71 @@ class Budget(Account):
         The budget's balance is the sum of all transactions and the set
         budget.
         """
-        def sign(t: Transaction) -> int:
-            return -1 if self.uuid in t.sources else 1
+        return self._opening + self._delta
+
+    @property
+    def _opening(self) -> float:
+        return self.budget
 
-        return sum(map(lambda t: sign(t) * t.value,
-                       self.transactions),
-                   self.budget)
+    def sign(self, transaction: Transaction) -> int:
+        """Return the sign of the *transaction* value for the budget.
+
+        Other than for an :class:`Account`, the sign is negative whenever the
+        budget is one of the transaction's sources.
+        """
+        return -1 if self.uuid in transaction.sources else 1
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'Budget':
+    def from_dict(cls, data: dict, minor_units: bool = False) -> 'Budget':
+        budget, balance = data.get('budget'), data.get('balance')
+        currency = data.get('currency')
+        if minor_units:
+            budget = (to_minor(budget, currency) if budget is not None
+                      else budget)
+            balance = (to_minor(balance, currency) if balance is not None
+                       else balance)
+
         return cls(
             uuid=data.get('uuid'),
             name=data.get('name'),
-            budget=data.get('budget'),
-            balance=data.get('balance'),
+            budget=budget,
+            balance=balance,
+            currency=data.get('currency'),
         )
 
-    def to_dict(self) -> dict:
-        d = super().to_dict()
-        d['budget'] = float(self.budget)
+    def to_dict(self, minor_units: bool = False) -> dict:
+        d = super().to_dict(minor_units)
+        d['budget'] = (to_major(self.budget, self.currency) if minor_units
+                       else float(self.budget))
         return d
 
 
 class Transaction():
-    """A transaction of money between accounts."""
+    """A transaction of money between accounts.
+
+    Transactions are slotted and the sets of account ids in their
+    :attr:`sources` and :attr:`receiver` as well as their :attr:`tags` are
+    frozen sets shared between all transactions with equal sets. This keeps
+    the memory used per transaction small for large books.
+    """
+
+    __slots__ = ('value', 'date', 'description', 'budget_rebalance',
+                 'sources', 'receiver', 'tags', 'uuid', 'fingerprint',
+                 'currency', '_json')
 
     def __init__(self, value: float, description: str, sources: Set[str],
                  receiver: Set[str], date: datetime.date =
                  datetime.date.today(), tags: Set[str] = [], budget_rebalance:
-                 bool = False, uuid: str = None) -> None:
+                 bool = False, uuid: str = None,
+                 fingerprint: str = None, currency: str = None) -> None:
         """
         The transaction of the *value* and is executed at the defined *date*.
         The *description* gives information about the transaction. The *sources*
         are all accounts from which the *value* is subtracted and *receiver* is
         a list of all accounts to which the *value* is booked. A list of *tags*
-        can be add optional to the transaction.
+        can be add optional to the transaction. Imported transactions have the
+        *fingerprint* of their row in the import. The *currency* of the
+        *value* is by default the one of the accounts.
         """
         self.value = abs(value)
         """The value of the transaction.
@@ -556,44 +1698,77 @@ class Transaction():
 
         self.budget_rebalance = budget_rebalance
 
-        self.sources = sources
-        """A list of account ids from which the :attr:`value` is subtracted."""
+        self.sources = _frozen(sources)
+        """A frozen set of account ids from which the :attr:`value` is
+        subtracted."""
 
-        self.receiver = receiver
-        """A list of account ids to which the :attr:`value` is add."""
+        self.receiver = _frozen(receiver)
+        """A frozen set of account ids to which the :attr:`value` is add."""
 
         if not self.sources or not self.receiver:
             raise TypeError('Sources or receiver not defined.')
 
-        self.tags = tags
-        """A list of tags to help track the transaction."""
+        self.tags = _frozen(tags)
+        """A frozen set of tags to help track the transaction."""
 
         self.uuid = uuid if uuid else str(uuid1())
         """The transaction's unique identifier."""
 
+        self.fingerprint = fingerprint
+        """The fingerprint of the row the transaction was imported from or
+        ``None``.
+
+        .. seealso:: :meth:`Transactions.from_csv()`
+        """
+
+        self.currency = currency
+        """The currency code of the :attr:`value` or ``None`` if the value is
+        in the currency of the accounts.
+
+        A :class:`BookKeeper` books a transaction only with accounts of the
+        same currency, except for external accounts.
+        """
+
+        self._json = None
+
     def __repr__(self) -> str:
         return 'Transaction(%f, %r, %r, %r, %r, %r, %r)' % (
             self.value, self.description, self.sources, self.receiver,
             self.date, self.tags, self.budget_rebalance
         )
 
+    def copy(self) -> 'Transaction':
+        """Return a copy of the transaction with the same :attr:`uuid`."""
+        return Transaction(self.value, self.description, self.sources,
+                           self.receiver, self.date, self.tags,
+                           self.budget_rebalance, self.uuid, self.fingerprint,
+                           self.currency)
+
     @classmethod
-    def from_dict(cls, data: dict) -> 'Transaction':
+    def from_dict(cls, data: dict,
+                  minor_units: bool = False) -> 'Transaction':
         """Return a transaction from the dictionary.
 
         The dictionary *dict* has the same keys as the one returned by
-        :meth:`to_dict()`.
+        :meth:`to_dict()`. If *minor_units* is true, the value is converted
+        to integer minor units of its currency.
 
         .. seealso:: :meth:`to_dict()` for all keys.
         """
+        value = data.get('value')
+        if minor_units:
+            value = to_minor(value, data.get('currency'))
+
         return cls(
-            date=datetime.date.fromisoformat(data.get('date')),
+            date=_fromisoformat(data.get('date')),
             description=data.get('description'),
-            receiver=set(data.get('receiver')),
-            sources=set(data.get('sources')),
-            tags=set(data.get('tags')),
-            value=data.get('value'),
-            uuid=data.get('uuid')
+            receiver=data.get('receiver'),
+            sources=data.get('sources'),
+            tags=data.get('tags'),
+            value=value,
+            uuid=data.get('uuid'),
+            fingerprint=data.get('fingerprint'),
+            currency=data.get('currency')
         )
 
     def update(self, current: str, replacement: str) -> None:
@@ -602,14 +1777,25 @@ class Transaction():
         The *current* account in the sources and receiver is replaced by its
         *replacement*.
         """
+        self._json = None
         if current in self.receiver:
-            self.receiver.remove(current)
-            self.receiver.add(replacement)
+            self.receiver = _frozen((self.receiver - {current})
+                                    | {replacement})
         if current in self.sources:
-            self.sources.remove(current)
-            self.sources.add(replacement)
+            self.sources = _frozen((self.sources - {current}) | {replacement})
+
+    def to_json(self) -> bytes:
+        """Return the dictionary of :meth:`to_dict()` serialized as JSON.
 
-    def to_dict(self) -> dict:
+        The JSON is cached, so that serializing all transactions again, e.g.
+        for each request of a web client, is only a copy of the cached bytes.
+        The cache is cleared when the accounts are changed by :meth:`update()`.
+        """
+        if self._json is None:
+            self._json = json.dumps(self.to_dict()).encode()
+        return self._json
+
+    def to_dict(self, minor_units: bool = False) -> dict:
         """Return the transaction as dictionary.
 
         The dictionary has the following keys:
@@ -621,6 +1807,11 @@ class Transaction():
         - ``'sources'`` a list of the source's identifier
         - ``'tags'`` the list of :attr:`tags`
         - ``'value'`` the value of the transaction
+        - ``'fingerprint'`` the :attr:`fingerprint` of an imported transaction
+        - ``'currency'`` the :attr:`currency` of the value
+
+        If *minor_units* is true, the value is held in integer minor units of
+        the :attr:`currency` and returned as float in the major unit.
         """
         return {
             'uuid': self.uuid,
@@ -629,5 +1820,8 @@ class Transaction():
             'receiver': list(self.receiver),
             'sources': list(self.sources),
             'tags': list(self.tags),
-            'value': self.value,
+            'value': (to_major(self.value, self.currency) if minor_units
+                      else self.value),
+            'fingerprint': self.fingerprint,
+            'currency': self.currency,
         }
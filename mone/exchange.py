@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Exchange rates
+==============
+
+This module provides the :class:`ExchangeRates` to convert money between
+currencies. The accounts and transactions of a :mod:`~mone.book` can have a
+currency. If the :attr:`~mone.book.BookKeeper.rates` of a book are set, its
+balance is consolidated in the base currency of the rates::
+
+   >>> from mone.exchange import ExchangeRates
+   >>>
+   >>> book.rates = ExchangeRates.from_csv('rates.csv', base='EUR')
+   >>> book.balance  # in EUR
+
+.. currentmodule:: mone.exchange
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from typing import Dict, Iterable, List, Tuple
+import bisect
+import csv
+import datetime
+import itertools
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from mone.importer import date_parser
+
+
+class ExchangeRates():
+    """A table of exchange rates by currency and date.
+
+    Each rate is the amount of a currency for one unit of the :attr:`base`
+    currency at a date, e.g. 1.2 USD for 1 EUR. The rate of a date is the
+    last rate known at that date, so that e.g. weekends and holidays use the
+    rate of the last business day. Dates before the first rate of a currency
+    use its first rate.
+
+    The dates of each currency are kept sorted, so that a rate is looked up
+    by bisection. The rates of many dates, e.g. of all transactions of a
+    book, are looked up at once by :meth:`rates()` with
+    :func:`numpy.searchsorted`.
+    """
+
+    def __init__(self, base: str = 'EUR') -> None:
+        """Create an empty table of rates for the *base* currency."""
+        self.base = base
+        """The currency in which the rates are quoted."""
+
+        # the sorted date ordinals and their rates by currency
+        self._dates: Dict[str, List[int]] = {}
+        self._rates: Dict[str, List[float]] = {}
+        self._arrays: Dict[str, Tuple['np.ndarray', 'np.ndarray']] = {}
+
+        self.version = 0
+        """The version of the table which is incremented by each added
+        rate."""
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self._dates or self._is_base(currency)
+
+    def __repr__(self) -> str:
+        return f'ExchangeRates({self.base!r}, {sorted(self._dates)})'
+
+    def _is_base(self, currency: str) -> bool:
+        return currency is None or currency == self.base
+
+    def add(self, currency: str, date: datetime.date, rate: float) -> None:
+        """Add the *rate* of *currency* at the *date*.
+
+        A rate already known for the same date is replaced.
+        """
+        dates = self._dates.setdefault(currency, [])
+        rates = self._rates.setdefault(currency, [])
+        day = date.toordinal()
+        i = bisect.bisect_left(dates, day)
+        if i < len(dates) and dates[i] == day:
+            rates[i] = rate
+        else:
+            dates.insert(i, day)
+            rates.insert(i, rate)
+        self._arrays.pop(currency, None)
+        self.version += 1
+
+    def rate(self, currency: str, date: datetime.date = None) -> float:
+        """Return the rate of *currency* at the *date*.
+
+        If the *date* is not given, the latest rate is returned. The rate of
+        the :attr:`base` currency or ``None`` is always one. Raise a
+        :class:`KeyError` if no rate of the *currency* is known.
+        """
+        if self._is_base(currency):
+            return 1.0
+
+        dates, rates = self._dates[currency], self._rates[currency]
+        if date is None:
+            return rates[-1]
+        i = bisect.bisect_right(dates, date.toordinal())
+        return rates[max(i - 1, 0)]
+
+    def rates(self, currency: str, dates: Iterable[int]) -> 'np.ndarray':
+        """Return the rates of *currency* at each of the *dates*.
+
+        The *dates* are proleptic ordinals as returned by
+        :meth:`datetime.date.toordinal()`, e.g. the
+        :attr:`~mone.ledger.Ledger.date` of a ledger. Raise an
+        :class:`ImportError` if NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError('vectorized rates require numpy')
+
+        dates = np.asarray(dates, dtype=np.int64)
+        if self._is_base(currency):
+            return np.ones(len(dates))
+
+        if currency not in self._arrays:
+            self._arrays[currency] = (
+                np.asarray(self._dates[currency], dtype=np.int64),
+                np.asarray(self._rates[currency], dtype=float))
+        known, rates = self._arrays[currency]
+        i = np.searchsorted(known, dates, side='right') - 1
+        return rates[np.maximum(i, 0)]
+
+    def convert(self, value: float, currency: str, to: str = None,
+                date: datetime.date = None) -> float:
+        """Return the *value* in *currency* converted into the currency *to*.
+
+        The *value* is converted by the rates at the *date* or by the latest
+        rates. If *to* is not given, the value is converted into the
+        :attr:`base` currency.
+        """
+        if currency == to or (self._is_base(currency) and self._is_base(to)):
+            return value
+        return value / self.rate(currency, date) * self.rate(to, date)
+
+    @classmethod
+    def from_csv(cls, file: str, base: str = 'EUR', date: int = 0,
+                 currency: int = 1, rate: int = 2, skiprows: int = 0,
+                 delimiter: str = ',',
+                 datefmt: str = '%Y-%m-%d') -> 'ExchangeRates':
+        """Return the exchange rates read from a csv *file*.
+
+        Each row of the *file* has the columns *date*, *currency* and *rate*
+        of one rate for the *base* currency. The first *skiprows* rows, e.g.
+        a header, are skipped. The dates have the format *datefmt*.
+        """
+        table = cls(base)
+        strpdate = date_parser(datefmt)
+        with open(file, 'r', newline='') as stream:
+            reader = csv.reader(stream, delimiter=delimiter)
+            for row in filter(None, itertools.islice(reader, skiprows, None)):
+                table.add(row[currency].strip(), strpdate(row[date]),
+                          float(row[rate]))
+        return table
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Import transactions
+===================
+
+This module provides functions to import transactions from many csv files at
+once, e.g. the monthly exports of all bank accounts and credit cards. Each
+file is described by a :class:`CsvFile`. The files are read by
+:func:`read_csv()`, which splits them into byte ranges parsed in parallel in a
+pool of processes, and are added to a book by :func:`import_csv()`::
+
+   >>> from mone.importer import CsvFile, import_csv
+   >>>
+   >>> files = [CsvFile('bank.csv', 2, 0, 1, account=bank.uuid,
+   ...                  counterpart=extern.uuid),
+   ...          CsvFile('card.csv', 3, 0, 2, skiprows=1, account=card.uuid,
+   ...                  counterpart=extern.uuid)]
+   >>> import_csv(book, files)
+   1523
+
+The rows of a file are parsed by the function of :func:`csv_parser()`, and
+each is transferred into a transaction by :func:`transfer()`. Those are also
+used by :meth:`mone.book.Transactions.from_csv()` to read a single file.
+
+.. currentmodule:: mone.importer
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Sequence, Tuple
+import collections
+import csv
+import datetime
+import functools
+import hashlib
+import io
+import os
+import re
+
+import mone.book
+from mone.money import exponent, to_minor
+import mone.rules
+
+
+_DATE_DIRECTIVES = {
+    'Y': r'(?P<Y>\d{4})',
+    'y': r'(?P<y>\d{2})',
+    'm': r'(?P<m>\d{1,2})',
+    'd': r'(?P<d>\d{1,2})',
+}
+
+
+@functools.lru_cache(maxsize=32)
+def date_parser(datefmt: str) -> Callable[[str], datetime.date]:
+    """Return a function parsing a date string of the format *datefmt*.
+
+    Formats using only the directives ``%Y``, ``%y``, ``%m`` and ``%d`` are
+    compiled into a regular expression, which is much faster than
+    :meth:`datetime.datetime.strptime()`. Other formats fall back to
+    :meth:`~datetime.datetime.strptime()`.
+    """
+    pattern, i = [], 0
+    while i < len(datefmt):
+        if datefmt[i] != '%':
+            pattern.append(re.escape(datefmt[i]))
+        elif datefmt[i + 1:i + 2] == '%':
+            pattern.append('%')
+            i += 1
+        else:
+            pattern.append(_DATE_DIRECTIVES.get(datefmt[i + 1:i + 2]))
+            i += 1
+        i += 1
+
+    try:
+        regex = re.compile(''.join(pattern))
+        fields = set(regex.groupindex)
+    except (TypeError, re.error):
+        # unknown or repeated directives
+        fields = set()
+    if not {'d', 'm'} <= fields or not {'Y', 'y'} & fields:
+        def strpdate(date_str: str) -> datetime.date:
+            return datetime.datetime.strptime(date_str, datefmt).date()
+    else:
+        def strpdate(date_str: str) -> datetime.date:
+            match = regex.fullmatch(date_str)
+            if match is None:
+                raise ValueError(f'time data {date_str!r} does not match '
+                                 f'format {datefmt!r}')
+            fields = match.groupdict()
+            if 'Y' in fields:
+                year = int(fields['Y'])
+            else:
+                # the same pivot as strptime
+                year = int(fields['y'])
+                year += 1900 if year >= 69 else 2000
+            return datetime.date(year, int(fields['m']), int(fields['d']))
+
+    return strpdate
+
+
+def csv_parser(value: int, date: int, description: int, thousands: str = '',
+               decimal: str = '.', datefmt: str = '%Y-%m-%d',
+               minor_units: bool = False, currency: str = None
+               ) -> Callable[[List[str]], tuple]:
+    """Return a function parsing a csv row.
+
+    The returned function takes the list of columns of a row and returns the
+    parsed value, description and date of the row. As exports repeat the
+    same dates for many rows, the dates are cached by their string while the
+    function is in use, so that equal dates share one object. In *minor_units*,
+    the values are parsed into the minor unit of their *currency*.
+
+    .. seealso:: :meth:`mone.book.Transactions.from_csv()` for the arguments.
+    """
+    strpdate = functools.lru_cache(maxsize=None)(date_parser(datefmt))
+    table = {ord(c): None for c in thousands}
+    if decimal != '.':
+        table[ord(decimal)] = '.'
+    if minor_units:
+        to_number = functools.partial(to_minor, currency=currency)
+    else:
+        to_number = float
+
+    def strpfloat(float_str: str) -> float:
+        """Return a float from the parsed *float_str*."""
+        return to_number(float_str.translate(table) if table else float_str)
+
+    def parse(row: List[str]) -> tuple:
+        return strpfloat(row[value]), row[description], strpdate(row[date])
+
+    return parse
+
+
+def fingerprinter(account: str, currency: str = None) -> Callable[..., str]:
+    """Return a function fingerprinting the rows of an export of *account*.
+
+    The returned function takes the parsed value, description and date of a
+    row and returns a hash of them, the *account* and the occurrence of equal
+    rows before it. That way, rows which are equal by content, e.g. two coffees
+    for the same price on the same day, get different fingerprints, but each
+    row gets the same fingerprint in every export overlapping its date. The
+    values are fingerprinted in the minor unit of their *currency*.
+    """
+    occurrences = collections.Counter()
+    units = 10 ** exponent(currency)
+
+    def fingerprint(value: float, description: str,
+                    date: datetime.date) -> str:
+        # minor units of floats, avoiding the slower but exact to_minor()
+        minor = value if isinstance(value, int) else round(value * units)
+        row = (account or '', date.isoformat(), str(minor), description)
+        ordinal = occurrences[row]
+        occurrences[row] += 1
+        key = '\x1f'.join(row + (str(ordinal),))
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    return fingerprint
+
+
+def transfer(value: float, description: str, date: datetime.date,
+             account: str, counterpart: str, fingerprint: str = None,
+             rules: 'mone.rules.Rules' = None,
+             currency: str = None) -> mone.book.Transaction:
+    """Return a transaction of the *value* between *account* and
+    *counterpart*.
+
+    A negative *value* goes from the *account* to the *counterpart*, a
+    positive one the other way around. The first of the *rules* matching the
+    transaction defines its counterpart, budgets and tags. The *currency* is
+    the one of the *value*.
+    """
+    budgets, tags = (), ()
+    if rules is not None:
+        rule = rules.match(description, value)
+        if rule is not None:
+            counterpart = rule.counterpart or counterpart
+            budgets, tags = rule.budgets, rule.tags
+
+    sources, receiver = {account, *budgets} - {None}, {counterpart} - {None}
+    if value >= 0:
+        sources, receiver = receiver, sources
+    return mone.book.Transaction(value, description, sources, receiver, date,
+                                 tags, fingerprint=fingerprint,
+                                 currency=currency)
+
+
+@dataclass
+class CsvFile():
+    """A csv file with transactions of an account.
+
+    The :attr:`account` and :attr:`counterpart` must be given, otherwise a
+    :class:`ValueError` is raised.
+
+    .. seealso:: :meth:`mone.book.Transactions.from_csv()` for the meaning of
+                 each field.
+    """
+    file: str
+    value: int
+    date: int
+    description: int
+    skiprows: int = 0
+    delimiter: str = ','
+    thousands: str = ''
+    decimal: str = '.'
+    datefmt: str = '%Y-%m-%d'
+    minor_units: bool = False
+    account: str = None
+    counterpart: str = None
+    currency: str = None
+
+    def __post_init__(self):
+        if self.account is None or self.counterpart is None:
+            raise ValueError('the account and counterpart of the file must '
+                             'be given')
+
+    def ranges(self, chunksize: int) -> Iterator[Tuple[int, int]]:
+        """Yield the byte ranges of the rows of the file.
+
+        Each range starts and ends at the start of a line and is about
+        *chunksize* bytes long. The rows skipped by :attr:`skiprows` are not
+        part of any range. Rows must not span several lines, i.e. quoted
+        fields can't contain line breaks.
+        """
+        with open(self.file, 'rb') as stream:
+            for _ in range(self.skiprows):
+                stream.readline()
+            start = stream.tell()
+            size = os.fstat(stream.fileno()).st_size
+            while start < size:
+                # complete the line at the end of the range
+                stream.seek(start + chunksize)
+                stream.readline()
+                end = min(stream.tell(), size)
+                yield start, end
+                start = end
+
+    def parse(self, start: int, end: int) -> List[tuple]:
+        """Return the parsed rows in the byte range from *start* to *end*.
+
+        Each row is parsed into its value, description and date.
+
+        .. seealso:: :func:`csv_parser()`
+        """
+        with open(self.file, 'rb') as stream:
+            stream.seek(start)
+            data = stream.read(end - start)
+
+        reader = csv.reader(io.TextIOWrapper(io.BytesIO(data), newline=''),
+                            delimiter=self.delimiter)
+        parse = csv_parser(self.value, self.date, self.description,
+                           self.thousands, self.decimal, self.datefmt,
+                           self.minor_units, self.currency)
+        return list(map(parse, filter(None, reader)))
+
+
+def read_csv(files: Sequence[CsvFile], max_workers: int = None,
+             chunksize: int = 1 << 20, rules: mone.rules.Rules = None
+             ) -> Iterator[mone.book.Transaction]:
+    """Yield the transactions of all csv *files*.
+
+    The files are split into byte ranges of about *chunksize* bytes by
+    :meth:`CsvFile.ranges()`. Each range is read and parsed by
+    :meth:`CsvFile.parse()` in a pool of up to *max_workers* processes, so
+    that only the offsets of the ranges are sent to the processes. If
+    *max_workers* is not given, it is the number of processors. The
+    transactions are yielded in the order of the *files* and their rows,
+    independent of which process finished first. Only a few ranges per
+    process are parsed ahead, so the memory used doesn't depend on the size
+    of the files. If *rules* are given, they categorize each transaction.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    # the fingerprints count equal rows, so they are taken in order by file
+    chunks = ((f, fingerprint, chunk) for f in files
+              for fingerprint in [fingerprinter(f.account, f.currency)]
+              for chunk in f.ranges(chunksize))
+
+    with ProcessPoolExecutor(max_workers) as executor:
+        pending = collections.deque()
+
+        def results(csv_file: CsvFile, fingerprint, parsed) -> Iterator[
+                mone.book.Transaction]:
+            for row in parsed.result():
+                yield transfer(*row, csv_file.account, csv_file.counterpart,
+                               fingerprint(*row), rules, csv_file.currency)
+
+        for csv_file, fingerprint, chunk in chunks:
+            pending.append((csv_file, fingerprint,
+                            executor.submit(csv_file.parse, *chunk)))
+            if len(pending) >= 2 * max_workers:
+                yield from results(*pending.popleft())
+
+        while pending:
+            yield from results(*pending.popleft())
+
+
+def import_csv(book: mone.book.BookKeeper, files: Sequence[CsvFile],
+               max_workers: int = None, chunksize: int = 1 << 20,
+               rules: mone.rules.Rules = None) -> int:
+    """Import the transactions of all csv *files* into the *book*.
+
+    The files are read by :func:`read_csv()` and all transactions are added
+    to the *book* as one batch by :meth:`~mone.book.BookKeeper.add_many()`.
+    Rows which were already imported before or are in more than one of the
+    overlapping *files* are skipped by their
+    :attr:`~mone.book.Transaction.fingerprint`. The *rules* are passed on to
+    :func:`read_csv()`. Return the number of imported transactions.
+    """
+    transactions, seen = [], set()
+    for transaction in read_csv(files, max_workers, chunksize, rules):
+        fingerprint = transaction.fingerprint
+        if fingerprint in seen or book.imported(fingerprint) is not None:
+            continue
+        seen.add(fingerprint)
+        transactions.append(transaction)
+
+    book.add_many(transactions)
+    return len(transactions)
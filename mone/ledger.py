@@ -0,0 +1,513 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+A columnar ledger of the book
+=============================
+
+This module provides the :class:`Ledger`, a columnar view of a
+:class:`~mone.book.BookKeeper`. Instead of one object per transaction, the
+ledger holds all transactions as parallel arrays and computes balances and
+histories of all accounts at once. The ledger requires `NumPy
+<https://numpy.org>`_ which is an optional dependency of mone.
+
+.. currentmodule:: mone.ledger
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+import datetime
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+import mone.book
+from mone.money import exponent
+
+DIMENSIONS = ('account', 'budget', 'tag', 'week', 'month', 'year')
+"""The dimensions by which the ledger can be aggregated."""
+
+MEASURES = ('sum', 'count', 'mean')
+"""The measures by which the ledger can be aggregated."""
+
+# the ordinal of the NumPy datetime epoch 1970-01-01
+_EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+
+class Ledger():
+    """A columnar ledger of all transactions of a book.
+
+    The ledger is a snapshot of a :class:`~mone.book.BookKeeper` at one
+    :attr:`version`, which doesn't follow later changes of the book. The
+    book builds its ledger by :meth:`~mone.book.BookKeeper.ledger()` and
+    keeps it until the book changes, while the book's own balances are kept
+    by its accounts. Each
+    transaction is a row with its value as integer in units of 1 / *scale*,
+    e.g. cents, its date as ordinal and a flag if it rebalances a budget. The
+    sources and receiver of each transaction are mapped to dense account
+    indices in `CSR <https://en.wikipedia.org/wiki/Sparse_matrix>`_ layout,
+    i.e. the sources of the transaction ``i`` are
+    ``source_index[source_ptr[i]:source_ptr[i + 1]]``.
+
+    From those arrays, the ledger computes the :meth:`balances()` of all
+    accounts and budgets or the :meth:`history()` of a single one with the
+    same sign rules as :attr:`mone.book.Account.balance` and
+    :attr:`mone.book.Budget.balance`. The booked values can also be
+    :meth:`aggregate()` by accounts, budgets, tags and periods, and the
+    balances of all accounts are projected at once by :meth:`forecast()`.
+    Since the values are integers, the sums are exact. The values of a book
+    which aren't held in minor units are rounded to the *scale* when the
+    ledger is built, so that the ledger's numbers equal the ones of the book
+    only as long as no value has more decimals than the *scale*, e.g. for
+    values in cents. By default, the *scale* is the finest minor unit of the
+    currencies of the book, e.g. mils if an account is held in BHD. The
+    following example shows how to use the ledger::
+
+       >>> ledger = book.ledger()
+       >>> ledger.balance == book.balance
+       True
+
+    """
+
+    def __init__(self, book: mone.book.BookKeeper, scale: int = None,
+                 minor_units: bool = False) -> None:
+        """Build the ledger from the *book*.
+
+        The values are stored as integer multiples of 1 / *scale*. If the
+        values of the *book* are held in integer *minor_units* of their
+        currencies, they are converted exactly into the *scale*. Raise a
+        :class:`ValueError` if the *scale* is coarser than one of those minor
+        units and an :class:`ImportError` if NumPy is not installed.
+
+        .. seealso:: :mod:`mone.money`
+        """
+        if np is None:
+            raise ImportError('the ledger requires numpy')
+
+        accounts = list(book.accounts.values())
+        budgets = list(book.budgets.values())
+        transactions = list(book.transactions)
+        codes = {None, *(a.currency for a in accounts + budgets),
+                 *(t.currency for t in transactions)}
+        finest = 10 ** max(map(exponent, codes))
+
+        self.scale = scale or finest
+        """The number of units per value, e.g. 100 for cents."""
+
+        if minor_units and self.scale % finest:
+            raise ValueError(f'the scale {self.scale} can not hold the minor '
+                             f'units of {sorted(filter(None, codes))}')
+
+        self.version = book.version
+        """The :attr:`~mone.book.BookKeeper.version` of the book."""
+
+        self.minor_units = minor_units
+        """True if the book's values are held in minor units."""
+
+        self.uuids = [a.uuid for a in accounts + budgets]
+        """The uuid of each account or budget by its index."""
+
+        self.index = {uuid: i for i, uuid in enumerate(self.uuids)}
+        """The index of each account or budget by its uuid."""
+
+        self.budget = np.zeros(len(self.uuids), dtype=bool)
+        """True for each index which is a budget."""
+        self.budget[len(accounts):] = True
+
+        self.extern = np.fromiter((bool(a.extern) for a in accounts + budgets),
+                                  dtype=bool, count=len(self.uuids))
+        """True for each index which is an external account."""
+
+        currencies = {None: 0}
+        self.account_currency = np.fromiter(
+            (currencies.setdefault(a.currency, len(currencies))
+             for a in accounts + budgets), dtype=np.int64,
+            count=len(self.uuids))
+        """The currency index of each account or budget."""
+
+        self.start = self._scale(
+            [a._init_balance for a in accounts] + [b.budget for b in budgets],
+            [a.currency for a in accounts + budgets])
+        """The initial balance of each account and the budget of each
+        budget."""
+
+        n = len(transactions)
+
+        self.transactions = [t.uuid for t in transactions]
+        """The uuid of each transaction by its row."""
+
+        self.value = self._scale([t.value for t in transactions],
+                                 [t.currency for t in transactions])
+        """The value of each transaction."""
+
+        self.date = np.fromiter((t.date.toordinal() for t in transactions),
+                                dtype=np.int64, count=n)
+        """The value date of each transaction as proleptic ordinal."""
+
+        self.currency = np.fromiter(
+            (currencies.setdefault(t.currency, len(currencies))
+             if t.currency is not None else -1 for t in transactions),
+            dtype=np.int64, count=n)
+        """The currency index of each transaction or -1 if its value is in
+        the currency of its accounts."""
+
+        self.currencies = list(currencies)
+        """The currency code of each currency index, where ``None`` is the
+        currency of the book."""
+
+        self.budget_rebalance = np.fromiter(
+            (t.budget_rebalance for t in transactions), dtype=bool, count=n)
+        """True for each transaction which rebalances a budget."""
+
+        self.source_ptr, self.source_index = self._csr(
+            (t.sources for t in transactions), self.index)
+        self.receiver_ptr, self.receiver_index = self._csr(
+            (t.receiver for t in transactions), self.index)
+
+        tags = {}
+        self.tag_ptr, self.tag_index = self._csr(
+            (t.tags for t in transactions), tags, grow=True)
+
+        self.tags = list(tags)
+        """The tag of each tag index."""
+
+        self._postings = None
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def __repr__(self) -> str:
+        return f'Ledger({len(self.uuids)} accounts, {len(self)} transactions)'
+
+    @staticmethod
+    def _csr(rows: Iterable[Iterable[str]], index: Dict[str, int],
+             grow: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        # keys which are not in the index are skipped unless the index grows
+        ptr = [0]
+        indices = []
+        for keys in rows:
+            if grow:
+                for key in keys:
+                    if key not in index:
+                        index[key] = len(index)
+            indices.extend(index[k] for k in sorted(keys) if k in index)
+            ptr.append(len(indices))
+        return (np.array(ptr, dtype=np.int64),
+                np.array(indices, dtype=np.int64))
+
+    def _scale(self, values: List[float], currencies: List[str]
+               ) -> np.ndarray:
+        if self.minor_units:
+            units = {c: self.units(c) for c in set(currencies)}
+            return (np.array([v or 0 for v in values], dtype=np.int64)
+                    * np.array([units[c] for c in currencies], dtype=np.int64))
+        values = np.array([v or 0.0 for v in values], dtype=np.float64)
+        return np.rint(values * self.scale).astype(np.int64)
+
+    def _unscale(self, values: np.ndarray) -> np.ndarray:
+        return values / self.scale
+
+    def units(self, currency: str = None) -> int:
+        """Return the number of units of the ledger per minor unit of the
+        *currency*."""
+        return self.scale // 10 ** exponent(currency)
+
+    def postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the postings of all transactions onto the accounts.
+
+        A posting is the share of a transaction booked with one account. The
+        returned tuple holds the transaction rows, the account indices and
+        the signed values of all postings, with one posting per transaction
+        and account. The postings are ordered by transaction row.
+        """
+        if self._postings is not None:
+            return self._postings
+
+        m = len(self.uuids)
+        source_row = np.repeat(np.arange(len(self)),
+                               np.diff(self.source_ptr))
+        receiver_row = np.repeat(np.arange(len(self)),
+                                 np.diff(self.receiver_ptr))
+        source_key = source_row * m + self.source_index
+        receiver_key = receiver_row * m + self.receiver_index
+
+        # accounts which are source and receiver, or transactions which
+        # rebalance a budget don't change an account's balance; budgets are
+        # always charged when being a source
+        source_budget = self.budget[self.source_index]
+        source_sign = np.where(
+            source_budget
+            | ~(np.isin(source_key, receiver_key)
+                | self.budget_rebalance[source_row]),
+            -1, 0)
+        receiver_budget = self.budget[self.receiver_index]
+        receiver_both = np.isin(receiver_key, source_key)
+        receiver_sign = np.where(
+            ~receiver_both & (receiver_budget
+                              | ~self.budget_rebalance[receiver_row]),
+            1, 0)
+
+        row = np.concatenate([source_row, receiver_row])
+        acct = np.concatenate([self.source_index, self.receiver_index])
+        value = (np.concatenate([source_sign, receiver_sign])
+                 * self.value[row])
+
+        # an account which is source and receiver is posted once
+        keep = np.concatenate([np.ones(len(source_row), dtype=bool),
+                               ~receiver_both])
+        order = np.argsort(row[keep], kind='stable')
+        self._postings = (row[keep][order], acct[keep][order],
+                          value[keep][order])
+        return self._postings
+
+    def _deltas(self) -> np.ndarray:
+        _, acct, value = self.postings()
+        delta = np.zeros(len(self.uuids), dtype=np.int64)
+        np.add.at(delta, acct, value)
+        return delta
+
+    @property
+    def balance(self) -> float:
+        """The sum of all non external accounts balances.
+
+        Same as :attr:`mone.book.BookKeeper.balance` the budgets are excluded
+        from the balance.
+        """
+        keep = ~(self.extern | self.budget)
+        return float(self._unscale((self.start + self._deltas())[keep].sum()))
+
+    def balances(self) -> Dict[str, float]:
+        """Return the balance of each account and budget by its uuid."""
+        balances = self._unscale(self.start + self._deltas())
+        return dict(zip(self.uuids, balances.tolist()))
+
+    def history(self, uuid: str, periode: List[datetime.date] =
+                [datetime.date.min, datetime.date.max]) -> dict:
+        """Return the balance history of the account *uuid* in the *periode*.
+
+        The returned dictionary has the key ``'balance'`` with the balance
+        after each transaction in the *periode* and ``'date'`` with the
+        transaction's date in ISO format. The transactions are ordered by
+        date.
+        """
+        i = self.index[uuid]
+        row, acct, value = self.postings()
+        mask = acct == i
+        row, value = row[mask], value[mask]
+        date = self.date[row]
+
+        order = np.argsort(date, kind='stable')
+        date = date[order]
+        balance = self.start[i] + np.cumsum(value[order])
+
+        lower = np.searchsorted(date, min(periode).toordinal(), 'left')
+        upper = np.searchsorted(date, max(periode).toordinal(), 'right')
+        return {'balance': self._unscale(balance[lower:upper]).tolist(),
+                'date': [datetime.date.fromordinal(d).isoformat()
+                         for d in date[lower:upper].tolist()]}
+
+    def forecast(self, grid: Sequence[int], since: int, periods: int,
+                 recurring: Iterable[Tuple[Sequence[int], np.ndarray]] = (),
+                 exclude: Iterable[str] = ()) -> np.ndarray:
+        """Return the projected balance of each account and budget.
+
+        The balances are projected at each date of the *grid*, given as
+        sorted proleptic ordinals starting with the current date. The
+        returned array has one row per account index and one column per date
+        of the *grid* and is computed for all accounts at once:
+
+        - The booked transactions up to each date are summed by adding each
+          posting to the first grid date at or after its date.
+        - The *recurring* transactions are given by the dates of their
+          occurrences and their signed values per account index, in units of
+          the ledger. Their occurrences are counted per grid date.
+        - The transactions booked with a budget between the date *since*,
+          excluded, and the first grid date are averaged over the number of
+          *periods* in that window. The average is added for each step of
+          the *grid*. The transactions *exclude*, e.g. booked occurrences of
+          recurring transactions, are not part of the average.
+        """
+        grid = np.asarray(grid, dtype=np.int64)
+        row, acct, value = self.postings()
+        date = self.date[row]
+
+        flow = np.zeros((len(self.uuids), len(grid)))
+        bucket = np.searchsorted(grid, date, side='left')
+        keep = bucket < len(grid)
+        np.add.at(flow, (acct[keep], bucket[keep]), value[keep])
+
+        for dates, values in recurring:
+            bucket = np.searchsorted(grid, np.asarray(dates, dtype=np.int64),
+                                     side='left')
+            count = np.bincount(bucket[bucket < len(grid)],
+                                minlength=len(grid))
+            flow += np.outer(values, count)
+
+        budgeted = np.zeros(len(self), dtype=bool)
+        budgeted[row[self.budget[acct]]] = True
+        exclude = set(exclude)
+        if exclude:
+            budgeted &= np.fromiter((t not in exclude
+                                     for t in self.transactions),
+                                    dtype=bool, count=len(self))
+        window = budgeted[row] & (date > since) & (date <= grid[0])
+        average = np.zeros(len(self.uuids))
+        np.add.at(average, acct[window], value[window])
+        average /= max(periods, 1)
+
+        balance = (self.start[:, None] + np.cumsum(flow, axis=1)
+                   + np.outer(average, np.arange(len(grid))))
+        return self._unscale(balance)
+
+    def convert(self, row: np.ndarray, acct: np.ndarray, value: np.ndarray,
+                rates: 'mone.exchange.ExchangeRates') -> np.ndarray:
+        """Return the values of postings converted by the exchange *rates*.
+
+        The postings are given by their transaction *row*, account index
+        *acct* and *value* as returned by :meth:`postings()`. Each value is
+        in the currency of its transaction or else of its account and is
+        converted into the base currency of the *rates* at the date of its
+        transaction. The rates of all postings in one currency are looked up
+        at once.
+        """
+        currency = self.currency[row]
+        currency = np.where(currency >= 0, currency,
+                            self.account_currency[acct])
+        value = value.astype(np.float64)
+        for code in np.unique(currency).tolist():
+            name = self.currencies[code]
+            if name is None or name == rates.base:
+                continue
+            mask = currency == code
+            value[mask] /= rates.rates(name, self.date[row[mask]])
+        return np.rint(value)
+
+    def aggregate(self, by: Union[str, Sequence[str]], measure: str = 'sum',
+                  where: np.ndarray = None,
+                  rates: 'mone.exchange.ExchangeRates' = None
+                  ) -> Dict[tuple, float]:
+        """Return the booked values aggregated *by* the dimensions.
+
+        The values are grouped by one or more of the :data:`DIMENSIONS`:
+
+        - ``'account'`` the uuid of the account including external accounts
+        - ``'budget'`` the uuid of the budget
+        - ``'tag'`` each tag of the transaction or *None* if it has no tag
+        - ``'week'`` the ISO week of the value date, e.g. ``'2021-W09'``
+        - ``'month'`` the month of the value date, e.g. ``'2021-03'``
+        - ``'year'`` the year of the value date, e.g. ``'2021'``
+
+        Each posting, i.e. the signed value of a transaction booked with an
+        account, is aggregated by the *measure* ``'sum'``, ``'count'`` or
+        ``'mean'``. When grouped by budget, only the postings on budgets are
+        used. Otherwise only those on accounts, where the postings on external
+        accounts are excluded unless grouped by account. As for the balance,
+        transactions which rebalance a budget are not posted on accounts. A
+        transaction with several tags is aggregated for each of its tags. The
+        transactions can be selected by the boolean array *where* with one
+        element per transaction. If exchange *rates* are given, the values are
+        first converted into their base currency by :meth:`convert()`.
+
+        The returned dictionary maps a tuple with a key of each dimension to
+        the aggregated value.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = set(by).difference(DIMENSIONS)
+        if unknown:
+            raise ValueError(f'unknown dimensions {sorted(unknown)}')
+        if measure not in MEASURES:
+            raise ValueError(f'unknown measure {measure!r}')
+        if 'account' in by and 'budget' in by:
+            raise ValueError('cannot aggregate by account and budget')
+
+        row, acct, value = self.postings()
+        if 'budget' in by:
+            keep = self.budget[acct]
+        elif 'account' in by:
+            keep = ~self.budget[acct]
+        else:
+            keep = ~(self.budget[acct] | self.extern[acct])
+        keep &= value != 0
+        if where is not None:
+            keep &= np.asarray(where, dtype=bool)[row]
+        row, acct, value = row[keep], acct[keep], value[keep]
+        if rates is not None:
+            value = self.convert(row, acct, value, rates)
+
+        if 'tag' in by:
+            # repeat each posting for each tag of its transaction
+            count = np.diff(self.tag_ptr)[row]
+            repeat = np.maximum(count, 1)
+            posting = np.repeat(np.arange(len(row)), repeat)
+            offset = np.arange(len(posting)) - np.repeat(
+                np.cumsum(repeat) - repeat, repeat)
+            tag = np.full(len(posting), -1, dtype=np.int64)
+            tagged = count[posting] > 0
+            tag[tagged] = self.tag_index[self.tag_ptr[row[posting[tagged]]]
+                                         + offset[tagged]]
+            row, acct, value = row[posting], acct[posting], value[posting]
+
+        days = (self.date[row] - _EPOCH).astype('datetime64[D]')
+        codes, labels = [], []
+        for dimension in by:
+            if dimension in ('account', 'budget'):
+                codes.append(acct)
+                labels.append(self.uuids.__getitem__)
+            elif dimension == 'tag':
+                codes.append(tag)
+                labels.append(lambda c: self.tags[c] if c >= 0 else None)
+            elif dimension == 'week':
+                # the day of the week's monday since 1970-01-01, a thursday
+                day = days.astype(np.int64)
+                codes.append(day - (day + 3) % 7)
+                labels.append(lambda c: '%04d-W%02d' % (
+                    datetime.date.fromordinal(c + _EPOCH).isocalendar()[:2]))
+            elif dimension == 'month':
+                codes.append(days.astype('datetime64[M]').astype(np.int64))
+                labels.append(lambda c: str(np.datetime64(c, 'M')))
+            elif dimension == 'year':
+                codes.append(days.astype('datetime64[Y]').astype(np.int64))
+                labels.append(lambda c: str(np.datetime64(c, 'Y')))
+
+        if codes:
+            keys, group = np.unique(np.stack(codes, axis=1), axis=0,
+                                    return_inverse=True)
+            group = group.reshape(-1)
+        else:
+            keys = np.zeros((1 if len(value) else 0, 0), dtype=np.int64)
+            group = np.zeros(len(value), dtype=np.int64)
+
+        count = np.bincount(group, minlength=len(keys))
+        total = self._unscale(np.bincount(group, weights=value,
+                                          minlength=len(keys)))
+        if measure == 'sum':
+            result = total
+        elif measure == 'count':
+            result = count
+        else:
+            result = total / count
+
+        return {tuple(label(c) for label, c in zip(labels, key)): v
+                for key, v in zip(keys.tolist(), result.tolist())}
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Money in minor units
+====================
+
+This module provides functions to convert money between its major unit, e.g.
+1.5 EUR, and integer minor units, e.g. 150 cents. The values of the
+:mod:`~mone.book` are floats by default, but can be held as integer minor units
+instead by passing ``minor_units=True`` when reading them with e.g.
+:meth:`~mone.book.Transaction.from_dict()` or
+:meth:`~mone.book.Transactions.from_csv()`. All balances are then exact
+integer sums. The values are converted back to the major unit by
+:meth:`~mone.book.Transaction.to_dict()` with the same flag.
+
+.. currentmodule:: mone.money
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Union
+
+EXPONENTS = {
+    'BHD': 3,
+    'CLP': 0,
+    'IQD': 3,
+    'ISK': 0,
+    'JOD': 3,
+    'JPY': 0,
+    'KRW': 0,
+    'KWD': 3,
+    'LYD': 3,
+    'OMR': 3,
+    'TND': 3,
+    'VND': 0,
+}
+"""The number of decimal places of the minor unit by currency code as defined
+by ISO 4217. All other currencies have two decimal places."""
+
+
+def exponent(currency: str = None) -> int:
+    """Return the number of decimal places of the minor unit of *currency*.
+
+    If the *currency* is not given, two decimal places are used.
+    """
+    return EXPONENTS.get(currency, 2)
+
+
+def to_minor(value: Union[float, str, Decimal], currency: str = None) -> int:
+    """Return the *value* in the major unit as integer minor units.
+
+    The *value* can be a float, a string or a :class:`~decimal.Decimal`.
+    Floats are converted by their shortest representation, so that ``0.1``
+    results in exactly 10 cents. The value is rounded half to even to the
+    minor unit of *currency*.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    units = Decimal(value).scaleb(exponent(currency))
+    return int(units.to_integral_value(ROUND_HALF_EVEN))
+
+
+def to_major(units: int, currency: str = None) -> float:
+    """Return the integer minor *units* as float in the major unit."""
+    return units / 10 ** exponent(currency)
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Recurring transactions
+======================
+
+This module provides the :class:`Recurring` template of a transaction which
+repeats, e.g. the rent, a salary or a subscription. A template is added to
+the book once and is expanded into its occurrences only for the dates a query
+needs::
+
+   >>> from mone.recurring import Recurring
+   >>>
+   >>> rent = Recurring(950, 'Rent', {bank.uuid}, {landlord.uuid},
+   ...                  datetime.date(2021, 1, 1), day=1)
+   >>> salary = Recurring(3200, 'Salary', {employer.uuid}, {bank.uuid},
+   ...                    datetime.date(2021, 1, 31), day=-1, business=True)
+   >>> book.add(rent)
+   >>> book.add(salary)
+   >>> book.balance_at(datetime.date(2031, 1, 1), recurring=True)
+
+The occurrences are booked as real transactions only on demand by
+:meth:`~mone.book.BookKeeper.materialize()`.
+
+.. currentmodule:: mone.recurring
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import FrozenSet, Iterator
+from uuid import NAMESPACE_URL, uuid1, uuid5
+import calendar
+import datetime
+import itertools
+
+import mone.book
+
+FREQUENCIES = ('weekly', 'monthly')
+"""The frequencies of a :class:`Recurring` transaction."""
+
+
+@dataclass
+class Recurring():
+    """The template of a recurring transaction.
+
+    The transaction of the *value* from the *sources* to the *receiver*
+    recurs every *interval* weeks or months, depending on the *frequency*,
+    from the *start* date up to and including the date *until*. Weekly
+    occurrences fall on the weekday of the *start* date. Monthly occurrences
+    fall on the *day* of the month, which defaults to the day of the *start*
+    date. A negative *day* counts from the end of the month, e.g. ``-1`` is
+    the last day, and days after the end of a shorter month fall on its last
+    day. If *business* is true, occurrences on a weekend are moved to the
+    Friday before, so that e.g. ``day=-1, business=True`` is the last
+    business day of each month. Holidays are not taken into account.
+    """
+    value: float
+    description: str
+    sources: FrozenSet[str]
+    receiver: FrozenSet[str]
+    start: datetime.date
+    frequency: str = 'monthly'
+    interval: int = 1
+    day: int = None
+    business: bool = False
+    until: datetime.date = None
+    tags: FrozenSet[str] = frozenset()
+    currency: str = None
+    uuid: str = None
+
+    def __post_init__(self) -> None:
+        if self.frequency not in FREQUENCIES:
+            raise ValueError(f'unknown frequency {self.frequency!r}')
+        if self.interval < 1:
+            raise ValueError('interval must be positive')
+        self.value = abs(self.value)
+        self.sources = mone.book._frozen(self.sources)
+        self.receiver = mone.book._frozen(self.receiver)
+        self.tags = mone.book._frozen(self.tags or ())
+        self.uuid = self.uuid or str(uuid1())
+        if self.day is None:
+            self.day = self.start.day
+
+    def _weekly(self, first: datetime.date) -> Iterator[datetime.date]:
+        # the occurrences from the date first up to the last date
+        step = datetime.timedelta(weeks=self.interval)
+        while first <= datetime.date.max - step:
+            yield first
+            first += step
+        yield first
+
+    def _monthly(self, first: int) -> Iterator[datetime.date]:
+        # the occurrences from the month index first, counted from year 0, up
+        # to the last year
+        for month in itertools.count(first, self.interval):
+            year, month = divmod(month, 12)
+            if year > datetime.MAXYEAR:
+                return
+            days = calendar.monthrange(year, month + 1)[1]
+            day = self.day if self.day > 0 else days + self.day + 1
+            yield datetime.date(year, month + 1, min(max(day, 1), days))
+
+    def _shift(self, date: datetime.date) -> datetime.date:
+        if self.business and date.weekday() > 4:
+            return date - datetime.timedelta(days=date.weekday() - 4)
+        return date
+
+    def dates(self, start: datetime.date = None,
+              end: datetime.date = None) -> Iterator[datetime.date]:
+        """Yield the dates of the occurrences from *start* to *end*.
+
+        Both dates are included. The dates are computed one by one, starting
+        with the first occurrence at or after *start* without going through
+        the occurrences before it. If no *end* nor :attr:`until` date is
+        given, the dates end with the last representable date.
+
+        The :attr:`start` and :attr:`until` dates of the template bound the
+        occurrences before they are moved off a weekend, so that e.g. an
+        occurrence on the first day of a month starting on a Saturday falls
+        on the Friday before :attr:`start`.
+        """
+        until = self.until or datetime.date.max
+        end = end or datetime.date.max
+        first = max(start or self.start, self.start)
+
+        if self.frequency == 'weekly':
+            step = 7 * self.interval
+            skip = -(-(first - self.start).days // step)
+            dates = self._weekly(self.start
+                                 + datetime.timedelta(days=skip * step))
+        else:
+            # start a period early, since a date of a period can be shifted
+            # into the one before
+            months = (12 * (first.year - self.start.year)
+                      + first.month - self.start.month)
+            skip = max(months // self.interval - 1, 0) * self.interval
+            dates = self._monthly(12 * self.start.year + self.start.month - 1
+                                  + skip)
+
+        for date in dates:
+            if date > until:
+                return
+            if date < self.start:
+                continue
+            date = self._shift(date)
+            if date > end:
+                return
+            if start is None or date >= start:
+                yield date
+
+    def transactions(self, start: datetime.date = None,
+                     end: datetime.date = None
+                     ) -> Iterator[mone.book.Transaction]:
+        """Yield the occurrences from *start* to *end* as transactions.
+
+        Each occurrence has the same uuid each time it is expanded, so that
+        an occurrence which is already booked can be recognized.
+
+        .. seealso:: :meth:`dates()`
+        """
+        for date in self.dates(start, end):
+            yield mone.book.Transaction(
+                self.value, self.description, self.sources, self.receiver,
+                date, self.tags, uuid=self.occurrence(date),
+                currency=self.currency)
+
+    def occurrence(self, date: datetime.date) -> str:
+        """Return the uuid of the occurrence at the *date*."""
+        return str(uuid5(NAMESPACE_URL,
+                         f'mone:recurring/{self.uuid}/{date.isoformat()}'))
+
+    def update(self, current: str, replacement: str) -> None:
+        """Replace the account *current* in the sources and receiver by its
+        *replacement*."""
+        if current in self.receiver:
+            self.receiver = mone.book._frozen((self.receiver - {current})
+                                              | {replacement})
+        if current in self.sources:
+            self.sources = mone.book._frozen((self.sources - {current})
+                                             | {replacement})
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Recurring:
+        """Return the template from a dictionary as returned by
+        :meth:`to_dict()`."""
+        until = data.get('until')
+        return cls(
+            value=data['value'],
+            description=data.get('description'),
+            sources=data['sources'],
+            receiver=data['receiver'],
+            start=mone.book._fromisoformat(data['start']),
+            frequency=data.get('frequency', 'monthly'),
+            interval=data.get('interval', 1),
+            day=data.get('day'),
+            business=data.get('business', False),
+            until=until and mone.book._fromisoformat(until),
+            tags=data.get('tags'),
+            currency=data.get('currency'),
+            uuid=data.get('uuid')
+        )
+
+    def to_dict(self) -> dict:
+        """Return the template as dictionary.
+
+        The dictionary has a key for each field of the template, where the
+        dates are in ISO format.
+        """
+        return {
+            'uuid': self.uuid,
+            'value': self.value,
+            'description': self.description,
+            'sources': list(self.sources),
+            'receiver': list(self.receiver),
+            'start': self.start.isoformat(),
+            'frequency': self.frequency,
+            'interval': self.interval,
+            'day': self.day,
+            'business': self.business,
+            'until': self.until and self.until.isoformat(),
+            'tags': list(self.tags),
+            'currency': self.currency,
+        }
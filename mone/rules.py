@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Categorization rules
+====================
+
+This module provides :class:`Rules` to categorize imported transactions by
+their description and value. Each :class:`Rule` names the counterpart
+account, the budgets and the tags of the transactions it matches::
+
+   >>> from mone.rules import Rule, Rules
+   >>>
+   >>> rules = Rules([Rule(keyword='rewe', budgets=[food.uuid],
+   ...                     tags=['groceries']),
+   ...                Rule(keyword='salary', minimum=0,
+   ...                     counterpart=employer.uuid)])
+   >>> Transactions.from_csv('export.csv', 2, 0, 1, account=bank.uuid,
+   ...                       counterpart=extern.uuid, rules=rules)
+
+.. currentmodule:: mone.rules
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import re
+
+from mone.search import normalize
+
+
+@dataclass
+class Rule():
+    """A rule to categorize a transaction.
+
+    A transaction matches the rule if its description contains the *keyword*
+    and matches the regular expression *pattern*, both ignoring the case, and
+    its value is within *minimum* and *maximum*. Conditions which are not
+    given always hold. The value is signed as in the imported file, i.e.
+    negative for payments from the imported account.
+
+    A matching transaction is booked with the *counterpart* instead of the
+    import's counterpart. The *budgets* are booked on the same side as the
+    imported account and the *tags* are added to the transaction.
+    """
+    keyword: str = None
+    pattern: str = None
+    minimum: float = None
+    maximum: float = None
+    counterpart: str = None
+    budgets: Sequence[str] = ()
+    tags: Sequence[str] = ()
+
+    def accepts(self, value: float) -> bool:
+        """Return whether the *value* is within the rule's bounds."""
+        return ((self.minimum is None or value >= self.minimum)
+                and (self.maximum is None or value <= self.maximum))
+
+
+class Rules():
+    """An ordered list of rules compiled to categorize many transactions.
+
+    Testing every rule against every transaction gets slow for hundreds of
+    rules. Instead, the keywords of all rules are compiled into one
+    Aho-Corasick automaton, which finds all keywords in a description in a
+    single pass over it. Only the rules found by their keyword and the rules
+    without a keyword are tested further. If more than one rule matches a
+    transaction, the first of them in the order of the rules is used.
+    """
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        """Compile the *rules*."""
+        self.rules: List[Rule] = list(rules)
+        """The rules in order of their priority."""
+
+        self._patterns = {i: re.compile(rule.pattern, re.IGNORECASE)
+                          for i, rule in enumerate(self.rules)
+                          if rule.pattern is not None}
+        self._always = [i for i, rule in enumerate(self.rules)
+                        if not rule.keyword]
+
+        # the automaton's trie of the keywords with the failure link and the
+        # rules whose keywords end in each state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for i, rule in enumerate(self.rules):
+            if rule.keyword:
+                self._insert(normalize(rule.keyword), i)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _insert(self, keyword: str, rule: int) -> None:
+        goto, state = self._goto, 0
+        for char in keyword:
+            if char not in goto[state]:
+                goto[state][char] = len(goto)
+                goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = goto[state][char]
+        self._output[state].append(rule)
+
+    def _link(self) -> None:
+        # link each state to the state of its longest proper suffix in
+        # breadth-first order, so that the suffix's links exist already
+        goto, fail, output = self._goto, self._fail, self._output
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                suffix = fail[state]
+                while suffix and char not in goto[suffix]:
+                    suffix = fail[suffix]
+                fail[child] = goto[suffix].get(char, 0)
+                output[child] = output[child] + output[fail[child]]
+
+    def _keywords(self, text: str) -> List[int]:
+        """Return the rules whose keywords are in the normalized *text*."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state, found = 0, []
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.extend(output[state])
+        return found
+
+    def match(self, description: str, value: float) -> Optional[Rule]:
+        """Return the first rule matching the *description* and *value*.
+
+        If no rule matches, ``None`` is returned.
+        """
+        candidates = self._keywords(normalize(description or ''))
+        if self._always:
+            candidates.extend(self._always)
+        if not candidates:
+            return None
+
+        rules, patterns = self.rules, self._patterns
+        for i in sorted(set(candidates)):
+            rule = rules[i]
+            if not rule.accepts(value):
+                continue
+            if i in patterns and not patterns[i].search(description or ''):
+                continue
+            return rule
+        return None
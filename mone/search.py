@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Full-text search
+================
+
+This module provides the :class:`TrigramIndex` to search texts like the
+descriptions of transactions for substrings or similar words.
+
+.. currentmodule:: mone.search
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from collections import Counter
+from typing import Dict, Hashable, List, Set, Tuple
+
+
+def normalize(text: str) -> str:
+    """Return the *text* in lower case with single spaces between words."""
+    return ' '.join(text.casefold().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of trigrams of the normalized *text*.
+
+    The *text* is padded by spaces, so that the start and end of the text and
+    short texts have trigrams too.
+    """
+    text = f' {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex():
+    """An index of texts by their trigrams.
+
+    Texts are :meth:`add()` to the index with a key, e.g. the uuid of a
+    transaction, and can be removed by :meth:`remove()`. For each trigram of a
+    text, i.e. each three consecutive characters, the index keeps the keys of
+    all texts containing it. A :meth:`search()` then only needs to look at the
+    texts sharing trigrams with the query instead of all texts::
+
+       >>> from mone.search import TrigramIndex
+       >>>
+       >>> index = TrigramIndex()
+       >>> index.add(1, 'Amazon Marketplace')
+       >>> index.add(2, 'Rent')
+       >>> index.search('amazon')
+       [1]
+
+    """
+
+    def __init__(self, threshold: float = 0.3) -> None:
+        """Create an empty index.
+
+        Texts which don't contain the query are only found if their
+        similarity to the query is at least *threshold*.
+        """
+        self.threshold = threshold
+        """The minimal similarity of a text to be found by a fuzzy search."""
+
+        # the text, its number of trigrams and its position in order of
+        # addition by key
+        self._texts: Dict[Hashable, Tuple[str, int, int]] = {}
+        self._postings: Dict[str, Set[Hashable]] = {}
+        self._added = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._texts
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Add the *text* with the *key* to the index.
+
+        A text already indexed with the same *key* is replaced.
+        """
+        if key in self._texts:
+            self.remove(key)
+
+        text = normalize(text or '')
+        grams = trigrams(text)
+        self._texts[key] = (text, len(grams), self._added)
+        self._added += 1
+        postings = self._postings
+        for gram in grams:
+            if gram not in postings:
+                postings[gram] = set()
+            postings[gram].add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """Remove the text with the *key* from the index."""
+        entry = self._texts.pop(key, None)
+        if entry is None:
+            return
+
+        postings = self._postings
+        for gram in trigrams(entry[0]):
+            keys = postings[gram]
+            keys.discard(key)
+            if not keys:
+                del postings[gram]
+
+    def search(self, query: str, limit: int = None, offset: int = 0,
+               fuzzy: bool = True) -> List[Hashable]:
+        """Return the keys of the texts matching the *query*.
+
+        Texts which contain the *query* rank first, followed by texts which
+        are similar to the *query* if *fuzzy* is true. Within both groups, the
+        texts are ranked by their similarity to the *query*, i.e. the share of
+        their trigrams in common, and then by the order they were added. The
+        ranked keys are paginated by *offset* and *limit*.
+
+        Queries shorter than three characters have no trigrams and are
+        searched in all texts.
+        """
+        query = normalize(query)
+        texts = self._texts
+        if len(query) < 3:
+            ranked = sorted((order, key) for key, (text, _, order)
+                            in texts.items() if query and query in text)
+        else:
+            grams = {query[i:i + 3] for i in range(len(query) - 2)}
+            common = Counter()
+            postings = self._postings
+            for gram in grams:
+                common.update(postings.get(gram, ()))
+
+            size = len(grams)
+            ranked = []
+            for key, count in common.items():
+                text, n, order = texts[key]
+                similarity = count / (size + n - count)
+                if count == size and query in text:
+                    ranked.append((-1 - similarity, order, key))
+                elif fuzzy and similarity >= self.threshold:
+                    ranked.append((-similarity, order, key))
+            ranked.sort()
+
+        stop = None if limit is None else offset + limit
+        return [entry[-1] for entry in ranked[offset:stop]]
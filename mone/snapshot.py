@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Book snapshots
+==============
+
+This module provides the :class:`Snapshot` of a book. A snapshot is an
+immutable view of the accounts, budgets and transactions of a
+:class:`~mone.book.BookKeeper` at one version. The bookkeeper publishes a new
+snapshot with each change, which is returned by
+:meth:`~mone.book.BookKeeper.snapshot()`. Readers, e.g. other threads, can
+use a snapshot without locks while the book is changed, since a snapshot is
+never changed itself::
+
+   >>> snapshot = book.snapshot()
+   >>> book.add(transaction)
+   >>> len(book.snapshot().transactions) - len(snapshot.transactions)
+   1
+
+Consecutive snapshots share the transactions which didn't change, so that
+publishing a snapshot doesn't copy all transactions of the book.
+
+.. currentmodule:: mone.snapshot
+
+.. autosummary::
+   :toctree: generated/
+"""
+
+from collections.abc import Sequence
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple
+import bisect
+import itertools
+
+from mone.money import to_major
+
+CHUNKSIZE = 64
+"""The number of transactions per chunk shared between snapshots."""
+
+
+class AccountState(NamedTuple):
+    """The state of an account in a snapshot."""
+    uuid: str
+    name: str
+    balance: float
+    extern: bool
+    currency: str = None
+
+
+class BudgetState(NamedTuple):
+    """The state of a budget in a snapshot."""
+    uuid: str
+    name: str
+    balance: float
+    budget: float
+    currency: str = None
+
+
+class Chunks():
+    """The transactions of a book split into chunks.
+
+    Each chunk is a tuple of up to :data:`CHUNKSIZE` transactions. A change of
+    a transaction replaces only the chunk containing it by a changed copy, so
+    that all other chunks are shared with the tuple of chunks returned by
+    :meth:`freeze()` before. The chunk of a transaction is looked up by its
+    uuid.
+    """
+
+    def __init__(self, transactions: Iterable['mone.book.Transaction'] = ()
+                 ) -> None:
+        self._chunks: List[tuple] = []
+        self._slots: Dict[str, int] = {}
+        self.extend(transactions)
+
+    def append(self, transaction: 'mone.book.Transaction') -> None:
+        """Append the *transaction* to the last chunk.
+
+        A transaction of the same uuid is replaced as by :meth:`update()`.
+        """
+        if transaction.uuid in self._slots:
+            self.update((transaction,))
+            return
+
+        chunks = self._chunks
+        if not chunks or len(chunks[-1]) >= CHUNKSIZE:
+            chunks.append(())
+        chunks[-1] += (transaction,)
+        self._slots[transaction.uuid] = len(chunks) - 1
+
+    def extend(self, transactions: Iterable['mone.book.Transaction']) -> None:
+        """Append all *transactions* by filling chunks at once.
+
+        As for :meth:`append()`, transactions of the same uuid are replaced.
+        """
+        chunks, slots = self._chunks, self._slots
+        added, replaced = {}, []
+        for transaction in transactions:
+            if transaction.uuid in slots:
+                replaced.append(transaction)
+            else:
+                added[transaction.uuid] = transaction
+        self.update(replaced)
+
+        transactions = iter(added.values())
+        if chunks and len(chunks[-1]) < CHUNKSIZE:
+            head = tuple(itertools.islice(transactions,
+                                          CHUNKSIZE - len(chunks[-1])))
+            chunks[-1] += head
+            for transaction in head:
+                slots[transaction.uuid] = len(chunks) - 1
+
+        while True:
+            chunk = tuple(itertools.islice(transactions, CHUNKSIZE))
+            if not chunk:
+                return
+            chunks.append(chunk)
+            for transaction in chunk:
+                slots[transaction.uuid] = len(chunks) - 1
+
+    def remove(self, transaction: 'mone.book.Transaction') -> None:
+        """Remove the *transaction* from its chunk."""
+        slot = self._slots.pop(transaction.uuid, None)
+        if slot is not None:
+            uuid = transaction.uuid
+            self._chunks[slot] = tuple(t for t in self._chunks[slot]
+                                       if t.uuid != uuid)
+
+    def update(self, transactions: Iterable['mone.book.Transaction']) -> None:
+        """Replace the transactions of same uuid by the *transactions*."""
+        chunks, slots = self._chunks, self._slots
+        for transaction in transactions:
+            slot = slots.get(transaction.uuid)
+            if slot is not None:
+                uuid = transaction.uuid
+                chunks[slot] = tuple(transaction if t.uuid == uuid else t
+                                     for t in chunks[slot])
+
+    def freeze(self) -> 'SharedTransactions':
+        """Return the current transactions as immutable sequence."""
+        return SharedTransactions(tuple(self._chunks))
+
+
+class SharedTransactions(Sequence):
+    """An immutable sequence of transactions in chunks.
+
+    The chunks are shared with other snapshots. The transactions are in the
+    order of the book's :attr:`~mone.book.BookKeeper.transactions`.
+    """
+
+    def __init__(self, chunks: Tuple[tuple, ...] = ()) -> None:
+        self._chunks = chunks
+        # the end of each chunk
+        self._offsets = list(itertools.accumulate(map(len, chunks)))
+
+    def __getitem__(self, index: int) -> 'mone.book.Transaction':
+        if isinstance(index, slice):
+            return list(itertools.islice(self, *index.indices(len(self))))
+
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('transaction index out of range')
+
+        offsets = self._offsets
+        slot = bisect.bisect_right(offsets, index)
+        start = offsets[slot - 1] if slot else 0
+        return self._chunks[slot][index - start]
+
+    def __iter__(self) -> Iterator['mone.book.Transaction']:
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __len__(self) -> int:
+        return self._offsets[-1] if self._offsets else 0
+
+    def __repr__(self) -> str:
+        return f'SharedTransactions({list(self)})'
+
+
+class Snapshot():
+    """An immutable snapshot of a book at one :attr:`version`."""
+
+    def __init__(self, version: int, accounts: Iterable[AccountState],
+                 budgets: Iterable[BudgetState],
+                 transactions: SharedTransactions,
+                 balance: float = None, currency: str = None) -> None:
+        self.version = version
+        """The :attr:`~mone.book.BookKeeper.version` of the book."""
+
+        self.accounts: Mapping[str, AccountState] = MappingProxyType(
+            {a.uuid: a for a in accounts})
+        """The state of all accounts by uuid."""
+
+        self.budgets: Mapping[str, BudgetState] = MappingProxyType(
+            {b.uuid: b for b in budgets})
+        """The state of all budgets by uuid."""
+
+        self.transactions = transactions
+        """The :class:`SharedTransactions` of the book."""
+
+        self._balance = balance
+
+        self.currency = currency
+        """The currency code of the :attr:`balance` or ``None`` for the
+        currency of the book."""
+
+    def __repr__(self) -> str:
+        return (f'Snapshot(version={self.version}, '
+                f'{len(self.transactions)} transactions)')
+
+    @property
+    def balance(self) -> float:
+        """The sum of all account balances.
+
+        If the book's balance is given, e.g. consolidated by its exchange
+        rates, it is returned instead of the sum.
+
+        .. note:: External accounts are excluded from the balance.
+        """
+        if self._balance is not None:
+            return self._balance
+        return sum(a.balance for a in self.accounts.values() if not a.extern)
+
+    def to_dict(self, full: bool = False, minor_units: bool = False) -> dict:
+        """Return the snapshot as dictionary.
+
+        The dictionary is the same as returned by
+        :meth:`mone.book.BookKeeper.to_dict()` at the snapshot's version.
+        """
+        def major(value: float, currency: str) -> float:
+            return to_major(value, currency) if minor_units else float(value)
+
+        data = {
+            'accounts': [{'uuid': a.uuid, 'extern': a.extern, 'name': a.name,
+                          'balance': major(a.balance, a.currency),
+                          'currency': a.currency}
+                         for a in self.accounts.values()],
+            'budgets': [{'uuid': b.uuid, 'extern': False, 'name': b.name,
+                         'balance': major(b.balance, b.currency),
+                         'currency': b.currency,
+                         'budget': major(b.budget, b.currency)}
+                        for b in self.budgets.values()],
+            'balance': major(self.balance, self.currency),
+        }
+
+        if full:
+            data['transactions'] = [t.to_dict(minor_units)
+                                    for t in self.transactions]
+
+        return data
@@ -16,7 +16,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import logging
 
-from flask import Response, url_for, redirect
+from flask import Response, abort, url_for, redirect
 import connexion
 
 from mone.www import db
@@ -40,6 +40,17 @@ def post() -> Response:
     return redirect(url_for('.mone_www_book_search'), 303)
 
 
+def reconcile(uuid: str, tolerance: int = 3) -> dict:
+    """POST /account/{uuid}/reconcile?tolerance={tolerance}"""
+    account = Account(db.get_book())
+    logging.debug('Reconcile account %s.', uuid)
+    try:
+        return account.reconcile(uuid, connexion.request.get_json(),
+                                 tolerance)
+    except KeyError:
+        abort(404)
+
+
 def search() -> dict:
     """GET /account"""
     account = Account(db.get_book())
@@ -14,15 +14,16 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from flask import Response
 import connexion
 
 from mone.www import db
 from mone.www.model import Book
 
 
-def search() -> dict:
+def search() -> Response:
     """GET /book?full={full}"""
     book = Book(db.get_book())
     full = connexion.request.args.get('full')
     full = full == 'true'
-    return book.read(full)
+    return Response(book.read(full), mimetype='application/json')
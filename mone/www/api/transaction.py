@@ -39,7 +39,11 @@ def post() -> Response:
     return redirect(url_for('.mone_www_book_search', full='true'), 303)
 
 
-def search() -> dict:
-    """GET /transaction"""
+def search() -> Response:
+    """GET /transaction?q={q}&limit={limit}&offset={offset}"""
     transaction = Transaction(db.get_book())
-    return transaction.read()
+    args = connexion.request.args
+    limit = args.get('limit', type=int)
+    offset = args.get('offset', 0, type=int)
+    return Response(transaction.read(args.get('q'), limit, offset),
+                    mimetype='application/json')
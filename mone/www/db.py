@@ -16,23 +16,40 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import sqlite3
+import threading
 
 import click
 from flask import current_app
 from flask import g
 from flask.cli import with_appcontext
 
-from mone.book import BookKeeper
-from mone.www.vault import Vault
+from mone.www.vault import Journal
+
+
+_books = {}
+"""The book of each database, kept between requests."""
+
+_lock = threading.Lock()
 
 
 def get_book():
+    """Load the book from the journal of the application's database. The
+    book is kept between requests, so that e.g. the cached JSON of its
+    transactions and its search index are reused. The events which are
+    journaled by others, e.g. another process, are applied to the kept book
+    on each request.
+    """
     if 'book' not in g:
-        db = get_db()
-        g.vault = Vault(db)
-        g.book = BookKeeper(g.vault.accounts,
-                            g.vault.budgets,
-                            g.vault.transactions)
+        path = current_app.config['DATABASE']
+        with _lock:
+            book = _books.get(path)
+            if book is None:
+                # the book's own connection journals the changes of all
+                # requests, which are serialized by the lock of the book
+                db = sqlite3.connect(path, check_same_thread=False)
+                book = _books[path] = Journal(db).load()
+        book.sync()
+        g.book = book
 
     return g.book
 
@@ -15,6 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import datetime
+import itertools
+import json
 
 import mone.book
 
@@ -26,21 +28,35 @@ class Account():
     def create(self, data):
         acct = mone.book.Account(data['name'],
                                  data['balance'],
-                                 data['extern'])
+                                 data['extern'],
+                                 currency=data.get('currency'))
         self.book.add(acct)
 
-    def read(self):
+    def read(self, snapshot=None):
+        """Return the accounts of the book's *snapshot*, by default the
+        latest."""
         def to_dict(acct):
             return {'balance': acct.balance,
+                    'currency': acct.currency,
                     'extern': acct.extern,
                     'name': acct.name,
                     'uuid': acct.uuid}
 
-        return list(map(to_dict, self.book.accounts.values()))
+        snapshot = snapshot or self.book.snapshot()
+        return list(map(to_dict, snapshot.accounts.values()))
 
     def delete(self, uuid, replacement):
         self.book.replace(uuid, replacement)
 
+    def reconcile(self, uuid, data, tolerance=3):
+        statement = [mone.book.Transaction.from_dict(t) for t in data]
+        result = self.book.reconcile(uuid, statement,
+                                     datetime.timedelta(days=tolerance))
+        return {'matched': [{'statement': s.to_dict(), 'booked': b.to_dict()}
+                            for s, b in result.matched],
+                'missing': [t.to_dict() for t in result.missing],
+                'extra': [t.to_dict() for t in result.extra]}
+
 
 class Budget():
     def __init__(self, book):
@@ -52,14 +68,17 @@ class Budget():
                                   data['budget'])
         self.book.add(budget)
 
-    def read(self):
+    def read(self, snapshot=None):
+        """Return the budgets of the book's *snapshot*, by default the
+        latest."""
         def to_dict(budget):
             return {'balance': budget.balance,
                     'budget': budget.budget,
                     'name': budget.name,
                     'uuid': budget.uuid}
 
-        return list(map(to_dict, self.book.budgets.values()))
+        snapshot = snapshot or self.book.snapshot()
+        return list(map(to_dict, snapshot.budgets.values()))
 
     def delete(self, uuid, replacement):
         self.book.replace(uuid, replacement)
@@ -70,11 +89,21 @@ class Book():
         self.book = book
 
     def read(self, full=False):
-        response = {'accounts': Account(self.book).read(),
-                    'balance': self.book.balance,
-                    'budgets': Budget(self.book).read()}
+        """Return the book as JSON.
+
+        The book is read from one snapshot, so that it is consistent while
+        other requests change it. The transactions of a *full* book are
+        spliced into the JSON object as their cached JSON.
+        """
+        snapshot = self.book.snapshot()
+        response = json.dumps({
+            'accounts': Account(self.book).read(snapshot),
+            'balance': snapshot.balance,
+            'budgets': Budget(self.book).read(snapshot)}).encode()
         if full:
-            response['transactions'] = Transaction(self.book).read()
+            transactions = Transaction(self.book).read(snapshot=snapshot)
+            response = (response[:-1] + b', "transactions": '
+                        + transactions + b'}')
 
         return response
 
@@ -90,21 +119,27 @@ class Transaction():
             sources=set(data['sources']),
             receiver=set(data['receiver']),
             date=datetime.date.fromisoformat(data['date']),
-            tags=set(data['tags'])
+            tags=set(data['tags']),
+            currency=data.get('currency')
         )
         self.book.add(transaction)
 
-    def read(self):
-        def to_dict(transaction):
-            return {'uuid': transaction.uuid,
-                    'date': transaction.date.isoformat(),
-                    'description': transaction.description,
-                    'receiver': list(transaction.receiver),
-                    'sources': list(transaction.sources),
-                    'tags': list(transaction.tags),
-                    'value': transaction.value}
-
-        return list(map(to_dict, self.book.transactions))
+    def read(self, query=None, limit=None, offset=0, snapshot=None):
+        """Return the transactions as JSON array.
+
+        Without a *query*, the transactions are read from the book's
+        *snapshot*, by default the latest. The array is joined from the
+        cached JSON of each transaction.
+        """
+        if query:
+            transactions = self.book.search(query, limit, offset)
+        else:
+            snapshot = snapshot or self.book.snapshot()
+            stop = None if limit is None else offset + limit
+            transactions = itertools.islice(snapshot.transactions,
+                                            offset, stop)
+
+        return b'[' + b', '.join(t.to_json() for t in transactions) + b']'
 
     def delete(self, uuid):
         self.book.remove(uuid)
@@ -44,3 +44,17 @@ CREATE TABLE IF NOT EXISTS transactions (
   json_data TEXT NOT NULL
   -- FOREIGN KEY (user_id) REFERENCES user (id)
 );
+
+-- The append-only journal of all changes of the book.
+CREATE TABLE IF NOT EXISTS journal (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  event TEXT NOT NULL,
+  json_data TEXT NOT NULL,
+  created TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- The book as of the journal's event seq.
+CREATE TABLE IF NOT EXISTS snapshots (
+  seq INTEGER PRIMARY KEY,
+  json_data TEXT NOT NULL
+);
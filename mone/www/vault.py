@@ -22,7 +22,22 @@ A vault to store the book's records
 ===================================
 
 This module provides classes which extend several of the :mod:`~mone.book`
-classes to be stored in a database, aka the vault.
+classes to be read from a database, aka the vault.
+
+The :class:`Journal` stores the book as an append-only journal of its
+changes instead. Each change of a :class:`JournaledBook` is a single insert
+into the journal, which is also the audit trail of the book. To open the book
+quickly, the journal is compacted from time to time into a snapshot of the
+whole book. Only the changes after the last snapshot are replayed when the
+book is loaded::
+
+   >>> journal = Journal(db)
+   >>> book = journal.load()
+   >>> book.add(transaction)  # appends one event to the journal
+
+Several books, e.g. of different processes, can journal into the same
+database. Before a book appends an event, it applies the events appended by
+the other books.
 
 .. currentmodule:: mone.vault
 
@@ -32,28 +47,25 @@ classes to be stored in a database, aka the vault.
 """
 
 from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Tuple, Union
+import contextlib
 import json
 import logging
 import sqlite3
 
 import mone.book
+import mone.recurring
 
 
 class StoredAccounts(mone.book.Accounts):
-    """Extend :class:`~mone.book.Accounts` to store them in a database."""
+    """Extend :class:`~mone.book.Accounts` to read them from a database."""
 
     def __init__(self, db) -> None:
-        """Stores the accounts in the database *db*. """
+        """Reads the accounts stored in the database *db*. """
         self.db = db
         accounts = self.__fetch__()
         super().__init__(accounts)
 
-    def __delitem__(self, uuid: str) -> None:
-        logging.debug('Delete stored account: %s', uuid)
-        self.db.execute('DELETE FROM accounts WHERE id=?', (uuid,))
-        self.db.commit()
-        super().__delitem__(uuid)
-
     def __fetch__(self) -> mone.book.Accounts:
         results = self.db.execute('SELECT * FROM accounts').fetchall()
         accounts = list(map(lambda d: mone.book.Account.from_dict(json.loads(d[1])),
@@ -61,29 +73,17 @@ class StoredAccounts(mone.book.Accounts):
         uuids = map(lambda d: d[0], results)
         return mone.book.Accounts(zip(uuids, accounts))
 
-    def __setitem__(self, uuid: str, account: mone.book.Account) -> None:
-        logging.debug('Add stored account: %s', account)
-        self.db.execute('INSERT INTO accounts VALUES (?, ?)',
-                        [uuid, json.dumps(account.to_dict())])
-        self.db.commit()
-        super().__setitem__(uuid, account)
-
 
 class StoredBudgets(mone.book.Accounts):
-    """Extend :class:`~mone.book.Accounts` to store budgets in a database."""
+    """Extend :class:`~mone.book.Accounts` to read budgets from a
+    database."""
 
     def __init__(self, db) -> None:
-        """Stores the budgets in the database *db*. """
+        """Reads the budgets stored in the database *db*. """
         self.db = db
         budgets = self.__fetch__()
         super().__init__(budgets)
 
-    def __delitem__(self, uuid: str) -> None:
-        logging.debug('Delete stored budget: %s', uuid)
-        self.db.execute('DELETE FROM budgets WHERE id=?', (uuid,))
-        self.db.commit()
-        super().__delitem__(uuid)
-
     def __fetch__(self) -> mone.book.Accounts:
         results = self.db.execute('SELECT * FROM budgets').fetchall()
         budgets = list(map(lambda d: mone.book.Budget.from_dict(json.loads(d[1])),
@@ -91,63 +91,35 @@ class StoredBudgets(mone.book.Accounts):
         uuids = map(lambda d: d[0], results)
         return mone.book.Accounts(zip(uuids, budgets))
 
-    def __setitem__(self, uuid: str, budget: mone.book.Budget) -> None:
-        logging.debug('Add stored budget: %s', budget)
-        self.db.execute('INSERT INTO budgets VALUES (?, ?)',
-                        [uuid, json.dumps(budget.to_dict())])
-        self.db.commit()
-        super().__setitem__(uuid, budget)
-
 
 class StoredTransactions(mone.book.Transactions):
-    """Extend :class:`~mone.book.Transactions` to store them in a database."""
+    """Extend :class:`~mone.book.Transactions` to read them from a
+    database."""
 
     def __init__(self, db) -> None:
-        """Stores the transactions in the database *db*. """
+        """Reads the transactions stored in the database *db*. """
         self.db = db
         transactions = self.__fetch__()
         super().__init__(transactions)
 
     def __fetch__(self) -> mone.book.Transactions:
         # fetch all transactions and return them
-        results = self.db.execute('SELECT * FROM transactions').fetchall()
+        results = self.db.execute(
+            'SELECT id, json_data FROM transactions').fetchall()
         return mone.book.Transactions(
             map(lambda d: mone.book.Transaction.from_dict(json.loads(d[1])),
                 results))
 
-    def append(self, transaction: mone.book.Transaction) -> None:
-        """Extend :meth:`~mone.book.Transactions.append` to insert the transaction into
-        the database.
-        """
-        logging.debug('Add stored transaction: %s', transaction)
-        self.db.execute('INSERT INTO transactions VALUES (?, ?)',
-                        [transaction.uuid,
-                         json.dumps(transaction.to_dict())])
-        self.db.commit()
-        super().append(transaction)
-
-    def overwrite(self, transactions: mone.book.Transactions) -> None:
-        """Overwrite the stored transactions with the *transactions*."""
-        logging.debug('Overwrite stored transactions!')
-        self.db.execute('DELETE FROM transactions')
-        self.db.executemany('INSERT INTO transactions VALUES (?, ?)',
-                            list(map(lambda t: (t.uuid,
-                                                json.dumps(t.to_dict())),
-                                     transactions)))
-        self.db.commit()
-
-    def remove(self, transaction: mone.book.Transaction) -> None:
-        logging.debug('Remove transaction: %s', transaction)
-        super().remove(transaction)
-        is_str = isinstance(transaction, str)
-        uuid = transaction if is_str else transaction.uuid
-        self.db.execute('DELETE FROM transactions WHERE id=?', (uuid,))
-        self.db.commit()
-
 
 @dataclass
 class Vault():
-    """Store accounts, budgets and transactions in a database."""
+    """Read the accounts, budgets and transactions stored in a database.
+
+    .. note:: Books are stored by the :class:`Journal`. The vault is read-only
+              and its tables are only read to load books stored before the
+              journal existed. Changes of the stored accounts, budgets or
+              transactions are not written to the database.
+    """
     db: sqlite3.Connection
 
     accounts: StoredAccounts = field(init=False)
@@ -163,3 +135,256 @@ class Vault():
         self.accounts = StoredAccounts(self.db)
         self.budgets = StoredBudgets(self.db)
         self.transactions = StoredTransactions(self.db)
+
+
+def _opening(account: mone.book.Account) -> dict:
+    # the account as dictionary with the balance it was opened with, so that
+    # the transactions can be booked again on it
+    data = account.to_dict()
+    data['balance'] = float(account._opening)
+    return data
+
+
+class Journal():
+    """An append-only journal of the changes of a book in a database.
+
+    The journal stores the events:
+
+    - ``'account'`` an account was added
+    - ``'budget'`` a budget was added
+    - ``'transactions'`` transactions were added
+    - ``'recurring'`` a recurring template was added
+    - ``'remove'`` a transaction was removed
+    - ``'replace'`` an account or budget was replaced by another
+
+    Every *interval* events, the whole book is stored as snapshot by
+    :meth:`compact()`.
+    """
+
+    def __init__(self, db: sqlite3.Connection, interval: int = 1000) -> None:
+        """Journal the changes in the database *db*."""
+        self.db = db
+
+        self.interval = interval
+        """The number of events after which the book is compacted."""
+
+    def __migrate__(self) -> None:
+        # add the journal to vaults created before it existed
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS journal ('
+                            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                            'event TEXT NOT NULL, '
+                            'json_data TEXT NOT NULL, '
+                            'created TEXT DEFAULT CURRENT_TIMESTAMP)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS snapshots ('
+                            'seq INTEGER PRIMARY KEY, '
+                            'json_data TEXT NOT NULL)')
+
+    def append(self, event: str, data: Any) -> int:
+        """Append the *event* with its *data* and return its sequence
+        number."""
+        logging.debug('Journal event: %s', event)
+        with self.db:
+            cursor = self.db.execute(
+                'INSERT INTO journal (event, json_data) VALUES (?, ?)',
+                (event, json.dumps(data)))
+        return cursor.lastrowid
+
+    def compact(self, book: 'JournaledBook') -> None:
+        """Store a snapshot of the *book* at the book's last event.
+
+        The events before the snapshot are kept as audit trail.
+        """
+        seq = book.seq
+        logging.debug('Compact journal at event %s', seq)
+        transactions = b', '.join(t.to_json() for t in book.transactions)
+        snapshot = (json.dumps({'accounts': list(map(_opening,
+                                                     book.accounts.values())),
+                                'budgets': book.budgets.to_dict(),
+                                'recurring': [r.to_dict() for r in
+                                              book.recurring.values()]})[:-1]
+                    + ', "transactions": [' + transactions.decode() + ']}')
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?)',
+                            (seq, snapshot))
+
+    def due(self) -> bool:
+        """Return whether the journal should be compacted."""
+        last = self.db.execute('SELECT MAX(seq) FROM snapshots').fetchone()[0]
+        return self.seq() - (last or 0) >= self.interval
+
+    def events(self, seq: int) -> Iterator[Tuple[int, str, Any]]:
+        """Return the sequence number, event and data of each event after the
+        sequence number *seq* in order."""
+        rows = self.db.execute('SELECT seq, event, json_data FROM journal '
+                               'WHERE seq > ? ORDER BY seq', (seq,))
+        return ((seq, event, json.loads(data))
+                for seq, event, data in rows.fetchall())
+
+    def seq(self) -> int:
+        """Return the sequence number of the last event or 0."""
+        seq = self.db.execute('SELECT MAX(seq) FROM journal').fetchone()[0]
+        return seq or 0
+
+    def load(self) -> 'JournaledBook':
+        """Return the book from the last snapshot and the events after it.
+
+        If the journal is empty, the book is loaded from the tables of the
+        :class:`Vault` and stored as the first snapshot.
+        """
+        self.__migrate__()
+        row = self.db.execute('SELECT seq, json_data FROM snapshots '
+                              'ORDER BY seq DESC LIMIT 1').fetchone()
+        if row is None:
+            vault = Vault(self.db)
+            book = JournaledBook(None, mone.book.Accounts(vault.accounts),
+                                 mone.book.Accounts(vault.budgets),
+                                 mone.book.Transactions(vault.transactions))
+            seq = 0
+        else:
+            seq, data = row[0], json.loads(row[1])
+            accounts = map(mone.book.Account.from_dict, data['accounts'])
+            budgets = map(mone.book.Budget.from_dict, data['budgets'])
+            book = JournaledBook(
+                None,
+                mone.book.Accounts((a.uuid, a) for a in accounts),
+                mone.book.Accounts((b.uuid, b) for b in budgets),
+                mone.book.Transactions.from_dict(data['transactions']))
+            for recurring in data.get('recurring', ()):
+                book.add(mone.recurring.Recurring.from_dict(recurring))
+
+        book.seq = seq
+        book.sync(self)
+        book.journal = self
+        if row is None:
+            self.compact(book)
+        return book
+
+    @contextlib.contextmanager
+    def writing(self) -> Iterator[None]:
+        """Return a context in which no other connection writes to the
+        database.
+
+        The changes within the context are committed when it exits or rolled
+        back if it exits with an exception.
+        """
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.db.rollback()
+            raise
+        else:
+            self.db.commit()
+
+
+class JournaledBook(mone.book.BookKeeper):
+    """Extend :class:`~mone.book.BookKeeper` to append each change to a
+    :class:`Journal`.
+
+    Each change is journaled while the book's lock is held, so that the
+    journal has the changes in the order of the book. Before a change, the
+    events which other books appended to the journal since the book's last
+    event are applied by :meth:`sync()` while the database is locked for
+    writing, so that the change is journaled right after them.
+    """
+
+    def __init__(self, journal: Journal, accounts: mone.book.Accounts,
+                 budgets: mone.book.Accounts,
+                 transactions: mone.book.Transactions) -> None:
+        """Open the book and journal its changes in the *journal*."""
+        super().__init__(accounts, budgets, transactions)
+        self.journal = journal
+
+        self.seq = 0
+        """The sequence number of the last event of the book in the
+        journal."""
+
+    def __record__(self, event: str, data: Any) -> None:
+        if self.journal is None:
+            return
+        self.seq = self.journal.append(event, data)
+        if self.journal.due():
+            self.journal.compact(self)
+
+    @contextlib.contextmanager
+    def __writing__(self) -> Iterator[None]:
+        # hold the book's lock and the journal's write lock and apply the
+        # events of other books before changing the book
+        with self._lock:
+            if self.journal is None:
+                yield
+                return
+            with self.journal.writing():
+                self.sync()
+                yield
+
+    def add(self, other: Union[mone.book.Account, mone.book.Budget,
+                               mone.book.Transaction,
+                               mone.recurring.Recurring]) -> None:
+        with self.__writing__():
+            super().add(other)
+            if isinstance(other, mone.book.Budget):
+                self.__record__('budget', other.to_dict())
+            elif isinstance(other, mone.book.Account):
+                self.__record__('account', _opening(other))
+            elif (isinstance(other, mone.book.Transaction)
+                  and self._batch is None):
+                self.__record__('transactions', [other.to_dict()])
+            elif isinstance(other, mone.recurring.Recurring):
+                self.__record__('recurring', other.to_dict())
+
+    def add_many(self, transactions: Iterable[mone.book.Transaction]) -> None:
+        transactions = list(transactions)
+        with self.__writing__():
+            super().add_many(transactions)
+            if transactions:
+                self.__record__('transactions',
+                                [t.to_dict() for t in transactions])
+
+    def apply(self, event: str, data: Any) -> None:
+        """Apply the *event* with its *data* to the book."""
+        if event == 'account':
+            self.add(mone.book.Account.from_dict(data))
+        elif event == 'budget':
+            self.add(mone.book.Budget.from_dict(data))
+        elif event == 'transactions':
+            self.add_many(map(mone.book.Transaction.from_dict, data))
+        elif event == 'recurring':
+            self.add(mone.recurring.Recurring.from_dict(data))
+        elif event == 'remove':
+            self.remove(data['uuid'])
+        elif event == 'replace':
+            self.replace(data['current'], data['replacement'])
+        else:
+            raise ValueError(f'unknown event {event!r}')
+
+    def remove(self, transaction: Union[mone.book.Transaction, str]) -> None:
+        uuid = transaction if isinstance(transaction, str) else \
+            transaction.uuid
+        with self.__writing__():
+            if uuid in self.transactions:
+                super().remove(transaction)
+                self.__record__('remove', {'uuid': uuid})
+
+    def replace(self, current: str, replacement: str) -> None:
+        with self.__writing__():
+            super().replace(current, replacement)
+            self.__record__('replace', {'current': current,
+                                        'replacement': replacement})
+
+    def sync(self, journal: Journal = None) -> None:
+        """Apply the events after :attr:`seq` of the book's or the *journal*.
+
+        The events are appended by other books journaling into the same
+        database, e.g. of another process.
+        """
+        with self._lock:
+            # the applied events are not journaled again
+            own, self.journal = self.journal, None
+            try:
+                for seq, event, data in (journal or own).events(self.seq):
+                    self.apply(event, data)
+                    self.seq = seq
+            finally:
+                self.journal = own
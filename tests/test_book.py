@@ -17,9 +17,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import datetime
+import gc
+import json
+import os
+import tempfile
+import threading
 import unittest
 
 import mone.book
+import mone.importer
 
 
 class TestAccounts(unittest.TestCase):
@@ -87,12 +94,112 @@ class TestTransactions(unittest.TestCase):
         """Append not a Transaction and expect a type error."""
         self.assertRaises(TypeError, self.transactions.append, None)
 
+    def test_from_csv(self):
+        """Read the transactions from a bank export."""
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, 'export.csv')
+            with open(file, 'w') as f:
+                f.write('Bank export\n'
+                        'Date;Description;Amount\n'
+                        '01.03.2021;Rent;-1.200,00\n'
+                        '\n'
+                        '02.03.2021;Salary;3.000,50\n')
+
+            transactions = mone.book.Transactions.iter_csv(
+                file, 2, 0, 1, skiprows=2, delimiter=';', thousands='.',
+                decimal=',', datefmt='%d.%m.%Y', account='bank',
+                counterpart='extern')
+            rent = next(transactions)
+            self.assertEqual(rent.value, 1200)
+            self.assertEqual(rent.date, datetime.date(2021, 3, 1))
+            self.assertEqual(rent.sources, {'bank'})
+            self.assertEqual(rent.receiver, {'extern'})
+
+            salary, = transactions
+            self.assertEqual(salary.value, 3000.5)
+            self.assertEqual(salary.description, 'Salary')
+            self.assertEqual(salary.sources, {'extern'})
+
+            transactions = mone.book.Transactions.from_csv(
+                file, 2, 0, 1, skiprows=2, delimiter=';', thousands='.',
+                decimal=',', datefmt='%d.%m.%Y', minor_units=True,
+                account='bank', counterpart='extern')
+            self.assertEqual([t.value for t in transactions], [120000, 300050])
+
+            # the rows can't be transferred without account and counterpart
+            self.assertRaises(ValueError, mone.book.Transactions.iter_csv,
+                              file, 2, 0, 1, account='bank')
+            self.assertRaises(ValueError, mone.book.Transactions.from_csv,
+                              file, 2, 0, 1, counterpart='extern')
+
     def test_remove(self):
         """Remove a transaction by it's uuid."""
         self.transactions.remove(self.transaction_list[0].uuid)
         self.assertEqual(len(self.transactions),
                          len(self.transaction_list) - 1)
 
+        # the same transaction can be removed by object
+        self.assertIsNone(self.transactions.remove(self.transaction_list[0]))
+        self.assertEqual(self.transactions.remove(self.transaction_list[1]),
+                         self.transaction_list[1])
+        self.assertEqual(list(self.transactions), self.transaction_list[2:])
+
+    def test_lookup(self):
+        """Look up transactions by object and uuid in insertion order."""
+        coffee, drinks, dinner = self.transaction_list
+        self.assertIn(coffee, self.transactions)
+        self.assertIn(drinks.uuid, self.transactions)
+        self.assertIs(self.transactions[dinner.uuid], dinner)
+        self.assertIsNone(self.transactions.get('unknown'))
+        self.assertEqual(list(self.transactions), self.transaction_list)
+
+        # appending a known transaction again keeps its position
+        self.transactions.append(coffee)
+        self.assertEqual(list(self.transactions), self.transaction_list)
+
+
+class TestTransaction(unittest.TestCase):
+    """Test a Transaction."""
+
+    def test_shared_sets(self):
+        """Transactions between the same accounts share their sets."""
+        coffee = mone.book.Transaction(4, 'Coffee', {'account'}, {'shop'},
+                                       tags={'food'})
+        dinner = mone.book.Transaction(40, 'Dinner', ['account'], ['shop'],
+                                       tags=['food'])
+        self.assertIs(coffee.sources, dinner.sources)
+        self.assertIs(coffee.receiver, dinner.receiver)
+        self.assertIs(coffee.tags, dinner.tags)
+        self.assertRaises(AttributeError, setattr, coffee, 'other', None)
+
+        # sets no transaction uses anymore are dropped
+        tip = mone.book.Transaction(1, 'Tip', {'account'}, {'waiter'})
+        self.assertIn(frozenset({'waiter'}), mone.book._frozensets)
+        del tip
+        gc.collect()
+        self.assertNotIn(frozenset({'waiter'}), mone.book._frozensets)
+
+    def test_to_json(self):
+        """Cache the JSON until the transaction is updated."""
+        transaction = mone.book.Transaction(10, 'Coffee', {'cash'}, {'shop'},
+                                            datetime.date(2021, 3, 1))
+        data = transaction.to_json()
+        self.assertEqual(json.loads(data), transaction.to_dict())
+        self.assertIs(transaction.to_json(), data)
+
+        transaction.update('cash', 'bank')
+        self.assertEqual(json.loads(transaction.to_json())['sources'],
+                         ['bank'])
+
+    def test_update(self):
+        """Replace an account without changing other transactions."""
+        coffee = mone.book.Transaction(4, 'Coffee', {'account'}, {'shop'})
+        dinner = mone.book.Transaction(40, 'Dinner', {'account'}, {'shop'})
+        coffee.update('account', 'wallet')
+        self.assertEqual(coffee.sources, {'wallet'})
+        self.assertEqual(dinner.sources, {'account'})
+        self.assertEqual(coffee.receiver, {'shop'})
+
 
 class TestAccount(unittest.TestCase):
     """Test an Account."""
@@ -137,6 +244,439 @@ class TestAccount(unittest.TestCase):
         self.account.add(transaction)
         self.assertEqual(self.account.balance, 100)
 
+    def test_check_balance(self):
+        """Compare the kept balance with the recomputed one."""
+        self.account.add(mone.book.Transaction(10, 'Spend money',
+                                               {self.account.uuid},
+                                               {self.other.uuid}))
+        self.account.check_balance()
+
+        # adding the same transaction twice books it only once
+        self.account.add(next(iter(self.account.transactions)))
+        self.assertEqual(self.account.balance, 90)
+
+        self.account._delta += 1
+        self.assertRaises(RuntimeError, self.account.check_balance)
+
+    def test_remove(self):
+        """Remove a transaction by object and uuid to restore the balance."""
+        spend = mone.book.Transaction(10, 'Spend money', {self.account.uuid},
+                                      {self.other.uuid})
+        earn = mone.book.Transaction(30, 'Earn money', {self.other.uuid},
+                                     {self.account.uuid})
+        self.account.add(spend)
+        self.account.add(earn)
+        self.assertEqual(self.account.balance, 120)
+
+        self.account.remove(spend)
+        self.assertEqual(self.account.balance, 130)
+        self.account.remove(earn.uuid)
+        self.assertEqual(self.account.balance, 100)
+
+        # removing a transaction twice doesn't change the balance
+        self.account.remove(earn)
+        self.assertEqual(self.account.balance, 100)
+
+    def test_history(self):
+        """Add transactions out of order and return their running balance."""
+        dates = [datetime.date(2021, 3, d) for d in (10, 1, 20, 1)]
+        values = [10, 20, 30, 40]
+        for date, value in zip(dates, values):
+            self.account.add(mone.book.Transaction(value, 'Spend money',
+                                                   {self.account.uuid},
+                                                   {self.other.uuid}, date))
+
+        history = self.account.history()
+        self.assertEqual(history['date'], ['2021-03-01', '2021-03-01',
+                                           '2021-03-10', '2021-03-20'])
+        self.assertEqual(history['balance'], [80, 40, 30, 0])
+
+        history = self.account.history([datetime.date(2021, 3, 15),
+                                        datetime.date(2021, 3, 5)])
+        self.assertEqual(history, {'balance': [30], 'date': ['2021-03-10']})
+
+        # the running balance follows after a removal
+        self.account.remove(next(iter(self.account.transactions)))
+        self.assertEqual(self.account.history()['balance'], [80, 40, 10])
+        self.account.check_balance()
+
+    def test_window(self):
+        """Return the transactions and signed values between two dates."""
+        dates = [datetime.date(2021, 3, d) for d in (10, 1, 20, 5)]
+        transactions = [mone.book.Transaction(value, 'Spend money',
+                                              {self.account.uuid},
+                                              {self.other.uuid}, date)
+                        for value, date in zip([10, 20, 30, 40], dates)]
+        for transaction in transactions:
+            self.account.add(transaction)
+
+        window = self.account.window(datetime.date(2021, 3, 5),
+                                     datetime.date(2021, 3, 20))
+        self.assertEqual(window, [(transactions[3], -40),
+                                  (transactions[0], -10),
+                                  (transactions[2], -30)])
+        self.assertEqual(self.account.window(datetime.date(2021, 3, 1),
+                                             datetime.date(2021, 3, 1)),
+                         [(transactions[1], -20)])
+        self.assertEqual(self.account.window(datetime.date(2021, 3, 21),
+                                             datetime.date(2021, 3, 31)), [])
+
+    def test_balance_at(self):
+        """Query the balance at dates before and after a back-dated add."""
+        for day, value in ((1, 10), (15, 20), (28, 30)):
+            self.account.add(mone.book.Transaction(
+                value, 'Spend money', {self.account.uuid}, {self.other.uuid},
+                datetime.date(2021, 2, day)))
+
+        self.assertEqual(self.account.balance_at(datetime.date(2021, 1, 31)),
+                         100)
+        self.assertEqual(self.account.balance_at(datetime.date(2021, 2, 15)),
+                         70)
+        self.assertEqual(self.account.balance_at(datetime.date.max), 40)
+
+        self.account.add(mone.book.Transaction(
+            5, 'Earn money', {self.other.uuid}, {self.account.uuid},
+            datetime.date(2021, 2, 10)))
+        self.assertEqual(self.account.balance_at(datetime.date(2021, 2, 1)),
+                         90)
+        self.assertEqual(self.account.balance_at(datetime.date(2021, 2, 20)),
+                         75)
+        self.assertEqual(self.account.balance_at(datetime.date.max),
+                         self.account.balance)
+
+
+class TestBudget(unittest.TestCase):
+    """Test a Budget."""
+
+    def setUp(self):
+        self.budget = mone.book.Budget('Food', 500)
+        self.account = mone.book.Account('Bank', 1000)
+
+    def test_balance(self):
+        """Spend from the budget, also within the budget itself."""
+        self.budget.add(mone.book.Transaction(20, 'Groceries',
+                                              {self.budget.uuid},
+                                              {self.account.uuid}))
+        self.assertEqual(self.budget.balance, 480)
+
+        self.budget.add(mone.book.Transaction(5, 'Shift',
+                                              {self.budget.uuid},
+                                              {self.budget.uuid}))
+        self.assertEqual(self.budget.balance, 475)
+
+        self.budget.budget = 600
+        self.assertEqual(self.budget.balance, 575)
+        self.budget.check_balance()
+
+
+class TestBookKeeper(unittest.TestCase):
+    """Test the BookKeeper."""
+
+    def setUp(self):
+        self.bank = mone.book.Account('Bank', 1000)
+        self.cash = mone.book.Account('Cash', 100)
+        self.extern = mone.book.Account('Extern', extern=True)
+        self.food = mone.book.Budget('Food', 300)
+        accounts = mone.book.Accounts({a.uuid: a for a in (self.bank,
+                                                          self.cash,
+                                                          self.extern)})
+        budgets = mone.book.Accounts({self.food.uuid: self.food})
+        self.book = mone.book.BookKeeper(accounts, budgets,
+                                         mone.book.Transactions())
+
+        self.withdraw = mone.book.Transaction(50, 'Withdraw',
+                                              {self.bank.uuid},
+                                              {self.cash.uuid})
+        self.lunch = mone.book.Transaction(20, 'Lunch',
+                                           {self.cash.uuid, self.food.uuid},
+                                           {self.extern.uuid})
+        self.book.add(self.withdraw)
+        self.book.add(self.lunch)
+
+    def test_balance_at(self):
+        """Query the book's balance before and after a transaction."""
+        self.book.add(mone.book.Transaction(100, 'Salary',
+                                            {self.extern.uuid},
+                                            {self.bank.uuid},
+                                            datetime.date(2021, 1, 31)))
+        self.assertEqual(self.book.balance_at(datetime.date(2021, 1, 30)),
+                         1100)
+        self.assertEqual(self.book.balance_at(datetime.date(2021, 1, 31)),
+                         1200)
+        self.assertEqual(self.book.balance_at(datetime.date.max),
+                         self.book.balance)
+
+    def test_add_many(self):
+        """Add several transactions and a bad one at once."""
+        rebalance = mone.book.Transaction(30, 'Rebalance', {self.bank.uuid},
+                                          {self.food.uuid})
+        refund = mone.book.Transaction(5, 'Refund', {self.extern.uuid},
+                                       {self.cash.uuid})
+        self.assertRaises(TypeError, self.book.add_many, [refund, None])
+        self.assertEqual(len(self.book.transactions), 2)
+
+        self.book.add_many(iter([rebalance, refund]))
+        self.assertTrue(rebalance.budget_rebalance)
+        self.assertEqual(self.bank.balance, 950)
+        self.assertEqual(self.cash.balance, 135)
+        self.assertEqual(self.food.balance, 310)
+        self.assertEqual(len(self.book.transactions), 4)
+
+    def test_add_many_order(self):
+        """Keep an account's transactions by date when adding many."""
+        dates = [datetime.date(2021, 3, d) for d in (20, 5, 12, 1)]
+        many = mone.book.Account('Many', 100)
+        single = mone.book.Account('Single', 100)
+        for acct in (many, single):
+            self.book.add(acct)
+        self.book.add_many([mone.book.Transaction(
+            10, 'Coffee', {many.uuid}, {self.extern.uuid}, date)
+            for date in dates])
+        for date in dates:
+            self.book.add(mone.book.Transaction(
+                10, 'Coffee', {single.uuid}, {self.extern.uuid}, date))
+
+        self.assertEqual(many.history()['date'],
+                         [d.isoformat() for d in sorted(dates)])
+        self.assertEqual(many.history(), single.history())
+        self.assertEqual(many.balance_at(datetime.date(2021, 3, 10)), 80)
+
+    def test_batch(self):
+        """Defer booking to the end of a batch."""
+        refund = mone.book.Transaction(5, 'Refund', {self.extern.uuid},
+                                       {self.cash.uuid})
+        with self.book.batch():
+            self.book.add(refund)
+            with self.book.batch():
+                self.book.add(mone.book.Transaction(
+                    5, 'Refund', {self.extern.uuid}, {self.cash.uuid}))
+            self.assertEqual(self.cash.balance, 130)
+        self.assertEqual(self.cash.balance, 140)
+
+        with self.assertRaises(RuntimeError):
+            with self.book.batch():
+                self.book.add(mone.book.Transaction(
+                    5, 'Refund', {self.extern.uuid}, {self.cash.uuid}))
+                raise RuntimeError
+        self.assertEqual(self.cash.balance, 140)
+        self.assertEqual(len(self.book.transactions), 4)
+
+    def test_search(self):
+        """Search transactions by their description."""
+        self.assertEqual(self.book.search('LUNCH'), [self.lunch])
+        self.assertEqual(self.book.search('withdrw'), [self.withdraw])
+        self.assertEqual(self.book.search('withdrw', fuzzy=False), [])
+
+        dinner = mone.book.Transaction(20, 'Dinner after lunch',
+                                       {self.cash.uuid}, {self.extern.uuid})
+        self.book.add(dinner)
+        self.assertEqual(self.book.search('lunch'), [self.lunch, dinner])
+        self.assertEqual(self.book.search('lunch', limit=1, offset=1),
+                         [dinner])
+
+        self.book.remove(self.lunch)
+        self.assertEqual(self.book.search('lunch'), [dinner])
+
+    def test_tagged(self):
+        """Query transactions by tags and sum up their values."""
+        groceries = mone.book.Transaction(30, 'Groceries', {self.cash.uuid},
+                                          {self.extern.uuid},
+                                          tags={'food', 'groceries'})
+        reimbursed = mone.book.Transaction(15, 'Groceries', {self.cash.uuid},
+                                           {self.extern.uuid},
+                                           tags={'groceries', 'reimbursed'})
+        self.book.add_many([groceries, reimbursed])
+
+        self.assertEqual(list(self.book.tagged(['groceries'])),
+                         [groceries, reimbursed])
+        self.assertEqual(list(self.book.tagged(['groceries'],
+                                               exclude=['reimbursed'])),
+                         [groceries])
+        self.assertEqual(list(self.book.tagged(['food', 'reimbursed'],
+                                               any_tag=True)),
+                         [groceries, reimbursed])
+        self.assertEqual(list(self.book.tagged(['food', 'reimbursed'])), [])
+        self.assertEqual(len(self.book.tagged(exclude=['groceries'])), 2)
+        self.assertEqual(self.book.tag_totals(),
+                         {'food': 30, 'groceries': 45, 'reimbursed': 15})
+
+        self.book.remove(reimbursed)
+        self.assertEqual(self.book.tag_totals(['groceries', 'reimbursed']),
+                         {'groceries': 30, 'reimbursed': 0})
+
+    def test_booked(self):
+        """Look up the transactions booked with an account."""
+        self.assertEqual(self.book.booked(self.cash.uuid),
+                         [self.withdraw, self.lunch])
+        self.assertEqual(self.book.booked(self.bank.uuid), [self.withdraw])
+        self.assertEqual(self.book.booked('unknown'), [])
+
+    def test_imported(self):
+        """Skip the rows of an export which were imported before."""
+        with tempfile.TemporaryDirectory() as tmp:
+            march, april = (os.path.join(tmp, f) for f in ('3.csv', '4.csv'))
+            with open(march, 'w') as f:
+                f.write('2021-03-30,Coffee,-2.5\n'
+                        '2021-03-31,Coffee,-2.5\n'
+                        '2021-03-31,Coffee,-2.5\n')
+            with open(april, 'w') as f:
+                f.write('2021-03-31,Coffee,-2.5\n'
+                        '2021-03-31,Coffee,-2.5\n'
+                        '2021-04-01,Coffee,-2.5\n')
+
+            csv = dict(value=2, date=0, description=1, account=self.cash.uuid,
+                       counterpart=self.extern.uuid)
+            transactions = mone.book.Transactions.from_csv(march, **csv)
+            self.assertEqual(len({t.fingerprint for t in transactions}), 3)
+            self.book.add_many(transactions)
+
+            new = [t for t in mone.book.Transactions.iter_csv(april, **csv)
+                   if not self.book.imported(t.fingerprint)]
+            self.assertEqual([t.date for t in new],
+                             [datetime.date(2021, 4, 1)])
+
+        coffee = list(transactions)[0]
+        self.assertIs(self.book.imported(coffee.fingerprint), coffee)
+        self.book.remove(coffee)
+        self.assertIsNone(self.book.imported(coffee.fingerprint))
+        self.assertIsNone(self.book.imported(None))
+
+    def test_reconcile(self):
+        """Match a statement with the booked transactions by value and date."""
+        def transfer(value, day, description='Coffee'):
+            return mone.importer.transfer(value, description,
+                                          datetime.date(2021, 3, day),
+                                          self.cash.uuid, self.extern.uuid)
+
+        booked = [transfer(-2.5, 1), transfer(-2.5, 3), transfer(-4, 10),
+                  transfer(100, 15, 'Refund'), transfer(-9, 30),
+                  transfer(-7, 27)]
+        self.book.add_many(booked)
+        statement = [transfer(-2.5, 4), transfer(-2.5, 2), transfer(-4, 20),
+                     transfer(-100, 15, 'Refund'), transfer(-7, 28)]
+
+        result = self.book.reconcile(self.cash.uuid, statement)
+        self.assertEqual(result.matched, [(statement[0], booked[1]),
+                                          (statement[1], booked[0]),
+                                          (statement[4], booked[5])])
+        self.assertEqual(result.missing, [statement[2], statement[3]])
+        # the transaction of the 30th is after the statement's period
+        self.assertEqual(result.extra, [booked[2], booked[3]])
+
+        result = self.book.reconcile(self.cash.uuid, statement[2:3],
+                                     datetime.timedelta(days=10))
+        self.assertEqual(result.matched, [(statement[2], booked[2])])
+        self.assertEqual(self.book.reconcile(self.cash.uuid, []),
+                         ([], [], []))
+        self.assertRaises(KeyError, self.book.reconcile, 'unknown', statement)
+
+    def test_remove(self):
+        """Remove a transaction by its uuid from the book."""
+        self.book.remove(self.lunch.uuid)
+        self.assertEqual(len(self.book.transactions), 1)
+        self.assertEqual(self.cash.balance, 150)
+        self.assertEqual(self.food.balance, 300)
+        self.assertEqual(self.book.booked(self.extern.uuid), [])
+
+        # a transaction is found by the date it was booked at
+        self.withdraw.date = datetime.date(2000, 1, 1)
+        self.book.remove(self.withdraw)
+        self.assertEqual(self.cash.balance, 100)
+        self.assertEqual(self.bank.history()['date'], [])
+        self.bank.check_balance()
+
+    def test_replace(self):
+        """Merge the cash into the bank account."""
+        self.book.replace(self.cash.uuid, self.bank.uuid)
+        self.assertNotIn(self.cash.uuid, self.book.accounts)
+        self.assertEqual(self.bank.balance, 980)
+        self.assertEqual(self.book.balance, 980)
+        self.assertEqual(self.book.booked(self.cash.uuid), [])
+        self.assertEqual([t.uuid for t in self.book.booked(self.bank.uuid)],
+                         [self.withdraw.uuid, self.lunch.uuid])
+        self.bank.check_balance()
+
+        # the transactions are replaced by copies
+        self.assertEqual(self.lunch.sources, {self.cash.uuid, self.food.uuid})
+        self.assertEqual(self.book.transactions[self.lunch.uuid].sources,
+                         {self.bank.uuid, self.food.uuid})
+
+    def test_snapshot(self):
+        """Read a snapshot while the book changes."""
+        snapshot = self.book.snapshot()
+        self.assertEqual(snapshot.version, self.book.version)
+        self.assertEqual(list(snapshot.transactions),
+                         [self.withdraw, self.lunch])
+        self.assertEqual(snapshot.to_dict(True), self.book.to_dict(True))
+
+        coffee = mone.book.Transaction(5, 'Coffee', {self.cash.uuid},
+                                       {self.extern.uuid})
+        self.book.add(coffee)
+        self.book.remove(self.withdraw)
+        self.book.replace(self.cash.uuid, self.bank.uuid)
+
+        self.assertEqual(list(snapshot.transactions),
+                         [self.withdraw, self.lunch])
+        self.assertEqual(snapshot.accounts[self.cash.uuid].balance, 130)
+        self.assertEqual(snapshot.balance, 1080)
+        self.assertEqual(self.lunch.sources, {self.cash.uuid, self.food.uuid})
+
+        latest = self.book.snapshot()
+        self.assertEqual([t.uuid for t in latest.transactions],
+                         [self.lunch.uuid, coffee.uuid])
+        self.assertEqual(latest.transactions[-1].sources, {self.bank.uuid})
+        self.assertNotIn(self.cash.uuid, latest.accounts)
+        self.assertEqual(latest.to_dict(True), self.book.to_dict(True))
+
+        # unchanged chunks are shared between snapshots
+        self.book.add_many(mone.book.Transaction(i, 'Many', {self.bank.uuid},
+                                                 {self.extern.uuid})
+                           for i in range(200))
+        before = self.book.snapshot().transactions
+        self.book.add(mone.book.Transaction(3, 'Tea', {self.bank.uuid},
+                                            {self.extern.uuid}))
+        after = self.book.snapshot().transactions
+        self.assertEqual(len(after), len(before) + 1)
+        self.assertIs(after._chunks[0], before._chunks[0])
+        self.assertEqual(after[150], before[150])
+
+        # a transaction added again is in the snapshot once
+        tea = after[-1]
+        self.book.add(tea)
+        self.book.add_many([coffee, coffee])
+        latest = self.book.snapshot()
+        self.assertEqual(list(latest.transactions),
+                         list(self.book.transactions))
+        self.assertEqual(latest.to_dict(True, True),
+                         self.book.to_dict(True, True))
+
+    def test_threads(self):
+        """Change the book from several threads."""
+        def write():
+            for _ in range(200):
+                self.book.add(mone.book.Transaction(
+                    1, 'Coffee', {self.bank.uuid}, {self.extern.uuid}))
+
+        def read():
+            for _ in range(200):
+                snapshot = self.book.snapshot()
+                versions.append(snapshot.version)
+                self.assertEqual(len(snapshot.transactions),
+                                 len(list(snapshot.transactions)))
+
+        versions = []
+        threads = [threading.Thread(target=f)
+                   for f in (write, write, write, read)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.book.transactions), 602)
+        self.assertEqual(self.book.snapshot().balance, 1080 - 600)
+        self.assertEqual(versions, sorted(versions))
+        self.bank.check_balance()
+
 
 if __name__ == '__main__':
     unittest.main()
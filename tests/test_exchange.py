@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import tempfile
+import unittest
+
+import mone.book
+import mone.exchange
+
+
+class TestExchangeRates(unittest.TestCase):
+
+    def setUp(self):
+        self.rates = mone.exchange.ExchangeRates('EUR')
+        self.rates.add('USD', datetime.date(2021, 3, 5), 1.25)
+        self.rates.add('USD', datetime.date(2021, 3, 1), 1.2)
+        self.rates.add('CHF', datetime.date(2021, 3, 1), 1.1)
+
+    def test_rate(self):
+        """Look up the last rate known at a date."""
+        rate = self.rates.rate
+        self.assertEqual(rate('EUR'), 1)
+        self.assertEqual(rate(None), 1)
+        self.assertEqual(rate('USD'), 1.25)
+        self.assertEqual(rate('USD', datetime.date(2021, 2, 1)), 1.2)
+        self.assertEqual(rate('USD', datetime.date(2021, 3, 4)), 1.2)
+        self.assertEqual(rate('USD', datetime.date(2021, 3, 5)), 1.25)
+        self.assertRaises(KeyError, rate, 'GBP')
+
+        self.rates.add('USD', datetime.date(2021, 3, 5), 1.3)
+        self.assertEqual(rate('USD'), 1.3)
+
+    @unittest.skipIf(mone.exchange.np is None, 'requires numpy')
+    def test_rates(self):
+        """Compare the vectorized with the single rates."""
+        start = datetime.date(2021, 2, 25)
+        dates = [start + datetime.timedelta(days=i) for i in range(14)]
+        rates = self.rates.rates('USD', [d.toordinal() for d in dates])
+        self.assertEqual(rates.tolist(),
+                         [self.rates.rate('USD', d) for d in dates])
+
+    def test_convert(self):
+        """Convert between two currencies."""
+        date = datetime.date(2021, 3, 1)
+        self.assertAlmostEqual(self.rates.convert(12, 'USD', date=date), 10)
+        self.assertAlmostEqual(self.rates.convert(10, 'EUR', 'CHF', date), 11)
+        self.assertAlmostEqual(self.rates.convert(12, 'USD', 'CHF', date), 11)
+
+    def test_from_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, 'rates.csv')
+            with open(file, 'w') as f:
+                f.write('date;currency;rate\n'
+                        '01.03.2021;USD;1.2\n'
+                        '05.03.2021;USD;1.25\n')
+            rates = mone.exchange.ExchangeRates.from_csv(
+                file, skiprows=1, delimiter=';', datefmt='%d.%m.%Y')
+        self.assertIn('USD', rates)
+        self.assertEqual(rates.rate('USD', datetime.date(2021, 3, 4)), 1.2)
+
+
+class TestConsolidation(unittest.TestCase):
+    """Test the balance of a book with accounts in several currencies."""
+
+    def setUp(self):
+        self.rates = mone.exchange.ExchangeRates('EUR')
+        self.rates.add('USD', datetime.date(2021, 3, 1), 1.2)
+        self.rates.add('USD', datetime.date(2021, 4, 1), 1.25)
+        self.eur = mone.book.Account('Bank', 100)
+        self.usd = mone.book.Account('Dollars', 120, currency='USD')
+        self.extern = mone.book.Account('Extern', extern=True)
+        self.book = mone.book.BookKeeper(mone.book.Accounts(),
+                                         mone.book.Accounts(),
+                                         mone.book.Transactions())
+        for acct in (self.eur, self.usd, self.extern):
+            self.book.add(acct)
+        self.book.add(mone.book.Transaction(
+            60, 'Coffee', {self.usd.uuid}, {self.extern.uuid},
+            datetime.date(2021, 3, 10)))
+        self.book.add(mone.book.Transaction(
+            10, 'Tea', {self.eur.uuid}, {self.extern.uuid},
+            datetime.date(2021, 4, 10)))
+
+    def test_balance(self):
+        self.assertEqual(self.book.balance, 150)
+        self.book.rates = self.rates
+        self.assertAlmostEqual(self.book.balance, 90 + 60 / 1.25)
+        self.assertAlmostEqual(self.book.snapshot().balance, self.book.balance)
+        self.assertAlmostEqual(
+            self.book.balance_at(datetime.date(2021, 3, 31)), 100 + 60 / 1.2)
+
+    @unittest.skipIf(mone.exchange.np is None, 'requires numpy')
+    def test_aggregate(self):
+        """Convert the values at the date of each transaction."""
+        self.book.rates = self.rates
+        self.assertEqual(self.book.aggregate('month'),
+                         {('2021-03',): -50.0, ('2021-04',): -10.0})
+        self.assertEqual(self.book.aggregate('month', where=lambda t: False),
+                         {})
+
+        self.book.add(mone.book.Transaction(
+            12.5, 'Burger', {self.usd.uuid}, {self.extern.uuid},
+            datetime.date(2021, 4, 10), currency='USD'))
+        self.assertEqual(self.book.aggregate('month')[('2021-04',)], -20.0)
+
+    def test_currency(self):
+        """Book a transaction only with accounts in its currency."""
+        burger = mone.book.Transaction(
+            12.5, 'Burger', {self.eur.uuid}, {self.extern.uuid},
+            datetime.date(2021, 4, 10), currency='USD')
+        self.assertRaises(ValueError, self.book.add, burger)
+        self.assertRaises(ValueError, self.book.add_many, [burger])
+        self.assertNotIn(burger, self.book.transactions)
+        self.assertEqual(self.book.balance, 150)
+
+        # an account without currency is in the base currency of the rates
+        self.book.rates = self.rates
+        burger.currency = 'EUR'
+        self.book.add(burger)
+        self.assertAlmostEqual(self.book.balance, 77.5 + 60 / 1.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
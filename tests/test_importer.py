@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import tempfile
+import unittest
+
+import mone.book
+import mone.importer
+
+
+class TestImporter(unittest.TestCase):
+    """Test the import of csv files."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bank = mone.book.Account('Bank', 1000)
+        self.card = mone.book.Account('Card')
+        self.extern = mone.book.Account('Extern', extern=True)
+        self.book = mone.book.BookKeeper(
+            mone.book.Accounts({a.uuid: a for a in (self.bank, self.card,
+                                                    self.extern)}),
+            mone.book.Accounts(), mone.book.Transactions())
+
+        self.files = []
+        for n, acct in enumerate((self.bank, self.card, self.bank)):
+            file = os.path.join(self.tmp.name, f'export-{n}.csv')
+            with open(file, 'w') as f:
+                f.write('Date,Description,Amount\n')
+                for day in range(1, 8):
+                    amount = '-10.25' if day % 2 else '20.50'
+                    f.write(f'2021-03-{day:02d},Row {n}.{day},{amount}\n')
+            self.files.append(mone.importer.CsvFile(
+                file, 2, 0, 1, skiprows=1, datefmt='%Y-%m-%d',
+                account=acct.uuid, counterpart=self.extern.uuid))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_csv(self):
+        """Read the files in parallel in order of files and rows."""
+        transactions = list(mone.importer.read_csv(self.files, max_workers=2,
+                                                   chunksize=64))
+        self.assertEqual([t.description for t in transactions],
+                         [f'Row {n}.{day}' for n in range(3)
+                          for day in range(1, 8)])
+
+        expected = [t for f in self.files
+                    for t in mone.book.Transactions.iter_csv(
+                        f.file, 2, 0, 1, skiprows=1, datefmt='%Y-%m-%d',
+                        account=f.account, counterpart=f.counterpart)]
+        for transaction, other in zip(transactions, expected):
+            self.assertEqual(transaction.value, other.value)
+            self.assertEqual(transaction.date, other.date)
+            self.assertEqual(transaction.sources, other.sources)
+            self.assertEqual(transaction.receiver, other.receiver)
+
+        self.assertRaises(ValueError, mone.importer.CsvFile, self.files[0].file,
+                          2, 0, 1, account=self.bank.uuid)
+
+    def test_ranges(self):
+        """Split a file into byte ranges at the line breaks."""
+        csv_file = self.files[1]
+        with open(csv_file.file, 'rb') as f:
+            data = f.read()
+
+        ranges = list(csv_file.ranges(20))
+        self.assertEqual(ranges[0][0], data.index(b'\n') + 1)
+        self.assertEqual(ranges[-1][1], len(data))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1:end], b'\n')
+
+        rows = [row for r in ranges for row in csv_file.parse(*r)]
+        self.assertEqual([description for _, description, _ in rows],
+                         [f'Row 1.{day}' for day in range(1, 8)])
+
+    def test_import_csv(self):
+        """Import all files into the book."""
+        count = mone.importer.import_csv(self.book, self.files, max_workers=2)
+        self.assertEqual(count, 21)
+        self.assertEqual(len(self.book.transactions), 21)
+        self.assertEqual(self.bank.balance, 1000 + 2 * 20.5)
+        self.assertEqual(self.card.balance, 20.5)
+
+    def test_reimport(self):
+        """Skip the rows imported before or read twice."""
+        self.assertEqual(mone.importer.import_csv(
+            self.book, self.files[:2] + self.files[:1]), 14)
+        self.assertEqual(mone.importer.import_csv(self.book, self.files), 7)
+        self.assertEqual(mone.importer.import_csv(self.book, self.files), 0)
+        self.assertEqual(self.bank.balance, 1000 + 2 * 20.5)
+
+    def test_date_parser(self):
+        """Parse dates like strptime."""
+        for datefmt, date_str in [('%Y-%m-%d', '2021-03-01'),
+                                  ('%d.%m.%Y', '1.3.2021'),
+                                  ('%m/%d/%y', '03/01/21'),
+                                  ('%Y%m%d', '20210301'),
+                                  ('%d %b %Y', '01 Mar 2021')]:
+            parse = mone.importer.date_parser(datefmt)
+            self.assertEqual(parse(date_str), datetime.date(2021, 3, 1))
+            self.assertEqual(parse(date_str), datetime.datetime.strptime(
+                date_str, datefmt).date())
+
+        parse = mone.importer.date_parser('%d.%m.%Y')
+        self.assertRaises(ValueError, parse, '2021-03-01')
+        self.assertRaises(ValueError, parse, '31.02.2021')
+
+    def test_csv_parser(self):
+        """Share the date of equal date strings."""
+        parse = mone.importer.csv_parser(2, 0, 1)
+        rent = parse(['2021-03-01', 'Rent', '-1200.00'])
+        salary = parse(['2021-03-01', 'Salary', '3000.50'])
+        self.assertEqual(rent[2], datetime.date(2021, 3, 1))
+        self.assertIs(rent[2], salary[2])
+        self.assertEqual(salary[0], 3000.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import random
+import unittest
+
+import mone.book
+import mone.exchange
+import mone.ledger
+import mone.recurring
+
+
+@unittest.skipIf(mone.ledger.np is None, 'requires numpy')
+class TestLedger(unittest.TestCase):
+    """Test the Ledger against the object model of the book."""
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.bank = mone.book.Account('Bank', 1000)
+        self.cash = mone.book.Account('Cash', 100.5)
+        self.extern = mone.book.Account('Extern', extern=True)
+        self.food = mone.book.Budget('Food', 300)
+        self.fun = mone.book.Budget('Fun', 50)
+        self.book = mone.book.BookKeeper(mone.book.Accounts(),
+                                         mone.book.Accounts(),
+                                         mone.book.Transactions())
+        for acct in (self.bank, self.cash, self.extern, self.food, self.fun):
+            self.book.add(acct)
+
+        uuids = [self.bank.uuid, self.cash.uuid, self.extern.uuid,
+                 self.food.uuid, self.fun.uuid, 'unknown']
+        start = datetime.date(2021, 1, 1)
+        for i in range(200):
+            sources = set(rng.sample(uuids, rng.randint(1, 2)))
+            receiver = set(rng.sample(uuids, rng.randint(1, 2)))
+            date = start + datetime.timedelta(days=rng.randint(0, 365))
+            tags = set(rng.sample(['food', 'fun', 'rent'], rng.randint(0, 2)))
+            self.book.add(mone.book.Transaction(
+                round(rng.uniform(0, 100), 2), f'Transaction {i}', sources,
+                receiver, date, tags))
+
+        # a budget rebalance and a self transfer
+        self.book.add(mone.book.Transaction(25, 'Rebalance',
+                                            {self.fun.uuid},
+                                            {self.food.uuid}, start))
+        self.book.add(mone.book.Transaction(10, 'Shift', {self.bank.uuid},
+                                            {self.bank.uuid}, start))
+        self.ledger = mone.ledger.Ledger(self.book)
+
+    def expected(self, accounts, key):
+        """Return the sum of the signed values by key of each posting."""
+        expected = {}
+        for acct in accounts:
+            for t in acct.transactions:
+                value = acct.sign(t) * t.value
+                if value:
+                    for k in key(acct, t):
+                        expected[k] = expected.get(k, 0) + value
+        return expected
+
+    def assertAggregate(self, aggregated, expected):
+        """Assert the keys and almost equal values of the aggregation."""
+        self.assertEqual(set(aggregated), set(expected))
+        for k, v in expected.items():
+            self.assertAlmostEqual(aggregated[k], v)
+
+    def test_balance(self):
+        """Compare the book's and ledger's balance."""
+        self.assertAlmostEqual(self.ledger.balance, self.book.balance)
+
+    def test_scale(self):
+        """Round the values to the scale."""
+        self.book.add(mone.book.Transaction(0.004, 'Fee', {self.bank.uuid},
+                                            {self.extern.uuid}))
+        self.assertAlmostEqual(self.book.ledger().balance,
+                               self.book.balance + 0.004)
+        self.assertAlmostEqual(mone.ledger.Ledger(self.book, 1000).balance,
+                               self.book.balance)
+
+    def test_balances(self):
+        """Compare the balance of each account and budget."""
+        balances = self.ledger.balances()
+        for acct in list(self.book.accounts.values()) \
+                + list(self.book.budgets.values()):
+            self.assertAlmostEqual(balances[acct.uuid], acct.balance)
+
+    def test_history(self):
+        """Check the history ends with the account's balance."""
+        history = self.ledger.history(self.cash.uuid)
+        self.assertEqual(history['date'], sorted(history['date']))
+        self.assertAlmostEqual(history['balance'][-1], self.cash.balance)
+
+        expected = self.cash.history()
+        self.assertEqual(history['date'], expected['date'])
+        for balance, other in zip(history['balance'], expected['balance']):
+            self.assertAlmostEqual(balance, other)
+
+        periode = [datetime.date(2021, 3, 1), datetime.date(2021, 3, 31)]
+        history = self.ledger.history(self.cash.uuid, periode)
+        self.assertTrue(all(d.startswith('2021-03')
+                            for d in history['date']))
+
+    def test_aggregate_account(self):
+        """Aggregate by account and compare to the balances."""
+        aggregated = self.book.aggregate('account')
+        for acct in self.book.accounts.values():
+            self.assertAlmostEqual(aggregated.get((acct.uuid,), 0),
+                                   acct.balance - acct._init_balance)
+
+        expected = self.expected(self.book.budgets.values(),
+                                 lambda a, t: [(a.uuid, t.date.year)])
+        self.assertAggregate(self.book.aggregate(['budget', 'year']),
+                             {(u, str(y)): v for (u, y), v in expected.items()})
+
+    def test_aggregate_tag(self):
+        """Aggregate the non external accounts by tag and month."""
+        accounts = [self.bank, self.cash]
+        expected = self.expected(accounts, lambda a, t: [
+            (tag, t.date.strftime('%Y-%m')) for tag in (t.tags or [None])])
+        self.assertAggregate(self.book.aggregate(['tag', 'month']), expected)
+
+        food = self.book.aggregate('tag', 'count',
+                                   where=lambda t: 'food' in t.tags)
+        self.assertEqual(food[('food',)], sum(
+            1 for a in accounts for t in a.transactions
+            if 'food' in t.tags and a.sign(t)))
+
+        # the transactions are selected by a boolean array, too
+        where = mone.ledger.np.array(
+            ['food' in t.tags for t in self.book.transactions])
+        self.assertEqual(self.book.aggregate('tag', 'count', where=where),
+                         food)
+
+    def test_aggregate_week(self):
+        """Aggregate by ISO week and compute the mean."""
+        total = self.book.aggregate([], 'sum')[()]
+        count = self.book.aggregate([], 'count')[()]
+        self.assertAlmostEqual(self.book.aggregate([], 'mean')[()],
+                               total / count)
+        self.assertAlmostEqual(total, self.book.balance - 1100.5)
+
+        weeks = self.book.aggregate('week')
+        self.assertAlmostEqual(sum(weeks.values()), total)
+        self.assertIn(('2020-W53',), weeks)  # 2021-01-01
+
+    def test_ledger(self):
+        """Keep the ledger until the book changes."""
+        ledger = self.book.ledger()
+        self.assertIs(self.book.ledger(), ledger)
+        self.book.remove(next(iter(self.book.transactions)))
+        self.assertIsNot(self.book.ledger(), ledger)
+
+
+@unittest.skipIf(mone.ledger.np is None, 'requires numpy')
+class TestForecast(unittest.TestCase):
+    """Test the forecast with recurring and budgeted transactions."""
+
+    def setUp(self):
+        date = datetime.date
+        self.bank = mone.book.Account('Bank', 1000)
+        self.cash = mone.book.Account('Cash', 100)
+        self.extern = mone.book.Account('Extern', extern=True)
+        self.food = mone.book.Budget('Food', 300)
+        self.home = mone.book.Budget('Home', 1500)
+        self.book = mone.book.BookKeeper(mone.book.Accounts(),
+                                         mone.book.Accounts(),
+                                         mone.book.Transactions())
+        for acct in (self.bank, self.cash, self.extern, self.food,
+                     self.home):
+            self.book.add(acct)
+
+        for month in (1, 2, 3):
+            self.book.add(mone.book.Transaction(
+                30, 'Groceries', {self.bank.uuid, self.food.uuid},
+                {self.extern.uuid}, date(2021, month, 15)))
+        self.book.add(mone.book.Transaction(
+            200, 'Bike', {self.bank.uuid}, {self.extern.uuid},
+            date(2021, 2, 10)))
+        self.book.add(mone.book.Transaction(
+            50, 'Gift', {self.extern.uuid}, {self.cash.uuid},
+            date(2021, 5, 15)))
+
+        self.book.add(mone.recurring.Recurring(
+            500, 'Rent', {self.bank.uuid, self.home.uuid},
+            {self.extern.uuid}, date(2021, 1, 1)))
+        self.book.add(mone.recurring.Recurring(
+            2000, 'Salary', {self.extern.uuid}, {self.bank.uuid},
+            date(2021, 4, 1), day=-1, business=True))
+        self.book.materialize(date(2021, 3, 31))
+
+    def test_forecast(self):
+        forecast = self.book.forecast(2, start=datetime.date(2021, 4, 1))
+        self.assertEqual(forecast['date'],
+                         ['2021-04-01', '2021-05-01', '2021-06-01'])
+        self.assertEqual(forecast['accounts'],
+                         {self.bank.uuid: [-1290, 180, 1650],
+                          self.cash.uuid: [100, 100, 150]})
+        self.assertEqual(forecast['budgets'],
+                         {self.food.uuid: [210, 180, 150],
+                          self.home.uuid: [-500, -1000, -1500]})
+        self.assertEqual(forecast['balance'], [-1190, 280, 1800])
+
+        weekly = self.book.forecast(4, 'week', start=datetime.date(2021, 4, 1))
+        self.assertEqual(weekly['date'][-1], '2021-04-29')
+        self.assertEqual(weekly['balance'][0], forecast['balance'][0])
+        self.assertRaises(ValueError, self.book.forecast, step='year')
+
+    def test_cache(self):
+        """Keep the forecast until the book changes."""
+        forecast = self.book.forecast(2)
+        cached = self.book._forecast
+        self.assertEqual(self.book.forecast(2), forecast)
+        self.assertIs(self.book._forecast, cached)
+        self.book.forecast(3)
+        self.assertIsNot(self.book._forecast, cached)
+
+        # the cached balances are not changed by the caller
+        forecast['balance'][0] = 0
+        forecast['accounts'].clear()
+        self.assertNotEqual(self.book.forecast(2), forecast)
+
+        forecast = self.book.forecast(2)
+        self.book.add(mone.book.Transaction(10, 'Coffee', {self.cash.uuid},
+                                            {self.extern.uuid}))
+        self.assertNotEqual(self.book.forecast(2), forecast)
+
+    def test_rates(self):
+        """Project again when a rate is added."""
+        usd = mone.book.Account('Dollars', 120, currency='USD')
+        self.book.add(usd)
+        rates = mone.exchange.ExchangeRates('EUR')
+        rates.add('USD', datetime.date(2021, 1, 1), 1.2)
+        self.book.rates = rates
+        start = datetime.date(2021, 4, 1)
+        self.assertEqual(self.book.forecast(2, start=start)['balance'][0],
+                         -1190 + 100)
+        rates.add('USD', datetime.date(2021, 1, 1), 1.5)
+        self.assertEqual(self.book.forecast(2, start=start)['balance'][0],
+                         -1190 + 80)
+
+        # the value of a template is in the currency of its accounts
+        self.assertRaises(ValueError, self.book.add, mone.recurring.Recurring(
+            10, 'Netflix', {self.bank.uuid}, {self.extern.uuid},
+            datetime.date(2021, 1, 1), currency='USD'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import tempfile
+import unittest
+
+import mone.book
+import mone.exchange
+import mone.ledger
+import mone.money
+
+
+class TestMoney(unittest.TestCase):
+    """Test the conversion of money to minor units."""
+
+    def test_to_minor(self):
+        """Convert floats, strings and currencies without decimals."""
+        self.assertEqual(mone.money.to_minor(0.1), 10)
+        self.assertEqual(mone.money.to_minor(1.005), 100)
+        self.assertEqual(mone.money.to_minor('1234.565'), 123456)
+        self.assertEqual(mone.money.to_minor(-19.99), -1999)
+        self.assertEqual(mone.money.to_minor(1200, 'JPY'), 1200)
+        self.assertEqual(mone.money.to_minor('1.2345', 'KWD'), 1234)
+
+    def test_to_major(self):
+        """Convert minor units back."""
+        self.assertEqual(mone.money.to_major(1999), 19.99)
+        self.assertEqual(mone.money.to_major(1200, 'JPY'), 1200)
+
+    def test_book(self):
+        """Sum up transactions in minor units exactly."""
+        bank = mone.book.Account.from_dict({'name': 'Bank', 'balance': 0.3},
+                                           minor_units=True)
+        extern = mone.book.Account('Extern', extern=True)
+        book = mone.book.BookKeeper(
+            mone.book.Accounts({bank.uuid: bank, extern.uuid: extern}),
+            mone.book.Accounts(), mone.book.Transactions())
+
+        data = [{'date': '2021-01-01', 'description': 'Coffee',
+                 'sources': [bank.uuid], 'receiver': [extern.uuid],
+                 'tags': [], 'value': 0.1}] * 3
+        book.add_many(mone.book.Transactions.from_dict(data, True))
+        self.assertEqual(bank.balance, 0)
+        self.assertIsInstance(bank.balance, int)
+
+        book.add(mone.book.Transaction(125, 'Refund', {extern.uuid},
+                                       {bank.uuid}))
+        book.remove(next(iter(book.transactions)))
+        self.assertEqual(book.to_dict(minor_units=True)['balance'], 1.35)
+
+    def test_currencies(self):
+        """Keep the minor units of each currency."""
+        bank = mone.book.Account.from_dict(
+            {'name': 'Bank', 'balance': 10, 'currency': 'BHD'}, True)
+        extern = mone.book.Account('Extern', extern=True)
+        travel = mone.book.Budget.from_dict(
+            {'name': 'Travel', 'budget': 20000, 'currency': 'JPY'}, True)
+        self.assertEqual(bank.balance, 10000)
+        self.assertEqual(travel.budget, 20000)
+        self.assertEqual(travel.to_dict(True)['budget'], 20000)
+
+        fee = mone.book.Transaction.from_dict(
+            {'date': '2021-01-01', 'description': 'Fee', 'value': 1.234,
+             'sources': [bank.uuid], 'receiver': [extern.uuid],
+             'tags': [], 'currency': 'BHD'}, True)
+        self.assertEqual(fee.value, 1234)
+        self.assertEqual(fee.to_dict(True)['value'], 1.234)
+
+        book = mone.book.BookKeeper(
+            mone.book.Accounts({bank.uuid: bank, extern.uuid: extern}),
+            mone.book.Accounts({travel.uuid: travel}),
+            mone.book.Transactions())
+        book.add(fee)
+        self.assertEqual(bank.to_dict(True)['balance'], 8.766)
+        self.assertEqual(book.snapshot().to_dict(True, True),
+                         book.to_dict(True, True))
+
+        # the balance is consolidated into the minor unit of the base
+        rates = mone.exchange.ExchangeRates('EUR')
+        rates.add('BHD', datetime.date(2021, 1, 1), 0.5)
+        book.rates = rates
+        self.assertEqual(book.balance, 1753)
+        self.assertEqual(book.to_dict(minor_units=True)['balance'], 17.53)
+
+    @unittest.skipIf(mone.ledger.np is None, 'requires numpy')
+    def test_ledger(self):
+        """Hold the minor units of all currencies in the ledger."""
+        bank = mone.book.Account('Bank', 10000, currency='BHD')
+        cash = mone.book.Account('Cash', 500, currency='JPY')
+        wallet = mone.book.Account('Wallet', 250)
+        extern = mone.book.Account('Extern', extern=True)
+        book = mone.book.BookKeeper(
+            mone.book.Accounts((a.uuid, a) for a in (bank, cash, wallet,
+                                                     extern)),
+            mone.book.Accounts(), mone.book.Transactions())
+        book.add(mone.book.Transaction(1234, 'Fee', {bank.uuid},
+                                       {extern.uuid}, currency='BHD'))
+        book.add(mone.book.Transaction(150, 'Tea', {cash.uuid},
+                                       {extern.uuid}, currency='JPY'))
+
+        ledger = book.ledger(minor_units=True)
+        self.assertEqual(ledger.scale, 1000)
+        self.assertEqual(ledger.balances()[bank.uuid], 8.766)
+        self.assertEqual(ledger.balances()[cash.uuid], 350)
+        self.assertEqual(ledger.balances()[wallet.uuid], 2.5)
+        self.assertRaises(ValueError, mone.ledger.Ledger, book, 100, True)
+
+    def test_csv(self):
+        """Parse the values of an export into their minor unit."""
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, 'export.csv')
+            with open(file, 'w') as f:
+                f.write('2021-03-01,Sushi,-1500\n')
+
+            sushi, = mone.book.Transactions.from_csv(
+                file, 2, 0, 1, minor_units=True, account='cash',
+                counterpart='extern', currency='JPY')
+            self.assertEqual(sushi.value, 1500)
+            self.assertEqual(sushi.currency, 'JPY')
+            self.assertEqual(sushi.to_dict(True)['value'], 1500)
+
+
+if __name__ == '__main__':
+    unittest.main()
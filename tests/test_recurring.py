@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import itertools
+import unittest
+
+import mone.book
+import mone.recurring
+
+date = datetime.date
+
+
+class TestRecurring(unittest.TestCase):
+
+    def recurring(self, **kwargs):
+        return mone.recurring.Recurring(10, 'Rent', {'bank'}, {'landlord'},
+                                        **kwargs)
+
+    def test_monthly(self):
+        """Clamp the day to the end of shorter months."""
+        rent = self.recurring(start=date(2021, 1, 31))
+        self.assertEqual(list(rent.dates(end=date(2021, 4, 30))),
+                         [date(2021, 1, 31), date(2021, 2, 28),
+                          date(2021, 3, 31), date(2021, 4, 30)])
+
+        rent = self.recurring(start=date(2021, 1, 15), day=1, interval=3,
+                              until=date(2022, 1, 1))
+        self.assertEqual(list(rent.dates()),
+                         [date(2021, 4, 1), date(2021, 7, 1),
+                          date(2021, 10, 1), date(2022, 1, 1)])
+
+    def test_weekly(self):
+        gym = self.recurring(start=date(2021, 3, 1), frequency='weekly',
+                             interval=2)
+        self.assertEqual(list(gym.dates(date(2021, 3, 10), date(2021, 4, 1))),
+                         [date(2021, 3, 15), date(2021, 3, 29)])
+
+    def test_last_business_day(self):
+        salary = self.recurring(start=date(2021, 1, 1), day=-1, business=True)
+        self.assertEqual(list(salary.dates(end=date(2021, 7, 31))),
+                         [date(2021, 1, 29), date(2021, 2, 26),
+                          date(2021, 3, 31), date(2021, 4, 30),
+                          date(2021, 5, 31), date(2021, 6, 30),
+                          date(2021, 7, 30)])
+
+    def test_weekend_start(self):
+        """Keep an occurrence on the start date shifted before it."""
+        rent = self.recurring(start=date(2021, 5, 1), day=1, business=True,
+                              until=date(2021, 7, 31))
+        self.assertEqual(list(rent.dates()),
+                         [date(2021, 4, 30), date(2021, 6, 1),
+                          date(2021, 7, 1)])
+        self.assertEqual(list(rent.dates(date(2021, 4, 1))),
+                         list(rent.dates()))
+        self.assertEqual(list(rent.dates(date(2021, 5, 1))),
+                         [date(2021, 6, 1), date(2021, 7, 1)])
+
+    def test_window(self):
+        """Expand a window without the occurrences before it."""
+        for kwargs in ({}, {'frequency': 'weekly', 'interval': 3},
+                       {'day': -1, 'business': True, 'interval': 2}):
+            rent = self.recurring(start=date(2000, 1, 31), **kwargs)
+            expected = [d for d in rent.dates(end=date(2031, 1, 1))
+                        if d >= date(2030, 1, 1)]
+            self.assertEqual(list(rent.dates(date(2030, 1, 1),
+                                             date(2031, 1, 1))), expected)
+
+        # the dates are lazy and end with the last date
+        rent = self.recurring(start=date(2021, 1, 1))
+        self.assertEqual(len(list(itertools.islice(rent.dates(), 1000))),
+                         1000)
+        self.assertEqual(list(rent.dates(date(9999, 11, 1))),
+                         [date(9999, 11, 1), date(9999, 12, 1)])
+        gym = self.recurring(start=date(9999, 12, 17), frequency='weekly')
+        self.assertEqual(list(gym.dates()),
+                         [date(9999, 12, 17), date(9999, 12, 24),
+                          date(9999, 12, 31)])
+
+    def test_transactions(self):
+        """Give each occurrence a fixed uuid."""
+        rent = self.recurring(start=date(2021, 1, 1), tags={'home'})
+        first, second = rent.transactions(end=date(2021, 2, 1))
+        self.assertEqual(first.uuid, rent.occurrence(date(2021, 1, 1)))
+        self.assertNotEqual(first.uuid, second.uuid)
+        self.assertEqual(next(rent.transactions()).uuid, first.uuid)
+        self.assertEqual(first.tags, {'home'})
+
+    def test_to_dict(self):
+        rent = self.recurring(start=date(2021, 1, 1), until=date(2022, 1, 1))
+        self.assertEqual(mone.recurring.Recurring.from_dict(rent.to_dict()),
+                         rent)
+        self.assertRaises(ValueError, self.recurring, start=date(2021, 1, 1),
+                          frequency='daily')
+
+
+class TestBookKeeper(unittest.TestCase):
+    """Test the recurring templates of a book."""
+
+    def setUp(self):
+        self.bank = mone.book.Account('Bank', 1000)
+        self.extern = mone.book.Account('Extern', extern=True)
+        self.book = mone.book.BookKeeper(mone.book.Accounts(),
+                                         mone.book.Accounts(),
+                                         mone.book.Transactions())
+        self.book.add(self.bank)
+        self.book.add(self.extern)
+        self.rent = mone.recurring.Recurring(
+            500, 'Rent', {self.bank.uuid}, {self.extern.uuid},
+            date(2021, 1, 1))
+        self.salary = mone.recurring.Recurring(
+            2000, 'Salary', {self.extern.uuid}, {self.bank.uuid},
+            date(2021, 1, 1), day=-1, business=True)
+        self.book.add(self.rent)
+        self.book.add(self.salary)
+
+    def test_expand(self):
+        occurrences = list(self.book.expand(end=date(2021, 2, 28)))
+        self.assertEqual([(t.description, t.date) for t in occurrences],
+                         [('Rent', date(2021, 1, 1)),
+                          ('Salary', date(2021, 1, 29)),
+                          ('Rent', date(2021, 2, 1)),
+                          ('Salary', date(2021, 2, 26))])
+        self.assertEqual(len(self.book.transactions), 0)
+
+    def test_materialize(self):
+        """Book the occurrences once."""
+        march = date(2021, 3, 31)
+        projected = self.book.balance_at(march, recurring=True)
+        self.assertEqual(projected, 1000 + 3 * 1500)
+        self.assertEqual(self.book.balance_at(march), 1000)
+
+        self.assertEqual(self.book.materialize(date(2021, 2, 28)), 4)
+        self.assertEqual(self.book.materialize(date(2021, 2, 28)), 0)
+        self.assertEqual(self.book.balance_at(march), 1000 + 2 * 1500)
+        self.assertEqual(self.book.balance_at(march, recurring=True),
+                         projected)
+        self.assertEqual([t.date for t in self.book.expand(end=march)],
+                         [date(2021, 3, 1), date(2021, 3, 31)])
+
+    def test_signs(self):
+        """Sign the occurrences as if they were booked."""
+        food = mone.book.Budget('Food', 300)
+        self.book.add(food)
+        self.book.recurring.clear()
+        self.book.add(mone.recurring.Recurring(
+            10, 'Interest', {self.extern.uuid}, {self.bank.uuid},
+            date(2021, 1, 1)))
+        self.book.add(mone.recurring.Recurring(
+            20, 'Rebalance', {self.bank.uuid}, {food.uuid},
+            date(2021, 1, 1)))
+
+        june = date(2021, 6, 30)
+        projected = self.book.balance_at(june, recurring=True)
+        self.book.materialize(june)
+        self.assertEqual(projected, self.book.balance_at(june))
+        self.assertEqual(projected, 1060)
+
+    def test_replace(self):
+        cash = mone.book.Account('Cash')
+        self.book.add(cash)
+        self.book.replace(self.bank.uuid, cash.uuid)
+        self.assertEqual(self.rent.sources, {cash.uuid})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import unittest
+
+import mone.importer
+from mone.rules import Rule, Rules
+
+
+class TestRules(unittest.TestCase):
+    """Test the categorization rules."""
+
+    def setUp(self):
+        self.rules = Rules([
+            Rule(keyword='amazon prime', tags=['subscription']),
+            Rule(keyword='Amazon', budgets=['shopping'], tags=['online']),
+            Rule(keyword='rewe', budgets=['food'], tags=['groceries']),
+            Rule(keyword='salary', minimum=0, counterpart='employer'),
+            Rule(pattern=r'^atm \d+', counterpart='cash'),
+            Rule(keyword='he', tags=['he']),
+            Rule(keyword='she', tags=['she']),
+            Rule(minimum=1000, tags=['large']),
+        ])
+
+    def test_match(self):
+        """Use the first matching rule."""
+        rules = self.rules.rules
+        self.assertIs(self.rules.match('AMAZON  Prime Video', -8.99),
+                      rules[0])
+        self.assertIs(self.rules.match('Amazon Marketplace', -20), rules[1])
+        self.assertIs(self.rules.match('REWE sagt Danke', -35), rules[2])
+        self.assertIs(self.rules.match('Salary March', 3000), rules[3])
+        self.assertIs(self.rules.match('ATM 4711 Berlin', -100), rules[4])
+        self.assertIsNone(self.rules.match('Withdrawal ATM 4711', -100))
+        self.assertIsNone(self.rules.match('Unknown', -10))
+        self.assertIsNone(self.rules.match('', 0))
+
+        # keywords within other keywords are found too
+        self.assertIs(self.rules.match('ushers', -1), rules[5])
+        self.assertIs(self.rules.match('Salary for her', -200), rules[5])
+        self.assertIs(self.rules.match('Bonus', 1500), rules[7])
+
+    def test_transfer(self):
+        """Categorize imported transactions."""
+        date = datetime.date(2021, 3, 1)
+        rewe = mone.importer.transfer(-35.5, 'REWE', date, 'bank', 'extern',
+                                      rules=self.rules)
+        self.assertEqual(rewe.sources, {'bank', 'food'})
+        self.assertEqual(rewe.receiver, {'extern'})
+        self.assertEqual(rewe.tags, {'groceries'})
+
+        salary = mone.importer.transfer(3000, 'Salary', date, 'bank', 'extern',
+                                        rules=self.rules)
+        self.assertEqual(salary.sources, {'employer'})
+        self.assertEqual(salary.receiver, {'bank'})
+        self.assertEqual(salary.tags, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
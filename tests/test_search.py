@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+
+import mone.search
+
+
+class TestTrigramIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = mone.search.TrigramIndex(threshold=0.2)
+        for key, text in enumerate(['Amazon Marketplace', 'Rent',
+                                    'amazon', 'Amazn',
+                                    'AMAZON']):
+            self.index.add(key, text)
+
+    def test_normalize(self):
+        self.assertEqual(mone.search.normalize('  Amazon\tMarket '),
+                         'amazon market')
+        self.assertEqual(mone.search.trigrams('ab'), {' ab', 'ab '})
+
+    def test_ranking(self):
+        """Rank texts containing the query before similar ones."""
+        # equally similar texts are in the order they were added
+        self.assertEqual(self.index.search('Amazon'), [2, 4, 0, 3])
+        self.assertEqual(self.index.search('amazon', fuzzy=False), [2, 4, 0])
+        self.assertEqual(self.index.search('amazn', fuzzy=False), [3])
+        self.assertEqual(self.index.search('rnet'), [])
+
+        # short queries are searched in all texts
+        self.assertEqual(self.index.search('E'), [0, 1])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_pagination(self):
+        ranked = self.index.search('amazon')
+        self.assertEqual(self.index.search('amazon', limit=2), ranked[:2])
+        self.assertEqual(self.index.search('amazon', limit=2, offset=1),
+                         ranked[1:3])
+        self.assertEqual(self.index.search('amazon', offset=3), ranked[3:])
+        self.assertEqual(self.index.search('amazon', limit=2, offset=10),
+                         [])
+
+    def test_update(self):
+        """Keep the index up to date when texts are added or removed."""
+        self.index.add(1, 'Amazon Prime')
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.search('amazon', fuzzy=False),
+                         [2, 4, 1, 0])
+        self.assertEqual(self.index.search('rent'), [])
+
+        self.index.remove(2)
+        self.index.remove(2)
+        self.assertNotIn(2, self.index)
+        self.assertEqual(self.index.search('amazon', fuzzy=False), [4, 1, 0])
+
+        # the trigrams of removed texts are dropped
+        for key in (0, 1, 3, 4):
+            self.index.remove(key)
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index._postings, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2020  Joe Pearson
+#
+# This file is part of Mone.
+#
+# Mone is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Mone is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import mone.book
+import mone.recurring
+
+try:
+    import mone.www.vault as vault
+except ImportError:  # pragma: no cover
+    vault = None
+
+SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, 'mone', 'www',
+                      'schema.sql')
+
+
+@unittest.skipIf(vault is None, 'requires the web app dependencies')
+class TestJournal(unittest.TestCase):
+    """Test the journal against an in-memory database."""
+
+    def setUp(self):
+        self.db = sqlite3.connect(':memory:')
+        with open(SCHEMA) as f:
+            self.db.executescript(f.read())
+        self.journal = vault.Journal(self.db)
+        self.book = self.journal.load()
+
+        self.bank = mone.book.Account('Bank', 1000)
+        self.extern = mone.book.Account('Extern', extern=True)
+        self.food = mone.book.Budget('Food', 300)
+        for acct in (self.bank, self.extern, self.food):
+            self.book.add(acct)
+
+    def test_compact(self):
+        """Keep the balance of a budget rebalance in the snapshot."""
+        self.book.add(mone.book.Transaction(30, 'Rebalance',
+                                            {self.bank.uuid},
+                                            {self.food.uuid}))
+        self.assertEqual(self.book.balance, 1000)
+        self.assertEqual(self.journal.load().balance, 1000)
+
+        self.journal.compact(self.book)
+        book = self.journal.load()
+        self.assertEqual(book.balance, self.book.balance)
+        self.assertEqual(book.to_dict(True), self.book.to_dict(True))
+
+    def events(self):
+        return [e for e, in self.db.execute(
+            'SELECT event FROM journal ORDER BY seq')]
+
+    def test_replay(self):
+        """Replay each kind of event."""
+        cash = mone.book.Account('Cash', 50)
+        self.book.add(cash)
+        coffee = mone.book.Transaction(3, 'Coffee', {self.bank.uuid},
+                                       {self.extern.uuid})
+        self.book.add(coffee)
+        self.book.add_many([
+            mone.book.Transaction(20, 'Lunch', {self.bank.uuid,
+                                                self.food.uuid},
+                                  {self.extern.uuid}),
+            mone.book.Transaction(10, 'Withdraw', {self.bank.uuid},
+                                  {cash.uuid})])
+        self.book.remove(coffee.uuid)
+        self.book.replace(cash.uuid, self.bank.uuid)
+        self.book.add(mone.recurring.Recurring(
+            500, 'Rent', {self.bank.uuid}, {self.extern.uuid},
+            datetime.date(2021, 1, 1)))
+
+        self.assertEqual(self.events(),
+                         ['account', 'account', 'budget', 'account',
+                          'transactions', 'transactions', 'remove',
+                          'replace', 'recurring'])
+
+        book = self.journal.load()
+        self.assertEqual(book.to_dict(True), self.book.to_dict(True))
+        self.assertEqual(book.version, self.book.version)
+        self.assertEqual(book.seq, self.journal.seq())
+        self.assertEqual(self.book.seq, book.seq)
+        self.assertNotIn(coffee.uuid, book.transactions)
+        self.assertEqual([r.to_dict() for r in book.recurring.values()],
+                         [r.to_dict() for r in self.book.recurring.values()])
+
+        # the replayed book journals its changes, too
+        book.add(mone.book.Transaction(1, 'Gum', {self.bank.uuid},
+                                       {self.extern.uuid}))
+        self.assertEqual(len(self.journal.load().transactions),
+                         len(book.transactions))
+
+    def test_batch(self):
+        """Journal a batch as one event."""
+        with self.book.batch():
+            for i in range(3):
+                self.book.add(mone.book.Transaction(
+                    i + 1, 'Coffee', {self.bank.uuid}, {self.extern.uuid}))
+        self.assertEqual(self.events()[-1:], ['transactions'])
+        self.assertEqual(self.journal.load().balance, 994)
+
+    def test_interval(self):
+        """Compact the journal every interval events."""
+        self.journal.interval = 5
+        for i in range(12):
+            self.book.add(mone.book.Transaction(
+                1, f'Coffee {i}', {self.bank.uuid}, {self.extern.uuid}))
+        snapshots = [seq for seq, in self.db.execute(
+            'SELECT seq FROM snapshots ORDER BY seq')]
+        self.assertEqual(snapshots, [0, 5, 10, 15])
+        self.assertFalse(self.journal.due())
+
+        # the events are kept as audit trail
+        self.assertEqual(len(self.events()), 15)
+        book = self.journal.load()
+        self.assertEqual(book.balance, 988)
+        self.assertEqual(book.to_dict(True), self.book.to_dict(True))
+
+    def test_writers(self):
+        """Journal the changes of two books in the same database."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'vault.db')
+            with open(SCHEMA) as f:
+                sqlite3.connect(path).executescript(f.read())
+            journals = [vault.Journal(sqlite3.connect(path), interval=3)
+                        for _ in range(2)]
+            first, second = [journal.load() for journal in journals]
+
+            first.add(self.bank)
+            first.add(self.extern)
+            second.add(mone.book.Transaction(
+                10, 'Coffee', {self.bank.uuid}, {self.extern.uuid}))
+            self.assertEqual(second.seq, 3)
+            for value in (20, 30, 40):
+                first.add(mone.book.Transaction(
+                    value, 'Lunch', {self.bank.uuid}, {self.extern.uuid}))
+            self.assertEqual(first.seq, 6)
+
+            # the snapshot at the first book's last event has all events
+            book = vault.Journal(sqlite3.connect(path)).load()
+            self.assertEqual(book.balance, 900)
+            self.assertEqual(first.balance, 900)
+            second.sync()
+            self.assertEqual(second.seq, 6)
+            self.assertEqual(second.to_dict(True), book.to_dict(True))
+            for journal in journals:
+                journal.db.close()
+            book.journal.db.close()
+
+    def test_recurring(self):
+        """Keep the recurring templates in the snapshot."""
+        rent = mone.recurring.Recurring(
+            500, 'Rent', {self.bank.uuid}, {self.extern.uuid},
+            datetime.date(2021, 1, 1), day=-1, business=True)
+        self.book.add(rent)
+        self.book.materialize(datetime.date(2021, 3, 31))
+        self.journal.compact(self.book)
+
+        book = self.journal.load()
+        self.assertEqual(book.recurring[rent.uuid], rent)
+        self.assertEqual(book.materialize(datetime.date(2021, 3, 31)), 0)
+        self.assertEqual(book.balance, -500)
+
+    def test_migrate(self):
+        """Load a book stored in the vault before the journal existed."""
+        db = sqlite3.connect(':memory:')
+        with open(SCHEMA) as f:
+            db.executescript(f.read())
+        lunch = mone.book.Transaction(20, 'Lunch',
+                                      {self.bank.uuid, self.food.uuid},
+                                      {'shop'})
+        for table, stored in [('accounts', self.bank),
+                              ('budgets', self.food),
+                              ('transactions', lunch)]:
+            db.execute(f'INSERT INTO {table} VALUES (?, ?)',
+                       (stored.uuid, json.dumps(stored.to_dict())))
+
+        journal = vault.Journal(db)
+        book = journal.load()
+        self.assertEqual(book.balance, 980)
+        self.assertEqual(self.food.balance, 300)
+        self.assertEqual(book.budgets[self.food.uuid].balance, 280)
+
+        # the first load is stored as snapshot
+        self.assertEqual(db.execute('SELECT seq FROM snapshots').fetchall(),
+                         [(0,)])
+        self.assertEqual(journal.load().to_dict(True), book.to_dict(True))
+
+
+if __name__ == '__main__':
+    unittest.main()